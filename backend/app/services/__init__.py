@@ -1,3 +1,23 @@
 # BrainSpark Services
 from .gamification import *
 from .multiplayer import *
+from .wallet import *
+from .streaks import *
+from .rewards import *
+from .reward_batch import *
+from .child_cache import *
+from .backplane import *
+from .timer_wheel import *
+from .matchmaking import *
+from .question_bank import *
+from .protocol import *
+from .ai_scoring import *
+from .sessions import *
+from .result_writer import *
+from .chat import *
+from .message_archive import *
+from .transcript_codec import *
+from .conversation_search import *
+from .recommender import *
+from .db_routing import *
+from .tiered_cache import *
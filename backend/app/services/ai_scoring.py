@@ -0,0 +1,240 @@
+# ============================================================
+# BrainSpark Creative Answer Scoring
+# app/services/ai_scoring.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+import httpx
+
+# ============================================================
+# SHARED UPSTREAM LIMIT
+# ============================================================
+
+class UpstreamLimiter:
+    """Caps concurrent requests to the AI API across chat and game scoring"""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def metrics(self) -> dict:
+        return {"max_concurrent": self.max_concurrent, "in_flight": self.in_flight}
+
+# One per process; chat (main.get_ai_response) and creative scoring both go through it
+ai_limiter = UpstreamLimiter(int(os.getenv("AI_MAX_CONCURRENT_REQUESTS", "16")))
+
+# ============================================================
+# DATA MODELS
+# ============================================================
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+@dataclass
+class CreativeAnswer:
+    player_id: str
+    answer: str
+    age_group: str = "explorers"
+
+def clamp_score(value) -> int:
+    return max(MIN_SCORE, min(MAX_SCORE, int(round(float(value)))))
+
+# ============================================================
+# SCORERS
+# ============================================================
+
+WORD = re.compile(r"[a-zA-Z']+")
+IMAGINATIVE_WORDS = {
+    "because", "imagine", "would", "could", "if", "invent", "magic", "giant", "tiny",
+    "glowing", "secret", "future", "planet", "robot", "dragon", "ocean", "fly", "colors",
+}
+
+class HeuristicCreativeScorer:
+    """Deterministic local scoring - same answer always gets the same score"""
+
+    name = "heuristic"
+
+    async def score(self, prompt: str, answers: List[CreativeAnswer]) -> Dict[str, int]:
+        return {a.player_id: self.score_one(prompt, a.answer) for a in answers}
+
+    @staticmethod
+    def score_one(prompt: str, answer: str) -> int:
+        words = [w.lower() for w in WORD.findall(answer or "")]
+        if not words:
+            return MIN_SCORE
+        unique = set(words)
+        prompt_words = {w.lower() for w in WORD.findall(prompt)}
+        score = 2
+        score += min(3, len(words) // 8)  # Developed the idea
+        score += 2 if len(words) >= 5 and len(unique) / len(words) > 0.7 else 0  # Varied vocabulary
+        score += min(2, len(unique & IMAGINATIVE_WORDS))  # Imaginative language
+        score += 1 if unique & prompt_words else 0  # On topic
+        return clamp_score(score)
+
+class StubCreativeScorer:
+    """Local stand-in for tests and offline dev: hash-based scores, optional delay/failure"""
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def score(self, prompt: str, answers: List[CreativeAnswer]) -> Dict[str, int]:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("stub scorer failure")
+        return {
+            a.player_id: MIN_SCORE + int(hashlib.sha1(a.answer.encode()).hexdigest(), 16) % MAX_SCORE
+            for a in answers
+        }
+
+SCORING_SYSTEM_PROMPT = """You judge a kids' creativity game. Score each numbered answer to the prompt
+from 1 to 10 for imagination, effort and relevance, kindly and fairly for the child's age group.
+Reply with JSON only: {"scores": {"<number>": <score>, ...}}"""
+
+class ClaudeCreativeScorer:
+    """Scores a whole round's answers in one request per chunk"""
+
+    name = "claude"
+
+    def __init__(self, api_key: str, limiter: UpstreamLimiter = ai_limiter,
+                 model: str = "claude-sonnet-4-20250514", max_batch: int = 20):
+        self.api_key = api_key
+        self.limiter = limiter
+        self.model = model
+        self.max_batch = max_batch
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def score(self, prompt: str, answers: List[CreativeAnswer]) -> Dict[str, int]:
+        chunks = [answers[i:i + self.max_batch] for i in range(0, len(answers), self.max_batch)]
+        results = await asyncio.gather(*(self.score_chunk(prompt, c) for c in chunks))
+        return {pid: score for chunk in results for pid, score in chunk.items()}
+
+    async def score_chunk(self, prompt: str, answers: List[CreativeAnswer]) -> Dict[str, int]:
+        # Number the answers rather than sending player ids upstream
+        listing = "\n".join(
+            f"{i}. ({a.age_group}) {a.answer.strip()[:500]}" for i, a in enumerate(answers, 1)
+        )
+        if self.client is None:
+            self.client = httpx.AsyncClient()
+        async with self.limiter:
+            response = await self.client.post(
+                "https://api.anthropic.com/v1/messages",
+                headers={
+                    "Content-Type": "application/json",
+                    "x-api-key": self.api_key,
+                    "anthropic-version": "2023-06-01"
+                },
+                json={
+                    "model": self.model,
+                    "max_tokens": 20 + 12 * len(answers),
+                    "system": SCORING_SYSTEM_PROMPT,
+                    "messages": [{"role": "user", "content": f"Prompt: {prompt}\n\nAnswers:\n{listing}"}]
+                },
+                timeout=10.0
+            )
+        text = response.json()["content"][0]["text"]
+        scores = json.loads(text[text.index("{"):text.rindex("}") + 1])["scores"]
+        return {
+            a.player_id: clamp_score(scores[str(i)])
+            for i, a in enumerate(answers, 1)
+            if str(i) in scores
+        }
+
+# ============================================================
+# SCORING PIPELINE
+# ============================================================
+
+class CreativeScoringPipeline:
+    """Upstream scorer under a hard deadline, heuristic for anything it didn't cover"""
+
+    def __init__(self, scorer, fallback: Optional[HeuristicCreativeScorer] = None, deadline_seconds: float = 3.5):
+        self.scorer = scorer
+        self.fallback = fallback or HeuristicCreativeScorer()
+        self.deadline_seconds = deadline_seconds
+        # Metrics
+        self.rounds = 0
+        self.answers_scored = 0
+        self.fallback_answers = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+    async def score_round(self, prompt: str, answers: List[CreativeAnswer]) -> Tuple[Dict[str, int], str]:
+        """(player_id -> 1..10, source); never raises, never exceeds the deadline"""
+        if not answers:
+            return {}, "none"
+        started = time.monotonic()
+        self.rounds += 1
+        scores: Dict[str, int] = {}
+        source = self.scorer.name
+        try:
+            scores = await asyncio.wait_for(self.scorer.score(prompt, answers), self.deadline_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            source = self.fallback.name
+        except Exception as e:
+            print(f"Creative scoring error: {e}")
+            self.errors += 1
+            source = self.fallback.name
+
+        missing = [a for a in answers if a.player_id not in scores]
+        if missing:
+            scores.update(await self.fallback.score(prompt, missing))
+            self.fallback_answers += len(missing)
+            if len(missing) < len(answers):
+                source = f"{self.scorer.name}+{self.fallback.name}"
+        self.answers_scored += len(answers)
+        self.total_latency += time.monotonic() - started
+        return scores, source
+
+    def metrics(self) -> dict:
+        return {
+            "scorer": self.scorer.name,
+            "rounds": self.rounds,
+            "answers_scored": self.answers_scored,
+            "fallback_answers": self.fallback_answers,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_latency_seconds": round(self.total_latency / self.rounds, 3) if self.rounds else 0.0,
+            "upstream": ai_limiter.metrics(),
+        }
+
+def build_scoring_pipeline() -> CreativeScoringPipeline:
+    """CREATIVE_SCORER=claude|heuristic|stub; claude when an API key is set"""
+    api_key = os.getenv("ANTHROPIC_API_KEY", "")
+    choice = os.getenv("CREATIVE_SCORER", "claude" if api_key else "heuristic")
+    if choice == "claude" and api_key:
+        scorer = ClaudeCreativeScorer(api_key)
+    elif choice == "stub":
+        scorer = StubCreativeScorer()
+    else:
+        scorer = HeuristicCreativeScorer()
+    return CreativeScoringPipeline(scorer, deadline_seconds=float(os.getenv("CREATIVE_SCORING_DEADLINE", "3.5")))
+
+creative_scoring = build_scoring_pipeline()
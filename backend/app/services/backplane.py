@@ -0,0 +1,204 @@
+# ============================================================
+# BrainSpark Multiplayer Backplane (Redis)
+# app/services/backplane.py
+# ============================================================
+
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import socket
+import uuid
+
+import redis.asyncio as aioredis
+
+# ============================================================
+# KEYS & CHANNELS
+# ============================================================
+
+ROOM_KEY = "mp:room:{room_id}"                  # hash: room metadata + owner node
+ROOM_PLAYERS_KEY = "mp:room:{room_id}:players"  # hash: player_id -> player JSON
+PLAYER_ROOM_KEY = "mp:player_room:{player_id}"  # string: room_id
+ROOM_OUT_CHANNEL = "mp:out:{room_id}"           # frames for every node with sockets in the room
+ROOM_IN_CHANNEL = "mp:in:{room_id}"             # player actions relayed to the owning node
+
+# Join atomically: room must exist, still be waiting, and have space.
+# Returns 1 joined (or already in), -1 missing, -2 started, -3 full.
+JOIN_ROOM_LUA = """
+local status = redis.call('HGET', KEYS[1], 'status')
+if not status then return -1 end
+if status ~= 'waiting' then return -2 end
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then return 1 end
+if redis.call('HLEN', KEYS[2]) >= tonumber(redis.call('HGET', KEYS[1], 'max_players')) then return -3 end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[3]))
+return 1
+"""
+
+# Relay envelopes. Client payloads are forwarded as-is, so the owning node
+# only trusts internal message types (_joined, ...) from SYSTEM envelopes.
+CLIENT = "client"
+SYSTEM = "system"
+
+JOINED = 1
+ROOM_MISSING = -1
+ROOM_STARTED = -2
+ROOM_FULL = -3
+
+FrameHandler = Callable[[str, str, List[str], Optional[str]], None]
+InboundHandler = Callable[[str, str, str, dict], Awaitable[None]]  # room_id, player_id, kind, data
+
+# ============================================================
+# BACKPLANE
+# ============================================================
+
+class RoomBackplane:
+    """Shared room state in Redis plus pub/sub relays between nodes"""
+
+    def __init__(self, redis_url: str, node_id: Optional[str] = None, room_ttl_seconds: int = 6 * 3600):
+        self.redis = aioredis.from_url(redis_url, decode_responses=True)
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.room_ttl = room_ttl_seconds
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.join_script = self.redis.register_script(JOIN_ROOM_LUA)
+        self.watched: Dict[str, int] = {}   # room_id -> local socket count
+        self.owned: Dict[str, bool] = {}    # room_ids whose game runs on this node
+        self.on_frame: Optional[FrameHandler] = None
+        self.on_inbound: Optional[InboundHandler] = None
+        self.listener: Optional[asyncio.Task] = None
+
+    async def start(self, on_frame: FrameHandler, on_inbound: InboundHandler):
+        self.on_frame = on_frame
+        self.on_inbound = on_inbound
+        # redis-py needs at least one subscription before listening
+        await self.pubsub.subscribe(f"mp:node:{self.node_id}")
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self.listener:
+            self.listener.cancel()
+        await self.pubsub.close()
+        await self.redis.close()
+
+    # -------------------- ROOM STATE --------------------
+
+    async def save_room(self, room: dict, players: List[dict]):
+        """Publish a room created on this node; this node becomes its owner"""
+        room_key = ROOM_KEY.format(room_id=room["id"])
+        players_key = ROOM_PLAYERS_KEY.format(room_id=room["id"])
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(room_key, mapping={**{k: str(v) for k, v in room.items()}, "owner": self.node_id})
+            pipe.expire(room_key, self.room_ttl)
+            for player in players:
+                pipe.hset(players_key, player["id"], json.dumps(player))
+                pipe.set(PLAYER_ROOM_KEY.format(player_id=player["id"]), room["id"], ex=self.room_ttl)
+            pipe.expire(players_key, self.room_ttl)
+            await pipe.execute()
+        await self.own_room(room["id"])
+
+    async def load_room(self, room_id: str) -> Optional[dict]:
+        """Room metadata plus its players, from any node"""
+        meta = await self.redis.hgetall(ROOM_KEY.format(room_id=room_id))
+        if not meta:
+            return None
+        players = await self.redis.hvals(ROOM_PLAYERS_KEY.format(room_id=room_id))
+        meta["players"] = [json.loads(p) for p in players]
+        return meta
+
+    async def join_room(self, room_id: str, player: dict) -> int:
+        result = await self.join_script(
+            keys=[ROOM_KEY.format(room_id=room_id), ROOM_PLAYERS_KEY.format(room_id=room_id)],
+            args=[player["id"], json.dumps(player), self.room_ttl]
+        )
+        if result == JOINED:
+            await self.redis.set(PLAYER_ROOM_KEY.format(player_id=player["id"]), room_id, ex=self.room_ttl)
+        return int(result)
+
+    async def set_status(self, room_id: str, status: str):
+        await self.redis.hset(ROOM_KEY.format(room_id=room_id), "status", status)
+
+    async def delete_room(self, room_id: str, player_ids: List[str]):
+        keys = [ROOM_KEY.format(room_id=room_id), ROOM_PLAYERS_KEY.format(room_id=room_id)]
+        keys += [PLAYER_ROOM_KEY.format(player_id=pid) for pid in player_ids]
+        await self.redis.delete(*keys)
+        if self.owned.pop(room_id, None):
+            await self.pubsub.unsubscribe(ROOM_IN_CHANNEL.format(room_id=room_id))
+
+    async def room_owner(self, room_id: str) -> Optional[str]:
+        return await self.redis.hget(ROOM_KEY.format(room_id=room_id), "owner")
+
+    async def route_hint(self, room_id: str) -> Optional[str]:
+        """Node a client should prefer for this room's socket (sticky routing)"""
+        return await self.room_owner(room_id)
+
+    # -------------------- PUB/SUB --------------------
+
+    async def own_room(self, room_id: str):
+        if room_id not in self.owned:
+            self.owned[room_id] = True
+            await self.pubsub.subscribe(ROOM_IN_CHANNEL.format(room_id=room_id))
+
+    async def watch_room(self, room_id: str):
+        """A local socket joined this room - start receiving its frames"""
+        self.watched[room_id] = self.watched.get(room_id, 0) + 1
+        if self.watched[room_id] == 1:
+            await self.pubsub.subscribe(ROOM_OUT_CHANNEL.format(room_id=room_id))
+
+    async def unwatch_room(self, room_id: str):
+        count = self.watched.get(room_id, 0) - 1
+        if count > 0:
+            self.watched[room_id] = count
+            return
+        self.watched.pop(room_id, None)
+        await self.pubsub.unsubscribe(ROOM_OUT_CHANNEL.format(room_id=room_id))
+
+    async def publish_frame(self, room_id: str, frame: str, exclude: List[str], to: Optional[str] = None):
+        """Relay a pre-encoded frame; the originating node already delivered it locally"""
+        await self.redis.publish(ROOM_OUT_CHANNEL.format(room_id=room_id), json.dumps({
+            "origin": self.node_id,
+            "frame": frame,
+            "exclude": exclude,
+            "to": to
+        }))
+
+    async def forward_to_owner(self, room_id: str, player_id: str, data: dict, kind: str = CLIENT):
+        """Send a player's action to the node running the room's game.
+
+        Use kind=SYSTEM only for messages this node built itself, never for
+        anything that came off a socket.
+        """
+        await self.redis.publish(ROOM_IN_CHANNEL.format(room_id=room_id), json.dumps({
+            "origin": self.node_id,
+            "player_id": player_id,
+            "kind": kind,
+            "data": data
+        }))
+
+    async def listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None:
+                continue
+
+            channel = message["channel"]
+            payload = json.loads(message["data"])
+            if payload.get("origin") == self.node_id and channel.startswith("mp:out:"):
+                continue  # Already fanned out locally
+
+            try:
+                if channel.startswith("mp:out:"):
+                    self.on_frame(channel[len("mp:out:"):], payload["frame"], payload["exclude"], payload["to"])
+                elif channel.startswith("mp:in:"):
+                    await self.on_inbound(channel[len("mp:in:"):], payload["player_id"],
+                                          payload.get("kind", CLIENT), payload["data"])
+            except Exception as e:
+                print(f"Backplane handler error on {channel}: {e}")
@@ -0,0 +1,160 @@
+# ============================================================
+# BrainSpark In-Room Chat Coalescing
+# app/services/chat.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+# ============================================================
+# RATE LIMITING
+# ============================================================
+
+class ChatRateLimiter:
+    """Token bucket per player: a short burst, then a steady trickle"""
+
+    def __init__(self, rate_per_second: float = 2.0, burst: int = 6):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.buckets: Dict[str, Tuple[float, float]] = {}  # player -> (tokens, updated)
+        self.warned: Set[str] = set()
+        self.limited = 0
+
+    def allow(self, player_id: str, now: Optional[float] = None) -> bool:
+        now = now or time.monotonic()
+        tokens, updated = self.buckets.get(player_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.buckets[player_id] = (tokens, now)
+            self.limited += 1
+            return False
+        self.buckets[player_id] = (tokens - 1, now)
+        self.warned.discard(player_id)
+        return True
+
+    def should_warn(self, player_id: str) -> bool:
+        """True once per limited streak, so spamming doesn't earn one warning per message"""
+        if player_id in self.warned:
+            return False
+        self.warned.add(player_id)
+        return True
+
+    def retry_after(self, player_id: str) -> float:
+        tokens, _ = self.buckets.get(player_id, (self.burst, 0.0))
+        return round(max(0.0, 1 - tokens) / self.rate, 2)
+
+    def prune(self, now: Optional[float] = None):
+        """Forget players whose bucket has refilled - they'd start full anyway"""
+        now = now or time.monotonic()
+        refill = self.burst / self.rate
+        self.buckets = {pid: b for pid, b in self.buckets.items() if now - b[1] < refill}
+        self.warned &= self.buckets.keys()
+
+# ============================================================
+# COALESCER
+# ============================================================
+
+@dataclass
+class ChatLine:
+    player_id: str
+    message: str
+    count: int = 1  # Identical consecutive messages collapse into one line
+
+ChatFlush = Callable[[str, List[ChatLine]], Awaitable[None]]
+
+class ChatCoalescer:
+    """Buffers chat per room and flushes every dirty room once per tick.
+
+    One task serves every room: it sleeps while nobody is chatting and
+    otherwise wakes once per tick, so a noisy room costs one frame per
+    player per tick instead of one per message.
+    """
+
+    def __init__(self, flush: ChatFlush, tick_seconds: float = 0.075,
+                 max_lines_per_tick: int = 30, max_length: int = 200,
+                 limiter: Optional[ChatRateLimiter] = None):
+        self.flush = flush
+        self.tick_seconds = tick_seconds
+        self.max_lines_per_tick = max_lines_per_tick
+        self.max_length = max_length
+        self.limiter = limiter or ChatRateLimiter()
+        self.pending: Dict[str, List[ChatLine]] = {}
+        self.wake = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.last_prune = time.monotonic()
+        # Metrics
+        self.accepted = 0
+        self.collapsed = 0
+        self.frames = 0
+        self.ticks = 0
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    def submit(self, room_id: str, player_id: str, message: str) -> bool:
+        """Buffer a message; False if the player is over their rate limit"""
+        message = (message or "").strip()[:self.max_length]
+        if not message:
+            return True
+        if not self.limiter.allow(player_id):
+            return False
+        self.accepted += 1
+        lines = self.pending.setdefault(room_id, [])
+        last = lines[-1] if lines else None
+        if last and last.player_id == player_id and last.message == message:
+            last.count += 1
+            self.collapsed += 1
+        else:
+            lines.append(ChatLine(player_id, message))
+        self.wake.set()
+        return True
+
+    def drop(self, room_id: str):
+        self.pending.pop(room_id, None)
+
+    async def run(self):
+        while True:
+            await self.wake.wait()
+            # Collect everything that arrives during the tick into one flush
+            await asyncio.sleep(self.tick_seconds)
+            self.wake.clear()
+            self.ticks += 1
+            await self.flush_all()
+            if self.pending:
+                self.wake.set()  # Carried-over lines go out next tick
+            now = time.monotonic()
+            if now - self.last_prune > 60:
+                self.limiter.prune(now)
+                self.last_prune = now
+
+    async def flush_all(self):
+        rooms, self.pending = self.pending, {}
+        for room_id, lines in rooms.items():
+            if len(lines) > self.max_lines_per_tick:
+                self.pending[room_id] = lines[self.max_lines_per_tick:]
+                lines = lines[:self.max_lines_per_tick]
+            try:
+                await self.flush(room_id, lines)
+                self.frames += 1
+            except Exception as e:
+                print(f"Chat flush error in {room_id}: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "tick_seconds": self.tick_seconds,
+            "accepted": self.accepted,
+            "collapsed": self.collapsed,
+            "rate_limited": self.limiter.limited,
+            "frames": self.frames,
+            "ticks": self.ticks,
+            "rooms_pending": len(self.pending),
+        }
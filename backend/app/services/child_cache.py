@@ -0,0 +1,162 @@
+# ============================================================
+# BrainSpark Child State Cache
+# app/services/child_cache.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import sys
+import threading
+import time
+
+# ============================================================
+# ACHIEVEMENT BITMAP
+# ============================================================
+
+class AchievementBitmap:
+    """Maps achievement ids to bit positions (in definition order - only ever append)"""
+
+    def __init__(self, achievement_ids: List[str]):
+        self.ids = list(achievement_ids)
+        self.bits: Dict[str, int] = {a: 1 << i for i, a in enumerate(self.ids)}
+
+    def to_bits(self, achievement_ids: Optional[List[str]]) -> int:
+        bits = 0
+        for achievement_id in achievement_ids or []:
+            bits |= self.bits.get(achievement_id, 0)
+        return bits
+
+    def to_ids(self, bits: int) -> List[str]:
+        return [a for a in self.ids if bits & self.bits[a]]
+
+    def has(self, bits: int, achievement_id: str) -> bool:
+        return bool(bits & self.bits.get(achievement_id, 0))
+
+# ============================================================
+# CHILD STATE
+# ============================================================
+
+class ChildState:
+    """Hot gamification fields for one child - no ORM, no __dict__"""
+
+    __slots__ = (
+        "child_id", "stars", "total_xp", "streak", "max_depth", "total_questions",
+        "topics_explored", "achievement_bits", "daily_challenge_streak", "loaded_at",
+    )
+
+    def __init__(self, child_id: str, stars: int = 0, total_xp: int = 0, streak: int = 0,
+                 max_depth: int = 0, total_questions: int = 0, topics_explored: int = 0,
+                 achievement_bits: int = 0, daily_challenge_streak: int = 0):
+        self.child_id = child_id
+        self.stars = stars
+        self.total_xp = total_xp
+        self.streak = streak
+        self.max_depth = max_depth
+        self.total_questions = total_questions
+        self.topics_explored = topics_explored
+        self.achievement_bits = achievement_bits
+        self.daily_challenge_streak = daily_challenge_streak
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_profile(cls, child_id: str, profile, bitmap: AchievementBitmap) -> "ChildState":
+        """Copy the hot fields off a loaded profile object"""
+        achievements = getattr(profile, "unlocked_achievements", None)
+        if achievements is None:
+            achievements = getattr(profile, "achievements", None)
+        return cls(
+            child_id=child_id,
+            stars=getattr(profile, "stars", 0) or 0,
+            total_xp=getattr(profile, "total_xp", 0) or 0,
+            streak=getattr(profile, "streak", 0) or 0,
+            max_depth=getattr(profile, "max_depth", 0) or 0,
+            total_questions=getattr(profile, "total_questions", 0) or 0,
+            topics_explored=len(getattr(profile, "topics_explored", None) or []),
+            achievement_bits=bitmap.to_bits(achievements),
+            daily_challenge_streak=getattr(profile, "daily_challenge_streak", 0) or 0
+        )
+
+    def stats(self) -> dict:
+        """Same shape as GamificationEngine.get_child_stats"""
+        return {
+            "questions_asked": self.total_questions,
+            "max_depth": self.max_depth,
+            "streak": self.streak,
+            "topics_explored": self.topics_explored,
+            "stars": self.stars,
+            "daily_challenges_streak": self.daily_challenge_streak,
+        }
+
+# Measured once: slots object + OrderedDict slot + a 36-char uuid key
+ENTRY_BYTES = sys.getsizeof(ChildState("0" * 36)) + sys.getsizeof("0" * 36) + 100
+
+# ============================================================
+# LRU CACHE
+# ============================================================
+
+class ChildStateCache:
+    """Per-process LRU of ChildState, bounded by entry count and approximate bytes"""
+
+    def __init__(self, bitmap: AchievementBitmap, max_entries: int = 500_000,
+                 max_bytes: int = 128 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.bitmap = bitmap
+        self.max_entries = min(max_entries, max(1, max_bytes // ENTRY_BYTES))
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[str, ChildState] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, child_id: str) -> Optional[ChildState]:
+        with self.lock:
+            state = self.entries.get(child_id)
+            if state is None or time.monotonic() - state.loaded_at > self.ttl_seconds:
+                if state is not None:
+                    del self.entries[child_id]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(child_id)
+            self.hits += 1
+            return state
+
+    def put(self, state: ChildState) -> ChildState:
+        with self.lock:
+            self.entries[state.child_id] = state
+            self.entries.move_to_end(state.child_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return state
+
+    def put_profile(self, child_id: str, profile) -> Optional[ChildState]:
+        """Write-through after a profile change; the caller already holds the fresh values"""
+        if profile is None:
+            self.invalidate(child_id)
+            return None
+        return self.put(ChildState.from_profile(child_id, profile, self.bitmap))
+
+    def has_achievement(self, state: ChildState, achievement_id: str) -> bool:
+        return self.bitmap.has(state.achievement_bits, achievement_id)
+
+    def invalidate(self, child_id: str):
+        with self.lock:
+            self.entries.pop(child_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": len(self.entries) * ENTRY_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
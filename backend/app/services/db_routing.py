@@ -0,0 +1,193 @@
+# ============================================================
+# BrainSpark Read-Replica Routing
+# app/services/db_routing.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncio
+import itertools
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+# ============================================================
+# SQL
+# ============================================================
+
+PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn() AS lsn")
+
+# Caught up to the primary's LSN means no lag, even when the primary is idle
+# and pg_last_xact_replay_timestamp() is old
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_replay_lsn() >= CAST(:primary_lsn AS pg_lsn) THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END AS lag_seconds
+""")
+
+PIN_KEY = "db:pin:{key}"
+
+# ============================================================
+# REPLICAS
+# ============================================================
+
+@dataclass
+class Replica:
+    name: str
+    session_factory: Callable
+    healthy: bool = False  # Unknown until the first check passes
+    lag_seconds: float = 0.0
+    checked_at: float = 0.0
+    reads: int = 0
+
+class ReplicaRouter:
+    """Sends designated reads to a caught-up replica, everything else to the primary.
+
+    Reads fall back to the primary when no replica is healthy and within
+    max_lag_seconds, or when the caller wrote within the last pin_seconds
+    (read-your-writes). Pins live in Redis so every worker honours them.
+    """
+
+    def __init__(self, primary_factory: Optional[Callable] = None, replica_urls: Iterable[str] = (),
+                 max_lag_seconds: float = 2.0, pin_seconds: float = 5.0,
+                 check_interval: float = 1.0, redis=None, engine_options: Optional[dict] = None):
+        self.primary_factory = primary_factory
+        self.max_lag_seconds = max_lag_seconds
+        self.pin_seconds = pin_seconds
+        self.check_interval = check_interval
+        self.redis = redis
+        self.replicas: List[Replica] = []
+        self.next_replica = None
+        self.add_replicas(replica_urls, engine_options)
+        self.local_pins: Dict[str, float] = {}
+        self.task: Optional[asyncio.Task] = None
+        # Metrics
+        self.primary_reads = 0
+        self.pinned_reads = 0
+        self.fallback_reads = 0
+
+    def add_replicas(self, replica_urls: Iterable[str], engine_options: Optional[dict] = None):
+        options = {"pool_pre_ping": True, "pool_size": 10, **(engine_options or {})}
+        self.replicas += [
+            Replica(
+                name=url.rsplit("@", 1)[-1],  # host/db only - never log credentials
+                session_factory=sessionmaker(autocommit=False, autoflush=False, bind=create_engine(url, **options))
+            )
+            for url in replica_urls if url
+        ]
+        self.next_replica = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+
+    # -------------------- SESSIONS --------------------
+
+    def read_session(self, keys: Iterable[Optional[str]] = ()):
+        """A session for a read-only request about these users/children"""
+        if not self.replicas:
+            self.primary_reads += 1
+            return self.primary_factory()
+        if self.is_pinned(keys):
+            self.pinned_reads += 1
+            return self.primary_factory()
+        replica = self.pick()
+        if replica is None:
+            self.fallback_reads += 1
+            return self.primary_factory()
+        replica.reads += 1
+        return replica.session_factory()
+
+    def pick(self) -> Optional[Replica]:
+        """Round-robin over replicas that passed their last check within the lag budget"""
+        stale_after = time.monotonic() - 5 * self.check_interval
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self.next_replica)]
+            if replica.healthy and replica.lag_seconds <= self.max_lag_seconds and replica.checked_at >= stale_after:
+                return replica
+        return None
+
+    # -------------------- READ-YOUR-WRITES --------------------
+
+    def pin(self, *keys: Optional[str]):
+        """Route these keys' reads to the primary for pin_seconds (call after committing a write).
+
+        Keys are users ids - the caller's and the child's, as in /api/stats/{child_id} -
+        never child_profiles ids.
+        """
+        if not self.replicas:
+            return
+        until = time.monotonic() + self.pin_seconds
+        for key in map(str, filter(None, keys)):  # UUIDs and path strings must match
+            self.local_pins[key] = until
+            if self.redis is not None:
+                try:
+                    self.redis.set(PIN_KEY.format(key=key), 1, px=int(self.pin_seconds * 1000))
+                except Exception as e:
+                    print(f"Replica pin error: {e}")
+        if len(self.local_pins) > 10000:
+            now = time.monotonic()
+            self.local_pins = {k: t for k, t in self.local_pins.items() if t > now}
+
+    def is_pinned(self, keys: Iterable[Optional[str]]) -> bool:
+        keys = [str(k) for k in keys if k]
+        if not keys:
+            return False
+        now = time.monotonic()
+        if any(self.local_pins.get(k, 0) > now for k in keys):
+            return True  # Written through this worker - no Redis round trip
+        if self.redis is None:
+            return False
+        try:
+            return bool(self.redis.exists(*(PIN_KEY.format(key=k) for k in keys)))
+        except Exception:
+            return True  # Can't tell - the primary is always correct
+
+    # -------------------- LAG CHECKS --------------------
+
+    def start(self):
+        if self.replicas and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.check_interval)
+
+    def check(self):
+        try:
+            with self.primary_factory() as db:
+                primary_lsn = db.execute(PRIMARY_LSN_SQL).scalar()
+        except Exception as e:
+            print(f"Primary LSN check error: {e}")
+            primary_lsn = None  # Unknown - judge replicas by replay timestamp alone
+        for replica in self.replicas:
+            try:
+                with replica.session_factory() as db:
+                    replica.lag_seconds = float(db.execute(REPLICA_LAG_SQL, {"primary_lsn": primary_lsn}).scalar())
+                replica.healthy = True
+            except Exception as e:
+                if replica.healthy:
+                    print(f"Replica {replica.name} unavailable: {e}")
+                replica.healthy = False
+            replica.checked_at = time.monotonic()
+
+    def metrics(self) -> dict:
+        return {
+            "replicas": [
+                {"name": r.name, "healthy": r.healthy, "lag_seconds": round(r.lag_seconds, 3), "reads": r.reads}
+                for r in self.replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "pinned_reads": self.pinned_reads,
+            "fallback_reads": self.fallback_reads,
+        }
+
+# Shared by the API and the services that pin after their own commits; main.py
+# sets primary_factory, redis and the replicas
+db_router = ReplicaRouter()
@@ -8,9 +8,19 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Callable
 from enum import Enum
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import random
 import math
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .child_cache import AchievementBitmap, ChildState, ChildStateCache
+from .db_routing import db_router
+from .rewards import RewardEventKind, RewardEventLog
+from .tiered_cache import tiered_cache
+from .wallet import StarWallet
 
 # ============================================================
 # ENUMS & TYPES
@@ -136,6 +146,9 @@ ACHIEVEMENTS = [
     Achievement("perfect_week", "Perfect Week", "Complete daily challenges for 7 days", "💯", Rarity.EPIC, 200, 1000, {"daily_challenges_streak": 7}),
 ]
 
+# Hot per-child state shared by every engine in this process
+child_state_cache = ChildStateCache(AchievementBitmap([a.id for a in ACHIEVEMENTS]))
+
 # ============================================================
 # LEVEL SYSTEM
 # ============================================================
@@ -171,6 +184,113 @@ POWER_UPS = [
     PowerUp("topic_preview", "Topic Preview", "🔮", "Preview locked topics for 30 min", 30, {"type": "topic_preview", "value": True}, 125),
 ]
 
+# ============================================================
+# DAILY CHALLENGE CALENDAR
+# ============================================================
+
+DAILY_CHALLENGE_PROMPTS = [
+    ("Space", "If aliens visited Earth, what would you show them first?", "👽"),
+    ("Nature", "Why do you think leaves change color in autumn?", "🍂"),
+    ("Physics", "If you could control one force of nature, which would it be?", "⚡"),
+    ("Animals", "Design a new animal by combining two existing ones!", "🦄"),
+    ("Ocean", "What do you think lives at the very bottom of the ocean?", "🐙"),
+    ("Math", "If you had to explain zero to someone, how would you do it?", "🔢"),
+    ("History", "What invention from history would you un-invent and why?", "⚙️"),
+    ("Music", "If colors had sounds, what would red sound like?", "🎵"),
+]
+
+AGE_GROUPS = ["cubs", "explorers", "masters"]
+TOPIC_EMOJIS = {topic: emoji for topic, _, emoji in DAILY_CHALLENGE_PROMPTS}
+
+DAILY_CHALLENGES_SQL = text("""
+    SELECT dc.challenge_date, dc.age_group, t.name AS topic, t.emoji, dc.question, dc.stars_reward
+    FROM daily_challenges dc
+    LEFT JOIN topics t ON t.id = dc.topic_id
+    WHERE dc.challenge_date BETWEEN :start AND :end
+""")
+
+# Conditional claim: only one worker's UPDATE can add an achievement, however
+# stale its per-process cache is, so rewards are never granted twice
+CLAIM_ACHIEVEMENT_SQL = text("""
+    UPDATE child_profiles
+    SET achievements = COALESCE(achievements, '[]'::jsonb) || jsonb_build_array(CAST(:achievement_id AS TEXT))
+    WHERE id = :child_id
+      AND NOT COALESCE(achievements, '[]'::jsonb) @> jsonb_build_array(CAST(:achievement_id AS TEXT))
+    RETURNING achievements
+""")
+
+class ChallengeCalendar:
+    """Precomputed daily challenges per (date, age group), served from memory"""
+    
+    def __init__(self, session_factory: Optional[Callable] = None, days_ahead: int = 1):
+        self.session_factory = session_factory
+        self.days_ahead = days_ahead
+        self.entries: Dict[tuple, DailyChallenge] = {}
+        self.built_for: Optional[date] = None
+        self.lock = threading.Lock()
+    
+    def get(self, day: date, age_group: str) -> DailyChallenge:
+        """O(1) lookup; only rebuilds when the UTC day rolls over"""
+        if age_group not in AGE_GROUPS:
+            age_group = "explorers"
+        challenge = self.entries.get((day, age_group))
+        if challenge is None:
+            self.refresh(day)
+            challenge = self.entries.get((day, age_group)) or self.generate(day, age_group)
+        return challenge
+    
+    def refresh(self, today: Optional[date] = None):
+        """Rebuild today's and the next days' entries and swap them in atomically"""
+        today = today or datetime.utcnow().date()
+        with self.lock:
+            if self.built_for == today:
+                return
+            days = [today + timedelta(days=i) for i in range(self.days_ahead + 1)]
+            entries = {
+                (day, age_group): self.generate(day, age_group)
+                for day in days
+                for age_group in AGE_GROUPS
+            }
+            entries.update(self.load_overrides(days[0], days[-1]))
+            self.entries = entries
+            self.built_for = today
+    
+    def generate(self, day: date, age_group: str) -> DailyChallenge:
+        """Deterministic pick from a private RNG, identical across workers"""
+        rng = random.Random(f"{day.isoformat()}:{age_group}")
+        topic, question, emoji = rng.choice(DAILY_CHALLENGE_PROMPTS)
+        return self.build(day, age_group, topic, question, emoji, 50)
+    
+    def build(self, day: date, age_group: str, topic: str, question: str, emoji: str, stars_reward: int) -> DailyChallenge:
+        return DailyChallenge(
+            id=f"daily_{day.isoformat()}_{age_group}",
+            topic=topic,
+            question=question,
+            emoji=emoji,
+            stars_reward=stars_reward,
+            xp_reward=100,
+            expires_at=datetime.combine(day + timedelta(days=1), datetime.min.time())
+        )
+    
+    def load_overrides(self, start: date, end: date) -> Dict[tuple, DailyChallenge]:
+        """Curated rows from daily_challenges win over generated ones"""
+        if self.session_factory is None:
+            return {}
+        overrides = {}
+        with self.session_factory() as db:
+            for row in db.execute(DAILY_CHALLENGES_SQL, {"start": start, "end": end}):
+                topic = row.topic or "General"
+                emoji = row.emoji or TOPIC_EMOJIS.get(topic, "✨")
+                # A row without an age group applies to every group
+                for age_group in ([row.age_group] if row.age_group else AGE_GROUPS):
+                    overrides[(row.challenge_date, age_group)] = self.build(
+                        row.challenge_date, age_group, topic, row.question, emoji, row.stars_reward
+                    )
+        return overrides
+
+# Shared per process; call challenge_calendar.session_factory = SessionLocal to enable DB overrides
+challenge_calendar = ChallengeCalendar()
+
 # ============================================================
 # GAMIFICATION ENGINE CLASS
 # ============================================================
@@ -180,6 +300,8 @@ class GamificationEngine:
     
     def __init__(self, db_session):
         self.db = db_session
+        self.wallet = StarWallet(db_session)
+        self.rewards = RewardEventLog(db_session)
         
     # -------------------- XP & LEVELS --------------------
     
@@ -210,6 +332,7 @@ class GamificationEngine:
         final_amount = int(amount * multiplier)
         
         child.total_xp += final_amount
+        self.rewards.record(child_id, RewardEventKind.XP_AWARDED, final_amount, source)
         new_level, xp_in_level, xp_to_next = self.calculate_level(child.total_xp)
         
         result = {
@@ -228,26 +351,34 @@ class GamificationEngine:
             result["leveled_up"] = True
             result["rewards"] = self.process_level_rewards(child_id, new_level)
         
-        self.db.commit()
+        self.commit_child(child_id, child)
         return result
     
     # -------------------- STARS --------------------
     
     def award_stars(self, child_id: str, amount: int, source: str) -> dict:
         """Award stars with multiplier support"""
-        child = self.get_child(child_id)
         multiplier = self.get_active_multiplier(child_id, "star")
         final_amount = int(amount * multiplier)
         
-        child.stars += final_amount
-        self.db.commit()
+        if final_amount <= 0:
+            return {"stars_earned": 0, "total_stars": self.wallet.balance(child_id), "multiplier_active": multiplier > 1}
+        
+        # Atomic increment + ledger entry, no read-modify-write on the profile
+        transaction = self.wallet.credit(child_id, final_amount, source)
+        if transaction is None:
+            raise ValueError(f"Child profile {child_id} not found")
+        child = self.get_child(child_id)
+        self.wallet.sync_profile(child, transaction)
+        self.rewards.record(child_id, RewardEventKind.STARS_AWARDED, final_amount, source)
+        self.commit_child(child_id, child)
         
         # Check star-based achievements
         self.check_achievements(child_id)
         
         return {
             "stars_earned": final_amount,
-            "total_stars": child.stars,
+            "total_stars": transaction.balance_after,
             "multiplier_active": multiplier > 1
         }
     
@@ -271,21 +402,23 @@ class GamificationEngine:
             child.streak += 1
             child.longest_streak = max(child.longest_streak, child.streak)
             result["streak_increased"] = True
-        elif self.has_active_power_up(child_id, "streak_shield"):
-            # Streak shield protects
+        elif child.streak > 0 and self.has_active_power_up(child_id, "streak_shield"):
+            # Streak shield protects (the nightly rollover may already have spent it)
             result["shield_used"] = True
             self.consume_power_up(child_id, "streak_shield")
         else:
-            # Streak broken
-            if child.streak > 1:
+            # Streak broken - here, or already zeroed by the nightly rollover
+            lost = child.streak or child.lost_streak or 0
+            if lost > 1:
                 result["streak_lost"] = True
-                result["lost_streak"] = child.streak
+                result["lost_streak"] = lost
             child.streak = 1
         
+        child.lost_streak = 0
         child.streak_last_updated = today
         result["streak"] = child.streak
         
-        self.db.commit()
+        self.commit_child(child_id, child)
         self.check_achievements(child_id)
         
         return result
@@ -294,19 +427,33 @@ class GamificationEngine:
     
     def check_achievements(self, child_id: str) -> List[Achievement]:
         """Check and award any newly earned achievements"""
-        child = self.get_child(child_id)
-        stats = self.get_child_stats(child_id)
+        state = self.get_child_state(child_id)
+        stats = state.stats()
         newly_unlocked = []
         
         for achievement in ACHIEVEMENTS:
-            if achievement.id in child.unlocked_achievements:
+            if child_state_cache.has_achievement(state, achievement.id):
                 continue
             
             if self.evaluate_condition(achievement.condition, stats):
-                child.unlocked_achievements.append(achievement.id)
+                # The cache can lag the database but never lead it - the claim decides
+                claimed = self.db.execute(CLAIM_ACHIEVEMENT_SQL, {
+                    "child_id": child_id,
+                    "achievement_id": achievement.id
+                }).first()
+                if claimed is None:
+                    # Already unlocked (by another worker since this cache entry was loaded)
+                    state.achievement_bits |= child_state_cache.bitmap.bits.get(achievement.id, 0)
+                    continue
+                child = self.get_child(child_id)
+                set_committed_value(child, "unlocked_achievements", list(claimed.achievements))
+                child_state_cache.put_profile(child_id, child)
+                self.rewards.record(child_id, RewardEventKind.ACHIEVEMENT_UNLOCKED, 0, f"achievement:{achievement.id}")
                 self.award_stars(child_id, achievement.stars_reward, f"achievement:{achievement.id}")
                 self.award_xp(child_id, achievement.xp_reward, f"achievement:{achievement.id}")
                 newly_unlocked.append(achievement)
+                # Rewards above may have unlocked more via recursion
+                state = self.get_child_state(child_id)
         
         self.db.commit()
         return newly_unlocked
@@ -339,38 +486,13 @@ class GamificationEngine:
     
     # -------------------- DAILY CHALLENGES --------------------
     
-    def get_daily_challenge(self, child_id: str) -> DailyChallenge:
-        """Get or generate today's daily challenge"""
-        today = datetime.utcnow().date()
-        seed = int(today.strftime("%Y%m%d"))
-        random.seed(seed)
-        
-        challenges = [
-            ("Space", "If aliens visited Earth, what would you show them first?", "👽"),
-            ("Nature", "Why do you think leaves change color in autumn?", "🍂"),
-            ("Physics", "If you could control one force of nature, which would it be?", "⚡"),
-            ("Animals", "Design a new animal by combining two existing ones!", "🦄"),
-            ("Ocean", "What do you think lives at the very bottom of the ocean?", "🐙"),
-            ("Math", "If you had to explain zero to someone, how would you do it?", "🔢"),
-            ("History", "What invention from history would you un-invent and why?", "⚙️"),
-            ("Music", "If colors had sounds, what would red sound like?", "🎵"),
-        ]
-        
-        topic, question, emoji = random.choice(challenges)
-        
-        return DailyChallenge(
-            id=f"daily_{today.isoformat()}",
-            topic=topic,
-            question=question,
-            emoji=emoji,
-            stars_reward=50,
-            xp_reward=100,
-            expires_at=datetime.combine(today + timedelta(days=1), datetime.min.time())
-        )
+    def get_daily_challenge(self, child_id: str, age_group: str = "explorers") -> DailyChallenge:
+        """Get today's daily challenge (shared instance - don't mutate)"""
+        return challenge_calendar.get(datetime.utcnow().date(), age_group)
     
-    def complete_daily_challenge(self, child_id: str) -> dict:
+    def complete_daily_challenge(self, child_id: str, age_group: str = "explorers") -> dict:
         """Mark daily challenge as complete and award rewards"""
-        challenge = self.get_daily_challenge(child_id)
+        challenge = self.get_daily_challenge(child_id, age_group)
         
         stars = self.award_stars(child_id, challenge.stars_reward, "daily_challenge")
         xp = self.award_xp(child_id, challenge.xp_reward, "daily_challenge")
@@ -378,7 +500,7 @@ class GamificationEngine:
         # Update daily challenge streak
         child = self.get_child(child_id)
         child.daily_challenge_streak += 1
-        self.db.commit()
+        self.commit_child(child_id, child)
         
         achievements = self.check_achievements(child_id)
         
@@ -398,22 +520,25 @@ class GamificationEngine:
         if not power_up:
             return {"success": False, "error": "Power-up not found"}
         
-        child = self.get_child(child_id)
-        if child.stars < power_up.cost_stars:
+        # Conditional debit: balance check and spend happen in one UPDATE
+        transaction = self.wallet.debit(child_id, power_up.cost_stars, f"power_up:{power_up.id}")
+        if transaction is None:
             return {"success": False, "error": "Not enough stars"}
         
-        child.stars -= power_up.cost_stars
+        child = self.get_child(child_id)
+        self.wallet.sync_profile(child, transaction)
+        self.rewards.record(child_id, RewardEventKind.STARS_SPENT, power_up.cost_stars, transaction.source)
         expires_at = datetime.utcnow() + timedelta(minutes=power_up.duration_minutes)
         
         # Store active power-up
         self.activate_power_up(child_id, power_up, expires_at)
-        self.db.commit()
+        self.commit_child(child_id, child)
         
         return {
             "success": True,
             "power_up": power_up.name,
             "expires_at": expires_at.isoformat(),
-            "remaining_stars": child.stars
+            "remaining_stars": transaction.balance_after
         }
     
     def get_active_multiplier(self, child_id: str, multiplier_type: str) -> float:
@@ -465,7 +590,7 @@ class GamificationEngine:
         child = self.get_child(child_id)
         child.total_questions += 1
         child.max_depth = max(child.max_depth, depth)
-        self.db.commit()
+        self.commit_child(child_id, child)
         
         # Check achievements
         achievements = self.check_achievements(child_id)
@@ -484,17 +609,23 @@ class GamificationEngine:
         # Implementation depends on your ORM
         pass
     
+    def get_child_state(self, child_id: str) -> ChildState:
+        """Hot gamification fields, served from the per-process cache when possible"""
+        state = child_state_cache.get(child_id)
+        if state is None:
+            state = child_state_cache.put_profile(child_id, self.get_child(child_id))
+        return state
+    
+    def commit_child(self, child_id: str, child):
+        """Commit and write the child's fresh values through to the cache"""
+        self.db.commit()
+        child_state_cache.put_profile(child_id, child)
+        tiered_cache.invalidate("child_header", child_id)
+        db_router.pin(getattr(child, "user_id", None))  # Stats reads are keyed by the child's users id
+    
     def get_child_stats(self, child_id: str) -> dict:
         """Get comprehensive stats for achievement checking"""
-        child = self.get_child(child_id)
-        return {
-            "questions_asked": child.total_questions,
-            "max_depth": child.max_depth,
-            "streak": child.streak,
-            "topics_explored": len(child.topics_explored),
-            "stars": child.stars,
-            "daily_challenges_streak": child.daily_challenge_streak,
-        }
+        return self.get_child_state(child_id).stats()
     
     def activate_power_up(self, child_id: str, power_up: PowerUp, expires_at: datetime):
         """Store active power-up in database"""
@@ -0,0 +1,479 @@
+# ============================================================
+# BrainSpark Quick-Match Matchmaking
+# app/services/matchmaking.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
+
+# ============================================================
+# BUCKETS
+# ============================================================
+
+# A bucket is "age_group|challenge_type|topic"; "*" marks a widened field.
+# Level 0 is exact, level 1 any topic, level 2 any topic and age group.
+WIDEN_AFTER_SECONDS = (10.0, 25.0)
+FILL_AFTER_SECONDS = 8.0
+TICKET_TTL_SECONDS = 600
+RESULT_TTL_SECONDS = 120
+MAX_SEAT_ATTEMPTS = 5
+
+def bucket_chain(age_group: str, challenge_type: str, topic: str) -> List[str]:
+    """Exact bucket first, then each wider one a ticket may end up in"""
+    return [
+        f"{age_group}|{challenge_type}|{topic}",
+        f"{age_group}|{challenge_type}|*",
+        f"*|{challenge_type}|*",
+    ]
+
+def bucket_level(bucket: str) -> int:
+    return bucket.count("*")
+
+def widen(bucket: str) -> Optional[str]:
+    age_group, challenge_type, topic = bucket.split("|")
+    if topic != "*":
+        return f"{age_group}|{challenge_type}|*"
+    if age_group != "*":
+        return f"*|{challenge_type}|*"
+    return None
+
+def challenge_type_of(bucket: str) -> str:
+    return bucket.split("|")[1]
+
+# ============================================================
+# IN-PROCESS POOL
+# ============================================================
+
+class LocalMatchPool:
+    """Single-worker pool: FIFO per bucket, open seats per bucket"""
+
+    def __init__(self):
+        self.buckets: Dict[str, OrderedDict[str, dict]] = {}  # bucket -> player_id -> entry (oldest first)
+        self.seats: Dict[str, Deque[str]] = {}                # bucket -> room_id per free seat
+        self.tickets: Dict[str, str] = {}                     # player_id -> bucket, or "matching"
+        self.results: Dict[str, Tuple[float, dict]] = {}
+
+    async def enqueue(self, entry: dict, chain: List[str], use_seats: bool) -> Tuple[str, Optional[str]]:
+        """('seat', room_id), ('queued', bucket) or ('duplicate', None)"""
+        player_id = entry["player"]["id"]
+        if player_id in self.tickets:
+            return "duplicate", None
+        if use_seats:
+            for bucket in chain:
+                seats = self.seats.get(bucket)
+                if seats:
+                    room_id = seats.popleft()
+                    if not seats:
+                        del self.seats[bucket]
+                    return "seat", room_id
+        # Join the narrowest bucket someone is already waiting in
+        target = next((b for b in chain if self.buckets.get(b)), chain[0])
+        self.buckets.setdefault(target, OrderedDict())[player_id] = entry
+        self.tickets[player_id] = target
+        return "queued", target
+
+    async def take(self, bucket: str, max_players: int, min_players: int, fill_cutoff: float) -> List[dict]:
+        queue = self.buckets.get(bucket)
+        if not queue:
+            return []
+        if len(queue) < max_players:
+            head = next(iter(queue.values()))
+            if len(queue) < min_players or head["enqueued_at"] > fill_cutoff:
+                return []
+        taken = []
+        while queue and len(taken) < max_players:
+            player_id, entry = queue.popitem(last=False)
+            self.tickets[player_id] = "matching"
+            taken.append(entry)
+        if not queue:
+            del self.buckets[bucket]
+        return taken
+
+    async def widen(self, bucket: str, target: str, cutoff: float) -> int:
+        queue = self.buckets.get(bucket)
+        moved = 0
+        while queue:
+            player_id, entry = next(iter(queue.items()))
+            if entry["enqueued_at"] > cutoff:
+                break
+            queue.popitem(last=False)
+            self.buckets.setdefault(target, OrderedDict())[player_id] = entry
+            self.tickets[player_id] = target
+            moved += 1
+        if queue is not None and not queue:
+            del self.buckets[bucket]
+        return moved
+
+    async def cancel(self, player_id: str) -> bool:
+        bucket = self.tickets.get(player_id)
+        if bucket is None or bucket == "matching":
+            return False
+        del self.tickets[player_id]
+        queue = self.buckets.get(bucket)
+        if queue is not None:
+            queue.pop(player_id, None)
+            if not queue:
+                del self.buckets[bucket]
+        return True
+
+    async def expire(self, now: float) -> int:
+        """Drop tickets older than the TTL (players who walked away)"""
+        cutoff = now - TICKET_TTL_SECONDS
+        expired = 0
+        for bucket in list(self.buckets):
+            queue = self.buckets[bucket]
+            while queue and next(iter(queue.values()))["enqueued_at"] < cutoff:
+                player_id, _ = queue.popitem(last=False)
+                self.tickets.pop(player_id, None)
+                expired += 1
+            if not queue:
+                del self.buckets[bucket]
+        for player_id in [p for p, (at, _) in self.results.items() if at < now - RESULT_TTL_SECONDS]:
+            del self.results[player_id]
+        return expired
+
+    async def add_seats(self, bucket: str, room_id: str, count: int):
+        self.seats.setdefault(bucket, deque()).extend([room_id] * count)
+
+    async def close_seats(self, bucket: str, room_id: str):
+        seats = self.seats.get(bucket)
+        if seats:
+            remaining = deque(r for r in seats if r != room_id)
+            if remaining:
+                self.seats[bucket] = remaining
+            else:
+                del self.seats[bucket]
+
+    async def set_result(self, player_id: str, result: dict):
+        self.tickets.pop(player_id, None)
+        self.results[player_id] = (time.time(), result)
+
+    async def status(self, player_id: str) -> Tuple[Optional[str], Optional[dict]]:
+        """(bucket or 'matching' if still queued, match result if matched)"""
+        found = self.results.get(player_id)
+        return self.tickets.get(player_id), found[1] if found else None
+
+    async def clear_result(self, player_id: str):
+        self.results.pop(player_id, None)
+
+    async def active_buckets(self) -> List[str]:
+        return list(self.buckets)
+
+    async def waiting(self) -> int:
+        return sum(len(q) for q in self.buckets.values())
+
+# ============================================================
+# REDIS POOL (shared across workers)
+# ============================================================
+
+MM_BUCKET_KEY = "mp:mm:q:{bucket}"         # list of ticket JSON, oldest first
+MM_SEATS_KEY = "mp:mm:seats:{bucket}"      # list of room_id, one per free seat
+MM_TICKET_KEY = "mp:mm:ticket:{player_id}"  # string: current bucket, or "matching"
+MM_RESULT_KEY = "mp:mm:result:{player_id}"  # string: match result JSON
+MM_ACTIVE_KEY = "mp:mm:active"              # set of non-empty buckets
+MM_TICKET_PREFIX = "mp:mm:ticket:"
+
+# KEYS: 3 bucket lists, 3 seat lists (narrowest first), ticket key, active set
+# ARGV: entry JSON, use_seats, ticket ttl, 3 bucket names
+ENQUEUE_LUA = """
+if redis.call('EXISTS', KEYS[7]) == 1 then return {'duplicate', ''} end
+if ARGV[2] == '1' then
+  for i = 4, 6 do
+    local seat = redis.call('LPOP', KEYS[i])
+    if seat then return {'seat', seat} end
+  end
+end
+local target = 1
+for i = 1, 3 do
+  if redis.call('LLEN', KEYS[i]) > 0 then target = i break end
+end
+redis.call('RPUSH', KEYS[target], ARGV[1])
+redis.call('SET', KEYS[7], ARGV[3 + target], 'EX', tonumber(ARGV[3]))
+redis.call('SADD', KEYS[8], ARGV[3 + target])
+return {'queued', ARGV[3 + target]}
+"""
+
+# Claim up to max live tickets (cancelled/expired ones are skipped lazily).
+# KEYS: bucket list, active set. ARGV: max, min, fill cutoff, bucket name, ticket prefix, ticket ttl
+TAKE_LUA = """
+local max_players = tonumber(ARGV[1])
+local min_players = tonumber(ARGV[2])
+local n = redis.call('LLEN', KEYS[1])
+if n == 0 then redis.call('SREM', KEYS[2], ARGV[4]) return {} end
+if n < max_players then
+  local head = cjson.decode(redis.call('LINDEX', KEYS[1], 0))
+  if n < min_players or head['enqueued_at'] > tonumber(ARGV[3]) then return {} end
+end
+local taken = {}
+while #taken < max_players do
+  local entry = redis.call('LPOP', KEYS[1])
+  if not entry then break end
+  local key = ARGV[5] .. cjson.decode(entry)['player']['id']
+  if redis.call('GET', key) == ARGV[4] then
+    redis.call('SET', key, 'matching', 'EX', 60)
+    table.insert(taken, entry)
+  end
+end
+if #taken < min_players then
+  for i = #taken, 1, -1 do
+    redis.call('LPUSH', KEYS[1], taken[i])
+    redis.call('SET', ARGV[5] .. cjson.decode(taken[i])['player']['id'], ARGV[4], 'EX', tonumber(ARGV[6]))
+  end
+  taken = {}
+end
+if redis.call('LLEN', KEYS[1]) == 0 then redis.call('SREM', KEYS[2], ARGV[4]) end
+return taken
+"""
+
+# Move tickets older than the cutoff to the wider bucket.
+# KEYS: source list, target list, active set. ARGV: cutoff, source name, target name, ticket prefix, ttl
+WIDEN_LUA = """
+local moved = 0
+while true do
+  local entry = redis.call('LINDEX', KEYS[1], 0)
+  if not entry then break end
+  local ticket = cjson.decode(entry)
+  if ticket['enqueued_at'] > tonumber(ARGV[1]) then break end
+  redis.call('LPOP', KEYS[1])
+  local key = ARGV[4] .. ticket['player']['id']
+  if redis.call('GET', key) == ARGV[2] then
+    redis.call('RPUSH', KEYS[2], entry)
+    redis.call('SET', key, ARGV[3], 'EX', tonumber(ARGV[5]))
+    moved = moved + 1
+  end
+end
+if moved > 0 then redis.call('SADD', KEYS[3], ARGV[3]) end
+if redis.call('LLEN', KEYS[1]) == 0 then redis.call('SREM', KEYS[3], ARGV[2]) end
+return moved
+"""
+
+# Cancel only while still queued - a ticket being matched can't be pulled back
+CANCEL_LUA = """
+local state = redis.call('GET', KEYS[1])
+if not state or state == 'matching' then return 0 end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+class RedisMatchPool:
+    """Same contract as LocalMatchPool, shared by every worker through Redis"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.enqueue_script = redis.register_script(ENQUEUE_LUA)
+        self.take_script = redis.register_script(TAKE_LUA)
+        self.widen_script = redis.register_script(WIDEN_LUA)
+        self.cancel_script = redis.register_script(CANCEL_LUA)
+
+    async def enqueue(self, entry: dict, chain: List[str], use_seats: bool) -> Tuple[str, Optional[str]]:
+        keys = [MM_BUCKET_KEY.format(bucket=b) for b in chain]
+        keys += [MM_SEATS_KEY.format(bucket=b) for b in chain]
+        keys += [MM_TICKET_KEY.format(player_id=entry["player"]["id"]), MM_ACTIVE_KEY]
+        kind, value = await self.enqueue_script(
+            keys=keys, args=[json.dumps(entry), "1" if use_seats else "0", TICKET_TTL_SECONDS, *chain]
+        )
+        return kind, value or None
+
+    async def take(self, bucket: str, max_players: int, min_players: int, fill_cutoff: float) -> List[dict]:
+        taken = await self.take_script(
+            keys=[MM_BUCKET_KEY.format(bucket=bucket), MM_ACTIVE_KEY],
+            args=[max_players, min_players, fill_cutoff, bucket, MM_TICKET_PREFIX, TICKET_TTL_SECONDS]
+        )
+        return [json.loads(e) for e in taken]
+
+    async def widen(self, bucket: str, target: str, cutoff: float) -> int:
+        return int(await self.widen_script(
+            keys=[MM_BUCKET_KEY.format(bucket=bucket), MM_BUCKET_KEY.format(bucket=target), MM_ACTIVE_KEY],
+            args=[cutoff, bucket, target, MM_TICKET_PREFIX, TICKET_TTL_SECONDS]
+        ))
+
+    async def cancel(self, player_id: str) -> bool:
+        return bool(await self.cancel_script(keys=[MM_TICKET_KEY.format(player_id=player_id)]))
+
+    async def expire(self, now: float) -> int:
+        return 0  # Ticket and result keys carry their own TTL; dead list entries are skipped on take
+
+    async def add_seats(self, bucket: str, room_id: str, count: int):
+        await self.redis.rpush(MM_SEATS_KEY.format(bucket=bucket), *([room_id] * count))
+
+    async def close_seats(self, bucket: str, room_id: str):
+        await self.redis.lrem(MM_SEATS_KEY.format(bucket=bucket), 0, room_id)
+
+    async def set_result(self, player_id: str, result: dict):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(MM_TICKET_KEY.format(player_id=player_id))
+            pipe.set(MM_RESULT_KEY.format(player_id=player_id), json.dumps(result), ex=RESULT_TTL_SECONDS)
+            await pipe.execute()
+
+    async def status(self, player_id: str) -> Tuple[Optional[str], Optional[dict]]:
+        ticket, result = await self.redis.mget(
+            MM_TICKET_KEY.format(player_id=player_id), MM_RESULT_KEY.format(player_id=player_id)
+        )
+        return ticket, json.loads(result) if result else None
+
+    async def clear_result(self, player_id: str):
+        await self.redis.delete(MM_RESULT_KEY.format(player_id=player_id))
+
+    async def active_buckets(self) -> List[str]:
+        return list(await self.redis.smembers(MM_ACTIVE_KEY))
+
+    async def waiting(self) -> int:
+        buckets = await self.active_buckets()
+        if not buckets:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for bucket in buckets:
+                pipe.llen(MM_BUCKET_KEY.format(bucket=bucket))
+            return sum(await pipe.execute())
+
+# ============================================================
+# MATCHMAKER
+# ============================================================
+
+# form_room(bucket, entries) -> result dict with at least "room_id"
+RoomFormer = Callable[[str, List[dict]], Awaitable[dict]]
+# take_seat(room_id, player) -> result dict, or None if the seat has gone
+SeatTaker = Callable[[str, dict], Awaitable[Optional[dict]]]
+# notify(player_id, result) - push to a locally connected player
+MatchNotifier = Callable[[str, dict], Awaitable[None]]
+
+class QuickMatchmaker:
+    """Pools waiting players by age group, challenge type and topic and forms rooms"""
+
+    def __init__(self, pool, form_room: RoomFormer, take_seat: SeatTaker,
+                 notify: Optional[MatchNotifier] = None,
+                 max_players: int = 4, min_players: int = 2, sweep_seconds: float = 1.0):
+        self.pool = pool
+        self.form_room = form_room
+        self.take_seat = take_seat
+        self.notify = notify
+        self.max_players = max_players
+        self.min_players = min_players
+        self.sweep_seconds = sweep_seconds
+        self.task: Optional[asyncio.Task] = None
+        # Metrics
+        self.enqueued = 0
+        self.matched = 0
+        self.rooms_formed = 0
+        self.seats_filled = 0
+        self.widened = 0
+        self.total_wait = 0.0
+
+    def use_pool(self, pool):
+        """Swap pools (e.g. to Redis once the backplane is up) - only before players queue"""
+        self.pool = pool
+
+    async def enqueue(self, player: dict, challenge_type: str, topic: str) -> dict:
+        """Queue a player; returns {"status": "matched", ...} straight away if a seat or group is ready"""
+        await self.pool.clear_result(player["id"])
+        entry = {
+            "player": player,
+            "challenge_type": challenge_type,
+            "topic": topic,
+            "enqueued_at": time.time(),
+        }
+        chain = bucket_chain(player.get("age_group", "explorers"), challenge_type, topic)
+
+        for attempt in range(MAX_SEAT_ATTEMPTS + 1):
+            kind, value = await self.pool.enqueue(entry, chain, use_seats=attempt < MAX_SEAT_ATTEMPTS)
+            if kind != "seat":
+                break
+            result = await self.take_seat(value, player)
+            if result:  # Otherwise the room filled or started - the stale seat is gone, try again
+                self.enqueued += 1
+                self.matched += 1
+                self.seats_filled += 1
+                await self.pool.set_result(player["id"], result)
+                return {"status": "matched", **result}
+
+        if kind == "duplicate":
+            return {"status": "queued"}
+        self.enqueued += 1
+        await self.try_match(value)
+        _, result = await self.pool.status(player["id"])
+        if result:
+            return {"status": "matched", **result}
+        return {"status": "queued", "bucket": value}
+
+    async def cancel(self, player_id: str) -> bool:
+        return await self.pool.cancel(player_id)
+
+    async def status(self, player_id: str) -> dict:
+        ticket, result = await self.pool.status(player_id)
+        if result:
+            return {"status": "matched", **result}
+        if ticket:
+            return {"status": "queued" if ticket != "matching" else "matching", "bucket": ticket}
+        return {"status": "idle"}
+
+    async def try_match(self, bucket: str, now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        entries = await self.pool.take(bucket, self.max_players, self.min_players, now - FILL_AFTER_SECONDS)
+        if not entries:
+            return False
+
+        result = await self.form_room(bucket, entries)
+        self.rooms_formed += 1
+        self.matched += len(entries)
+        self.total_wait += sum(now - e["enqueued_at"] for e in entries)
+        for entry in entries:
+            player_id = entry["player"]["id"]
+            await self.pool.set_result(player_id, result)
+            if self.notify:
+                await self.notify(player_id, result)
+        if len(entries) < self.max_players:
+            await self.pool.add_seats(bucket, result["room_id"], self.max_players - len(entries))
+        return True
+
+    async def room_started(self, bucket: Optional[str], room_id: str):
+        """A matched room left the lobby - stop handing out its seats"""
+        if bucket:
+            await self.pool.close_seats(bucket, room_id)
+
+    async def sweep(self, now: Optional[float] = None):
+        """Widen long waits, then form full or fill-due groups - touches buckets, never rooms"""
+        now = now or time.time()
+        await self.pool.expire(now)
+        for bucket in sorted(await self.pool.active_buckets(), key=bucket_level):
+            # Follow the chain so tickets widened this sweep can match this sweep
+            while bucket:
+                while await self.try_match(bucket, now):
+                    pass
+                target = widen(bucket)
+                if not target:
+                    break
+                moved = await self.pool.widen(bucket, target, now - WIDEN_AFTER_SECONDS[bucket_level(bucket)])
+                self.widened += moved
+                bucket = target if moved else None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Matchmaker sweep error: {e}")
+
+    async def metrics(self) -> dict:
+        return {
+            "waiting": await self.pool.waiting(),
+            "enqueued": self.enqueued,
+            "matched": self.matched,
+            "rooms_formed": self.rooms_formed,
+            "seats_filled": self.seats_filled,
+            "widened": self.widened,
+            "avg_wait_seconds": round(self.total_wait / max(1, self.matched - self.seats_filled), 2),
+        }
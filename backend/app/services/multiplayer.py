@@ -11,10 +11,25 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 import asyncio
-import json
+import functools
+import os
 import random
+import sys
+import time
 import uuid
 
+from .backplane import ROOM_FULL, ROOM_MISSING, ROOM_STARTED, SYSTEM, RoomBackplane
+from .matchmaking import LocalMatchPool, QuickMatchmaker, RedisMatchPool, challenge_type_of
+from .question_bank import BankQuestion, question_bank
+from .ai_scoring import CreativeAnswer, creative_scoring
+from .chat import ChatCoalescer, ChatLine
+from .result_writer import ChallengeRecord, GameResult, PlayerResult, result_writer
+from .sessions import ReplayStore, issue_resume_token, verify_resume_token
+from .protocol import (
+    JSON, MSGPACK, OutboundFrame, StandingsHistory, decode_client_message, negotiate_encoding
+)
+from .timer_wheel import WheelTimer, timer_wheel
+
 # ============================================================
 # ENUMS & TYPES
 # ============================================================
@@ -36,6 +51,11 @@ class FriendStatus(Enum):
     ACCEPTED = "accepted"
     BLOCKED = "blocked"
 
+class SlowConsumerPolicy(Enum):
+    DROP = "drop"              # Drop the incoming frame, keep what's queued
+    COALESCE = "coalesce"      # Drop the oldest queued frame so the newest state gets through
+    DISCONNECT = "disconnect"  # Close the socket; the client reconnects and resyncs
+
 # ============================================================
 # DATA MODELS
 # ============================================================
@@ -50,6 +70,10 @@ class Player:
     answers: List[dict] = field(default_factory=list)
     is_ready: bool = False
     connected: bool = True
+    slot: int = 0  # Short per-room id used by the compact protocol
+    
+    def to_public(self) -> dict:
+        return {"id": self.id, "name": self.name, "avatar": self.avatar, "age_group": self.age_group}
 
 @dataclass
 class GameRoom:
@@ -66,6 +90,24 @@ class GameRoom:
     started_at: Optional[datetime] = None
     ended_at: Optional[datetime] = None
     settings: dict = field(default_factory=dict)
+    last_activity: datetime = field(default_factory=datetime.utcnow)
+    next_slot: int = 1
+    
+    def seat(self, player: Player) -> Player:
+        """Add a player, giving them the room's next slot (kept if they rejoin)"""
+        existing = self.players.get(player.id)
+        player.slot = existing.slot if existing else self.next_slot
+        if not existing:
+            self.next_slot += 1
+        self.players[player.id] = player
+        return player
+    
+    def roster(self) -> List[list]:
+        """[slot, id, name, avatar] per player - sent once so later frames can use slots"""
+        return [[p.slot, p.id, p.name, p.avatar] for p in self.players.values()]
+    
+    def standings(self) -> Dict[int, int]:
+        return {p.slot: p.score for p in self.players.values()}
 
 @dataclass
 class Challenge:
@@ -99,8 +141,8 @@ MULTIPLAYER_QUESTIONS = {
         {"q": "What force keeps planets in orbit?", "a": "Gravity", "points": 15, "time": 20},
     ],
     "Nature": [
-        {"q": "What gas do plants breathe in?", "a": "Carbon dioxide", "points": 15, "time": 20},
-        {"q": "What is the largest rainforest?", "a": "Amazon", "points": 10, "time": 15},
+        {"q": "What gas do plants breathe in?", "a": "Carbon dioxide", "aliases": ["CO2"], "points": 15, "time": 20},
+        {"q": "What is the largest rainforest?", "a": "Amazon", "aliases": ["Amazon rainforest"], "points": 10, "time": 15},
         {"q": "What do bees collect from flowers?", "a": "Nectar/Pollen", "points": 10, "time": 15},
         {"q": "What is the process plants use to make food?", "a": "Photosynthesis", "points": 20, "time": 25},
     ],
@@ -113,7 +155,7 @@ MULTIPLAYER_QUESTIONS = {
     "General": [
         {"q": "What color do you get mixing blue and yellow?", "a": "Green", "points": 10, "time": 15},
         {"q": "How many continents are there?", "a": "7", "points": 10, "time": 15},
-        {"q": "What is the largest ocean?", "a": "Pacific", "points": 15, "time": 20},
+        {"q": "What is the largest ocean?", "a": "Pacific", "aliases": ["Pacific Ocean"], "points": 15, "time": 20},
     ]
 }
 
@@ -133,25 +175,148 @@ CREATIVE_PROMPTS = [
     "What would happen if gravity reversed for one day?",
 ]
 
+question_bank.load_builtin(MULTIPLAYER_QUESTIONS, RIDDLES, CREATIVE_PROMPTS)
+
+QUESTION_KINDS = {ChallengeType.RIDDLE_BATTLE: "riddle", ChallengeType.CREATIVE_CLASH: "prompt"}
+
+ROUND_PAUSE_SECONDS = 5.0
+CREATIVE_POINTS_PER_SCORE = 3  # AI score 1-10 on top of the 10 points for taking part
+MAX_ANSWER_LENGTH = 500
+WINNER_STARS = 100
+PARTICIPANT_STARS = 25
+
 # ============================================================
 # WEBSOCKET CONNECTION MANAGER
 # ============================================================
 
+class PlayerConnection:
+    """One socket with its own bounded outbound queue and writer task"""
+    
+    def __init__(self, websocket: WebSocket, player_id: str, max_queue: int,
+                 policy: SlowConsumerPolicy, send_timeout: float, encoding: str = JSON):
+        self.websocket = websocket
+        self.player_id = player_id
+        self.encoding = encoding
+        self.standings_ack = 0  # Last standings version the client confirmed (compact protocol)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.last_seen = time.monotonic()
+        self.writer_task = asyncio.create_task(self.write_loop())
+    
+    def touch(self):
+        self.last_seen = time.monotonic()
+    
+    def enqueue(self, frame) -> bool:
+        """Never blocks; applies the slow-consumer policy when the queue is full"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.policy == SlowConsumerPolicy.COALESCE:
+                self.queue.get_nowait()
+                self.queue.put_nowait(frame)
+                return True
+            if self.policy == SlowConsumerPolicy.DISCONNECT:
+                self.close(code=1013)  # Try again later
+            return False
+    
+    async def write_loop(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if isinstance(frame, bytes):
+                    send = self.websocket.send_bytes(frame)
+                else:
+                    send = self.websocket.send_text(frame)
+                await asyncio.wait_for(send, timeout=self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Dead or stuck socket - stop writing; the receive loop sees the disconnect
+            self.close(code=1011)
+    
+    def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+        asyncio.create_task(self.close_socket(code))
+    
+    async def close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # Already closed
+
 class ConnectionManager:
     """Manages WebSocket connections for multiplayer"""
     
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.rooms: Dict[str, GameRoom] = {}
+    def __init__(self, max_queue: int = 64,
+                 slow_consumer_policy: SlowConsumerPolicy = SlowConsumerPolicy.COALESCE,
+                 send_timeout: float = 10.0):
+        self.active_connections: Dict[str, PlayerConnection] = {}
+        self.rooms: Dict[str, GameRoom] = {}                # Rooms whose game runs on this node
         self.player_rooms: Dict[str, str] = {}  # player_id -> room_id
+        self.room_sockets: Dict[str, Set[str]] = {}         # room_id -> locally connected player_ids
+        self.games: Dict[str, "MultiplayerGame"] = {}       # room_id -> running game actor
+        self.backplane: Optional[RoomBackplane] = None
+        self.standings = StandingsHistory()
+        self.replay = ReplayStore()
+        self.room_seq: Dict[str, int] = {}                  # room_id -> last seq (rooms run here)
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
         
-    async def connect(self, websocket: WebSocket, player_id: str):
-        await websocket.accept()
-        self.active_connections[player_id] = websocket
+    async def enable_backplane(self, backplane: RoomBackplane):
+        """Share rooms across workers/instances through Redis"""
+        self.backplane = backplane
+        await backplane.start(self.deliver_frame, handle_relayed_message)
         
-    def disconnect(self, player_id: str):
-        if player_id in self.active_connections:
+    async def connect(self, websocket: WebSocket, player_id: str, room_id: Optional[str] = None,
+                      encoding: str = JSON, subprotocol: Optional[str] = None):
+        await websocket.accept(subprotocol=subprotocol)
+        previous = self.active_connections.get(player_id)
+        if previous:
+            previous.close(code=4000)  # Replaced by a newer connection
+        self.active_connections[player_id] = PlayerConnection(
+            websocket, player_id, self.max_queue, self.slow_consumer_policy, self.send_timeout, encoding
+        )
+        if room_id in self.rooms and player_id in self.rooms[room_id].players:
+            self.rooms[room_id].players[player_id].connected = True
+        if room_id:
+            sockets = self.room_sockets.setdefault(room_id, set())
+            if player_id not in sockets:
+                sockets.add(player_id)
+                if self.backplane:
+                    await self.backplane.watch_room(room_id)
+        
+    async def leave_room_sockets(self, room_id: str, player_id: str):
+        sockets = self.room_sockets.get(room_id)
+        if sockets and player_id in sockets:
+            sockets.discard(player_id)
+            if not sockets:
+                del self.room_sockets[room_id]
+                if room_id not in self.rooms:
+                    self.standings.drop(room_id)
+                    self.replay.drop(room_id)
+            if self.backplane:
+                await self.backplane.unwatch_room(room_id)
+        
+    def disconnect(self, player_id: str, websocket: Optional[WebSocket] = None) -> bool:
+        """False if a newer socket (e.g. a resume) already replaced this one"""
+        connection = self.active_connections.get(player_id)
+        if connection and (websocket is None or connection.websocket is websocket):
             del self.active_connections[player_id]
+            connection.close()
+        elif connection:
+            return False
         
         # Handle player leaving room
         if player_id in self.player_rooms:
@@ -160,56 +325,390 @@ class ConnectionManager:
                 room = self.rooms[room_id]
                 if player_id in room.players:
                     room.players[player_id].connected = False
+        return True
                     
-    async def send_to_player(self, player_id: str, message: dict):
-        if player_id in self.active_connections:
-            await self.active_connections[player_id].send_json(message)
-            
-    async def broadcast_to_room(self, room_id: str, message: dict, exclude: Set[str] = None):
+    def next_seq(self, room_id: Optional[str]) -> int:
+        """Only the node running a room numbers its frames; others send unsequenced ones"""
         if room_id not in self.rooms:
+            return 0
+        seq = self.room_seq[room_id] = self.room_seq.get(room_id, 0) + 1
+        return seq
+    
+    def current_seq(self, room_id: str) -> int:
+        return self.room_seq.get(room_id) or self.replay.last_seq(room_id)
+    
+    async def send_to_player(self, player_id: str, message: dict, compact: Optional[dict] = None):
+        connection = self.active_connections.get(player_id)
+        room_id = self.player_rooms.get(player_id)
+        frame = OutboundFrame(message, compact, seq=self.next_seq(room_id))
+        if connection:
+            self.deliver_frame(room_id, frame, to=player_id)
+        elif self.backplane and room_id:
+            # Player's socket lives on another node
+            await self.backplane.publish_frame(room_id, frame.wire(), [], to=player_id)
+        elif frame.seq:
+            self.replay.record(room_id, frame, to=player_id)  # Briefly offline - kept for resume
+            
+    async def broadcast_to_room(self, room_id: str, message: dict, exclude: Set[str] = None,
+                                compact: Optional[dict] = None, standings: Optional[tuple] = None):
+        """message goes to JSON clients; compact (+ standings delta) to MessagePack clients"""
+        if room_id not in self.rooms and room_id not in self.room_sockets and not self.backplane:
             return
             
         exclude = exclude or set()
-        room = self.rooms[room_id]
+        frame = OutboundFrame(message, compact, standings, seq=self.next_seq(room_id))
+        self.deliver_frame(room_id, frame, exclude)
         
-        for player_id in room.players:
-            if player_id not in exclude and player_id in self.active_connections:
-                await self.active_connections[player_id].send_json(message)
+        if self.backplane:
+            await self.backplane.publish_frame(room_id, frame.wire(), list(exclude))
+    
+    def encode_for(self, connection: PlayerConnection, room_id: Optional[str], frame: OutboundFrame):
+        """Shared encoded bytes for this connection's encoding and acked standings"""
+        if connection.encoding != MSGPACK:
+            return frame.json_frame()
+        if frame.standings is None or room_id is None:
+            return frame.msgpack_frame()
+        base = self.standings.get(room_id, connection.standings_ack)
+        return frame.msgpack_frame(connection.standings_ack, base)
+    
+    def ack_standings(self, player_id: str, version: int):
+        connection = self.active_connections.get(player_id)
+        if connection and isinstance(version, int):
+            connection.standings_ack = version
+    
+    def deliver_frame(self, room_id: str, frame, exclude=(), to: Optional[str] = None):
+        """Fan a frame out to this node's sockets in the room, encoding once per variant"""
+        if isinstance(frame, str):
+            frame = OutboundFrame.from_wire(frame)  # Relayed by the backplane
+        if frame.standings is not None:
+            self.standings.record(room_id, *frame.standings)
+        if frame.seq:
+            self.replay.record(room_id, frame, to, exclude)
+        
+        if to is not None:
+            recipients = [to]
+        else:
+            recipients = set(self.room_sockets.get(room_id, ()))
+            if room_id in self.rooms:
+                recipients.update(self.rooms[room_id].players)
+        
+        # Enqueue only - each connection's writer task does the actual send,
+        # so one slow or broken socket can't stall or abort the others
+        for player_id in recipients:
+            if player_id not in exclude:
+                connection = self.active_connections.get(player_id)
+                if connection:
+                    connection.enqueue(self.encode_for(connection, room_id, frame))
+        if to is None:
+            spectators.publish(room_id, frame)  # After the players, off this call path
+    
+    def send_direct(self, player_id: str, message: dict, compact: Optional[dict] = None):
+        """Unsequenced frame straight to a local socket (session control, pings)"""
+        connection = self.active_connections.get(player_id)
+        if connection:
+            connection.enqueue(self.encode_for(connection, None, OutboundFrame(message, compact)))
+    
+    async def start_session(self, room_id: str, player_id: str, resume_from: Optional[int]):
+        """Hand out a resume token; on a valid resume, replay only the frames that were missed"""
+        self.send_direct(player_id, {
+            "type": "session",
+            "resume_token": issue_resume_token(room_id, player_id),
+            "seq": self.current_seq(room_id),
+            "resumed": resume_from is not None
+        })
+        if resume_from is None:
+            return
+        
+        frames = self.replay.since(room_id, resume_from, player_id)
+        connection = self.active_connections.get(player_id)
+        if frames is None:
+            # Too far behind for the buffer - fall back to a full snapshot
+            room = self.rooms.get(room_id)
+            self.send_direct(player_id, {
+                "type": "resync",
+                "seq": self.current_seq(room_id),
+                "room": room_state(room) if room else None
+            })
+        elif connection:
+            for frame in frames:
+                connection.enqueue(self.encode_for(connection, room_id, frame))
+        
+        if room_id in self.rooms:
+            await handle_relayed_message(room_id, player_id, SYSTEM, {"type": "_reconnected"})
+        elif self.backplane:
+            await self.backplane.forward_to_owner(room_id, player_id, {"type": "_reconnected"}, kind=SYSTEM)
+    
+    def connection_stats(self) -> dict:
+        return {
+            "connections": len(self.active_connections),
+            "queued_frames": sum(c.queue.qsize() for c in self.active_connections.values()),
+            "dropped_frames": sum(c.dropped for c in self.active_connections.values()),
+        }
 
 manager = ConnectionManager()
 
+def room_state(room: GameRoom) -> dict:
+    """Everything a client needs to rebuild its view of a room from scratch"""
+    question = room.questions[room.current_question] if room.current_question < len(room.questions) else {}
+    return {
+        "id": room.id,
+        "status": room.status.value,
+        "challenge_type": room.challenge_type.value,
+        "topic": room.topic,
+        "round": room.current_question + 1,
+        "total_rounds": len(room.questions),
+        "question": question.get("q") or question.get("prompt"),
+        "roster": room.roster(),
+        "standings": [
+            {"id": p.id, "name": p.name, "score": p.score, "connected": p.connected}
+            for p in sorted(room.players.values(), key=lambda p: p.score, reverse=True)
+        ]
+    }
+
+# ============================================================
+# SPECTATORS
+# ============================================================
+
+class SpectatorHub:
+    """Read-only audiences (a class on a projector, a school-wide quiz) per room.
+    
+    deliver_frame only appends to the hub's outbox; a separate task fans
+    each frame out with one shared encoding per variant and yields to the
+    event loop between chunks, so thousands of viewers never hold up the
+    game actor or the players' sockets.
+    """
+    
+    def __init__(self, connections: ConnectionManager, max_per_room: int = 5000,
+                 max_queue: int = 16, chunk_size: int = 256):
+        self.connections = connections
+        self.max_per_room = max_per_room
+        self.max_queue = max_queue
+        self.chunk_size = chunk_size
+        self.rooms: Dict[str, Dict[str, PlayerConnection]] = {}  # room_id -> spectator_id -> connection
+        self.standings: Dict[str, list] = {}  # room_id -> last full standings seen, for remote snapshots
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        # Metrics
+        self.frames = 0
+        self.deliveries = 0
+        self.rejected = 0
+    
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+    
+    async def join(self, websocket: WebSocket, room_id: str, encoding: str,
+                   subprotocol: Optional[str] = None) -> Optional[str]:
+        """Accept a spectator socket and send it a snapshot; None if the room is full"""
+        await websocket.accept(subprotocol=subprotocol)
+        audience = self.rooms.setdefault(room_id, {})
+        if len(audience) >= self.max_per_room:
+            self.rejected += 1
+            await websocket.close(code=1013)
+            return None
+        
+        spectator_id = f"spectator:{uuid.uuid4().hex[:12]}"
+        # Coalescing queue: a viewer that falls behind skips frames rather than buffering them
+        connection = PlayerConnection(websocket, spectator_id, self.max_queue, SlowConsumerPolicy.COALESCE,
+                                      self.connections.send_timeout, encoding)
+        audience[spectator_id] = connection
+        if len(audience) == 1 and room_id not in self.connections.rooms and self.connections.backplane:
+            await self.connections.backplane.watch_room(room_id)
+        
+        snapshot = OutboundFrame({
+            "type": "spectating",
+            "seq": self.connections.current_seq(room_id),
+            "room": await self.snapshot(room_id)
+        })
+        connection.enqueue(self.connections.encode_for(connection, None, snapshot))
+        self.start()
+        return spectator_id
+    
+    async def leave(self, room_id: str, spectator_id: str):
+        audience = self.rooms.get(room_id)
+        if not audience or spectator_id not in audience:
+            return
+        audience.pop(spectator_id).close()
+        if not audience:
+            self.drop_room(room_id)
+            if room_id not in self.connections.rooms and self.connections.backplane:
+                await self.connections.backplane.unwatch_room(room_id)
+    
+    def drop_room(self, room_id: str):
+        """Forget a room, closing any sockets still watching it"""
+        for connection in self.rooms.pop(room_id, {}).values():
+            connection.close()
+        self.standings.pop(room_id, None)
+    
+    async def snapshot(self, room_id: str) -> Optional[dict]:
+        room = self.connections.rooms.get(room_id)
+        if room:
+            return room_state(room)
+        if not self.connections.backplane:
+            return None
+        # Room runs on another node: its stored metadata plus the last standings relayed here
+        meta = await self.connections.backplane.load_room(room_id)
+        if meta is None:
+            return None
+        return {
+            "id": room_id,
+            "status": meta.get("status"),
+            "challenge_type": meta.get("challenge_type"),
+            "topic": meta.get("topic"),
+            "roster": [[p.get("slot", 0), p.get("id"), p.get("name"), p.get("avatar")] for p in meta["players"]],
+            "standings": self.standings.get(room_id, [])
+        }
+    
+    def publish(self, room_id: str, frame: OutboundFrame):
+        """Called from deliver_frame - O(1), never touches a socket"""
+        if room_id in self.rooms:
+            self.outbox.put_nowait((room_id, frame))
+    
+    async def run(self):
+        while True:
+            room_id, frame = await self.outbox.get()
+            try:
+                await self.fan_out(room_id, frame)
+            except Exception as e:
+                print(f"Spectator fan-out error in {room_id}: {e}")
+    
+    async def fan_out(self, room_id: str, frame: OutboundFrame):
+        if "final_standings" in frame.message:
+            self.standings[room_id] = frame.message["final_standings"]
+        elif "standings" in frame.message:
+            self.standings[room_id] = frame.message["standings"]
+        
+        self.frames += 1
+        audience = list(self.rooms.get(room_id, {}).values())
+        for start in range(0, len(audience), self.chunk_size):
+            for connection in audience[start:start + self.chunk_size]:
+                # No per-viewer standings base: every spectator shares the same bytes
+                encoded = frame.msgpack_frame() if connection.encoding == MSGPACK else frame.json_frame()
+                connection.enqueue(encoded)
+            self.deliveries += min(self.chunk_size, len(audience) - start)
+            await asyncio.sleep(0)  # Let player traffic and round timers run between chunks
+    
+    def metrics(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "spectators": sum(len(a) for a in self.rooms.values()),
+            "backlog": self.outbox.qsize(),
+            "frames": self.frames,
+            "deliveries": self.deliveries,
+            "rejected": self.rejected,
+        }
+
+spectators = SpectatorHub(manager)
+
 # ============================================================
 # GAME LOGIC
 # ============================================================
 
 class MultiplayerGame:
-    """Core multiplayer game logic"""
+    """Core multiplayer game logic, run as one long-lived actor per room.
+    
+    All state changes happen on the actor's own task, one inbox message at
+    a time, so socket receive loops only ever enqueue and never wait on
+    round timers or broadcasts.
+    """
     
     def __init__(self, room: GameRoom):
         self.room = room
         self.current_round = 0
         self.round_answers: Dict[str, dict] = {}
+        self.round_open = False
+        self.bank_questions: List[BankQuestion] = []  # Parallel to room.questions, with compiled answers
+        self.standings_version = 0
+        self.game_id = str(uuid.uuid4())  # Idempotency key for persisting this game's results
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.timer: Optional[WheelTimer] = None
+        self.task: Optional[asyncio.Task] = None
+        self.scoring_task: Optional[asyncio.Task] = None
+    
+    # -------------------- ACTOR --------------------
+    
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+    
+    def post(self, kind: str, **payload):
+        """Thread-of-control handoff from sockets and timers - never blocks"""
+        self.inbox.put_nowait((kind, payload))
+    
+    def schedule(self, delay: float, kind: str, **payload):
+        """Cancellable deadline on the shared timer wheel that posts back into the inbox"""
+        self.cancel_timer()
+        self.timer = timer_wheel.schedule(delay, functools.partial(self.post, kind, **payload))
+    
+    def cancel_timer(self):
+        if self.timer is not None:
+            timer_wheel.cancel(self.timer)
+            self.timer = None
+    
+    async def run(self):
+        try:
+            while self.room.status != RoomStatus.COMPLETED:
+                kind, payload = await self.inbox.get()
+                try:
+                    await self.dispatch(kind, payload)
+                except Exception as e:
+                    print(f"Game {self.room.id} error handling {kind}: {e}")
+                if kind == "stop":
+                    break
+        finally:
+            self.cancel_timer()
+            if manager.games.get(self.room.id) is self:
+                del manager.games[self.room.id]
+    
+    async def dispatch(self, kind: str, payload: dict):
+        if kind == "start" and self.room.status == RoomStatus.WAITING:
+            await self.start_game()
+        elif kind == "answer":
+            await self.submit_answer(payload["player_id"], payload["answer"], payload.get("time", 0))
+        elif kind == "round_timeout":
+            # A stale timer for an already-closed round is ignored
+            if self.round_open and payload["round"] == self.room.current_question:
+                await self.end_round()
+        elif kind == "round_scored":
+            if payload["round"] == self.room.current_question:
+                await self.apply_creative_scores(payload["scores"], payload["source"], payload["elapsed"])
+        elif kind == "next_round":
+            await self.next_round()
+    
+    # -------------------- GAME FLOW --------------------
         
     async def start_game(self):
         """Initialize and start the game"""
         self.room.status = RoomStatus.IN_PROGRESS
         self.room.started_at = datetime.utcnow()
+        if manager.backplane:
+            await manager.backplane.set_status(self.room.id, self.room.status.value)
+        await matchmaker.room_started(self.room.settings.get("match_bucket"), self.room.id)
         
-        # Generate questions based on challenge type
-        if self.room.challenge_type == ChallengeType.RIDDLE_BATTLE:
-            self.room.questions = random.sample(RIDDLES, min(5, len(RIDDLES)))
-        elif self.room.challenge_type == ChallengeType.CREATIVE_CLASH:
-            self.room.questions = [{"prompt": p} for p in random.sample(CREATIVE_PROMPTS, 3)]
-        else:
-            topic_questions = MULTIPLAYER_QUESTIONS.get(self.room.topic, MULTIPLAYER_QUESTIONS["General"])
-            self.room.questions = random.sample(topic_questions, min(5, len(topic_questions)))
+        # Draw questions from the bank, skipping what these players saw recently
+        kind = QUESTION_KINDS.get(self.room.challenge_type, "quiz")
+        age_groups = {p.age_group for p in self.room.players.values()}
+        self.bank_questions = question_bank.sample(
+            kind, self.room.topic, 3 if kind == "prompt" else 5, list(self.room.players),
+            age_group=age_groups.pop() if len(age_groups) == 1 else None
+        )
+        self.room.questions = [q.to_round() for q in self.bank_questions]
         
-        # Notify all players
+        # Notify all players - compact clients get the roster once and use slots from here on
         await manager.broadcast_to_room(self.room.id, {
             "type": "game_started",
             "challenge_type": self.room.challenge_type.value,
             "total_questions": len(self.room.questions),
             "players": [{"id": p.id, "name": p.name, "avatar": p.avatar} for p in self.room.players.values()]
+        }, compact={
+            "t": "gs",
+            "ct": self.room.challenge_type.value,
+            "n": len(self.room.questions),
+            "cr": self.room.challenge_type == ChallengeType.CREATIVE_CLASH,
+            "ro": self.room.roster()
         })
         
         # Start first round
@@ -232,15 +731,23 @@ class MultiplayerGame:
             "time_limit": question.get("time", 30),
             "points": question.get("points", 10),
             "is_creative": self.room.challenge_type == ChallengeType.CREATIVE_CLASH
+        }, compact={
+            "t": "nq",
+            "r": self.room.current_question + 1,
+            "q": question.get("q") or question.get("prompt"),
+            "tl": question.get("time", 30),
+            "p": question.get("points", 10)
         })
         
         # Start timer
+        self.round_open = True
         time_limit = question.get("time", 30)
-        await asyncio.sleep(time_limit)
-        await self.end_round()
+        self.schedule(time_limit, "round_timeout", round=self.room.current_question)
         
     async def submit_answer(self, player_id: str, answer: str, time_taken: float):
         """Process a player's answer"""
+        if not self.round_open or player_id not in self.room.players:
+            return  # Between rounds, or not in this room
         if player_id in self.round_answers:
             return  # Already answered
             
@@ -249,7 +756,7 @@ class MultiplayerGame:
         points = 0
         
         if self.room.challenge_type == ChallengeType.CREATIVE_CLASH:
-            # Creative answers scored by AI later
+            # Scored in one batch for the whole round when it closes (see score_creative_round)
             points = 10  # Base points for participating
             self.round_answers[player_id] = {
                 "answer": answer,
@@ -258,9 +765,8 @@ class MultiplayerGame:
                 "needs_scoring": True
             }
         else:
-            # Check if answer is correct
-            correct_answer = question.get("a", "").lower()
-            is_correct = answer.lower().strip() == correct_answer or answer.lower() in correct_answer.lower()
+            # Precompiled answer forms - blank answers never match
+            is_correct = self.bank_questions[self.room.current_question].is_correct(answer or "")
             
             if is_correct:
                 # Faster answers get more points
@@ -285,7 +791,7 @@ class MultiplayerGame:
             "correct": is_correct,
             "points_earned": points,
             "total_score": self.room.players[player_id].score
-        })
+        }, compact={"t": "ar", "c": is_correct, "p": points, "ts": self.room.players[player_id].score})
         
         # Check if all players answered
         if len(self.round_answers) >= len([p for p in self.room.players.values() if p.connected]):
@@ -293,6 +799,57 @@ class MultiplayerGame:
             
     async def end_round(self):
         """End current round and show results"""
+        if not self.round_open:
+            return  # Timer and "all answered" can both get here
+        self.round_open = False
+        self.cancel_timer()
+        
+        if self.room.challenge_type == ChallengeType.CREATIVE_CLASH and self.round_answers:
+            # Score off the actor; results come back as a round_scored message
+            self.scoring_task = asyncio.create_task(self.score_creative_round(self.room.current_question))
+            return
+        await self.publish_round()
+    
+    async def score_creative_round(self, round_index: int):
+        """One batched scoring call for the whole round, bounded by the pipeline's deadline"""
+        started = time.monotonic()
+        scores: Dict[str, int] = {}
+        source = "none"
+        try:
+            prompt = self.room.questions[round_index].get("prompt", "")
+            answers = [
+                CreativeAnswer(pid, a["answer"] or "", self.room.players[pid].age_group)
+                for pid, a in self.round_answers.items()
+                if a.get("needs_scoring") and pid in self.room.players
+            ]
+            try:
+                scores, source = await creative_scoring.score_round(prompt, answers)
+            except Exception as e:
+                print(f"Game {self.room.id} creative scoring error: {e}")
+                scores = await creative_scoring.fallback.score(prompt, answers)
+                source = creative_scoring.fallback.name
+        except Exception as e:
+            print(f"Game {self.room.id} creative fallback error: {e}")
+            scores, source = {}, "none"  # Participation points only
+        finally:
+            # The round only moves on when this arrives - always send it
+            self.post("round_scored", round=round_index, scores=scores, source=source,
+                      elapsed=time.monotonic() - started)
+    
+    async def apply_creative_scores(self, scores: Dict[str, int], source: str, elapsed: float):
+        for player_id, score in scores.items():
+            result = self.round_answers.get(player_id)
+            if result is None or player_id not in self.room.players:
+                continue
+            bonus = score * CREATIVE_POINTS_PER_SCORE
+            result.update(ai_score=score, points=result["points"] + bonus, needs_scoring=False)
+            self.room.players[player_id].score += bonus
+        # Scoring time comes out of the usual pause, so rounds keep their rhythm
+        await self.publish_round(pause=max(1.0, ROUND_PAUSE_SECONDS - elapsed), scored_by=source)
+    
+    async def publish_round(self, pause: float = None, scored_by: Optional[str] = None):
+        """Broadcast the closed round's results and schedule the next one"""
+        pause = ROUND_PAUSE_SECONDS if pause is None else pause
         question = self.room.questions[self.room.current_question]
         
         # Calculate round standings
@@ -311,23 +868,42 @@ class MultiplayerGame:
                     "player_id": pid,
                     "answer": self.round_answers.get(pid, {}).get("answer", "No answer"),
                     "correct": self.round_answers.get(pid, {}).get("correct", False),
-                    "points": self.round_answers.get(pid, {}).get("points", 0)
+                    "points": self.round_answers.get(pid, {}).get("points", 0),
+                    "ai_score": self.round_answers.get(pid, {}).get("ai_score")
                 }
                 for pid in self.room.players
             ],
-            "standings": [{"id": s[0], "name": s[1], "score": s[2]} for s in standings]
-        })
+            "standings": [{"id": s[0], "name": s[1], "score": s[2]} for s in standings],
+            "scored_by": scored_by
+        }, compact={
+            "t": "re",
+            "r": self.room.current_question + 1,
+            "a": question.get("a"),
+            # [slot, correct, points, answer, ai_score]; standings follow as an "st" delta
+            "res": [
+                [p.slot, bool(self.round_answers.get(p.id, {}).get("correct", False)),
+                 self.round_answers.get(p.id, {}).get("points", 0),
+                 self.round_answers.get(p.id, {}).get("answer"),
+                 self.round_answers.get(p.id, {}).get("ai_score")]
+                for p in self.room.players.values()
+            ]
+        }, standings=self.next_standings())
         
         self.room.current_question += 1
         
-        # Wait before next round
-        await asyncio.sleep(5)
-        await self.next_round()
+        # Pause before next round without holding anything up
+        self.schedule(pause, "next_round")
+        
+    def next_standings(self) -> tuple:
+        self.standings_version += 1
+        return self.standings_version, self.room.standings()
         
     async def end_game(self):
         """End the game and determine winner"""
         self.room.status = RoomStatus.COMPLETED
         self.room.ended_at = datetime.utcnow()
+        if manager.backplane:
+            await manager.backplane.set_status(self.room.id, self.room.status.value)
         
         # Determine winner
         standings = sorted(
@@ -338,6 +914,28 @@ class MultiplayerGame:
         
         winner = standings[0] if standings else None
         
+        # Queued for the batched writer - never waits on the database
+        result_writer.submit(GameResult(
+            game_id=self.game_id,
+            room_id=self.room.id,
+            challenge_type=self.room.challenge_type.value,
+            topic=self.room.topic,
+            winner_id=winner.id if winner else None,
+            rounds=len(self.room.questions),
+            started_at=self.room.started_at,
+            ended_at=self.room.ended_at,
+            players=[
+                PlayerResult(
+                    player_id=p.id,
+                    rank=i + 1,
+                    score=p.score,
+                    correct_answers=sum(1 for a in p.answers if a.get("correct")),
+                    stars_awarded=WINNER_STARS if p is winner else PARTICIPANT_STARS
+                )
+                for i, p in enumerate(standings)
+            ]
+        ))
+        
         await manager.broadcast_to_room(self.room.id, {
             "type": "game_ended",
             "winner": {"id": winner.id, "name": winner.name, "score": winner.score} if winner else None,
@@ -346,10 +944,291 @@ class MultiplayerGame:
                 for i, p in enumerate(standings)
             ],
             "rewards": {
-                "winner_stars": 100,
-                "participant_stars": 25
+                "winner_stars": WINNER_STARS,
+                "participant_stars": PARTICIPANT_STARS
             }
-        })
+        }, compact={
+            "t": "ge",
+            "w": winner.slot if winner else None,
+            "rw": [WINNER_STARS, PARTICIPANT_STARS]
+        }, standings=self.next_standings())
+
+# ============================================================
+# ROOM LIFECYCLE
+# ============================================================
+
+def estimate_room_bytes(room: GameRoom) -> int:
+    """Rough retained size of a room: the objects it owns, not shared constants"""
+    total = sys.getsizeof(room) + sys.getsizeof(room.players) + sys.getsizeof(room.questions)
+    for player in room.players.values():
+        total += sys.getsizeof(player) + sys.getsizeof(player.answers)
+        total += sum(sys.getsizeof(a) for a in player.answers)
+    return total
+
+class RoomReaper:
+    """Periodically drops finished, abandoned and idle rooms and enforces memory caps"""
+    
+    # Evict completed rooms first, then lobbies, and live games only as a last resort
+    EVICTION_PRIORITY = {RoomStatus.COMPLETED: 0, RoomStatus.WAITING: 1, RoomStatus.IN_PROGRESS: 2}
+    
+    def __init__(self, connections: ConnectionManager, interval_seconds: float = 30,
+                 idle_ttl: timedelta = timedelta(minutes=15),
+                 abandoned_ttl: timedelta = timedelta(minutes=2),
+                 completed_retention: timedelta = timedelta(minutes=5),
+                 max_rooms: int = 20000, max_players: int = 100000):
+        self.connections = connections
+        self.interval_seconds = interval_seconds
+        self.idle_ttl = idle_ttl
+        self.abandoned_ttl = abandoned_ttl
+        self.completed_retention = completed_retention
+        self.max_rooms = max_rooms
+        self.max_players = max_players
+        self.task: Optional[asyncio.Task] = None
+        # Metrics
+        self.runs = 0
+        self.rooms_reaped: Dict[str, int] = {"idle": 0, "abandoned": 0, "completed": 0, "evicted": 0}
+        self.player_mappings_reaped = 0
+        self.bytes_reclaimed = 0
+    
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.reap()
+            except Exception as e:
+                print(f"Room reaper error: {e}")
+    
+    async def reap(self, now: Optional[datetime] = None):
+        """One sweep over this node's rooms"""
+        now = now or datetime.utcnow()
+        self.runs += 1
+        rooms = self.connections.rooms
+        
+        for room in list(rooms.values()):
+            reason = self.expiry_reason(room, now)
+            if reason:
+                await self.remove_room(room, reason)
+        
+        # Global caps, oldest activity first within each priority
+        player_count = sum(len(r.players) for r in rooms.values())
+        if len(rooms) > self.max_rooms or player_count > self.max_players:
+            candidates = sorted(
+                rooms.values(),
+                key=lambda r: (self.EVICTION_PRIORITY[r.status], r.last_activity)
+            )
+            for room in candidates:
+                if len(rooms) <= self.max_rooms and player_count <= self.max_players:
+                    break
+                player_count -= len(room.players)
+                await self.remove_room(room, "evicted")
+        
+        # Player -> room mappings that point nowhere, or at a room they've left for good
+        for player_id, room_id in list(self.connections.player_rooms.items()):
+            room = rooms.get(room_id)
+            stale = room is None and room_id not in self.connections.room_sockets
+            if room is not None and player_id in room.players:
+                player = room.players[player_id]
+                stale = (not player.connected and room.status != RoomStatus.IN_PROGRESS
+                         and player_id not in self.connections.active_connections)
+            if stale:
+                del self.connections.player_rooms[player_id]
+                self.player_mappings_reaped += 1
+    
+    def expiry_reason(self, room: GameRoom, now: datetime) -> Optional[str]:
+        if room.status == RoomStatus.COMPLETED:
+            ended = room.ended_at or room.last_activity
+            return "completed" if now - ended > self.completed_retention else None
+        
+        anyone_connected = any(
+            p.connected and p.id in self.connections.active_connections for p in room.players.values()
+        ) or bool(self.connections.room_sockets.get(room.id))
+        
+        if room.status == RoomStatus.IN_PROGRESS:
+            if not anyone_connected and now - room.last_activity > self.abandoned_ttl:
+                return "abandoned"
+            return None
+        
+        # Lobby that never started
+        if now - room.last_activity > self.idle_ttl:
+            return "idle"
+        return None
+    
+    async def remove_room(self, room: GameRoom, reason: str):
+        connections = self.connections
+        if connections.rooms.pop(room.id, None) is None:
+            return
+        
+        game = connections.games.pop(room.id, None)
+        if game:
+            game.post("stop")
+        
+        for player_id in room.players:
+            if connections.player_rooms.get(player_id) == room.id:
+                del connections.player_rooms[player_id]
+        
+        if connections.backplane:
+            await connections.backplane.delete_room(room.id, list(room.players))
+        
+        connections.room_seq.pop(room.id, None)
+        room_chat.drop(room.id)
+        spectators.drop_room(room.id)
+        if room.id not in connections.room_sockets:
+            connections.replay.drop(room.id)
+            connections.standings.drop(room.id)
+        
+        self.bytes_reclaimed += estimate_room_bytes(room)
+        self.rooms_reaped[reason] += 1
+    
+    def metrics(self) -> dict:
+        rooms = self.connections.rooms.values()
+        by_status = {status.value: 0 for status in RoomStatus}
+        for room in rooms:
+            by_status[room.status.value] += 1
+        return {
+            "rooms": by_status,
+            "players": sum(len(r.players) for r in rooms),
+            "player_mappings": len(self.connections.player_rooms),
+            "approx_room_bytes": sum(estimate_room_bytes(r) for r in rooms),
+            "runs": self.runs,
+            "rooms_reaped": dict(self.rooms_reaped),
+            "player_mappings_reaped": self.player_mappings_reaped,
+            "bytes_reclaimed": self.bytes_reclaimed,
+        }
+
+reaper = RoomReaper(manager)
+
+# ============================================================
+# CONNECTION HEALTH
+# ============================================================
+
+class HeartbeatMonitor:
+    """Pings every socket and reaps ones that have gone quiet (half-open, dead Wi-Fi)"""
+    
+    def __init__(self, connections: ConnectionManager, interval_seconds: float = 15, timeout_seconds: float = 45):
+        self.connections = connections
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.task: Optional[asyncio.Task] = None
+        # Metrics
+        self.pings = 0
+        self.reaped = 0
+    
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+    
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                self.beat()
+            except Exception as e:
+                print(f"Heartbeat error: {e}")
+    
+    def beat(self, now: Optional[float] = None):
+        now = now or time.monotonic()
+        ping = OutboundFrame({"type": "ping"}, {"t": "pi"})  # One frame, shared by every socket
+        for player_id, connection in list(self.connections.active_connections.items()):
+            if now - connection.last_seen > self.timeout_seconds:
+                # Closing ends the socket's receive loop, which runs the normal disconnect path
+                connection.close(code=4001)
+                self.connections.disconnect(player_id, connection.websocket)
+                self.reaped += 1
+            else:
+                connection.enqueue(self.connections.encode_for(connection, None, ping))
+                self.pings += 1
+    
+    def metrics(self) -> dict:
+        return {"pings": self.pings, "reaped": self.reaped, "timeout_seconds": self.timeout_seconds}
+
+heartbeat = HeartbeatMonitor(manager)
+
+# ============================================================
+# ROOM CHAT
+# ============================================================
+
+async def flush_room_chat(room_id: str, lines: List[ChatLine]):
+    """One frame per room per chat tick; a lone message keeps the original chat shape"""
+    room = manager.rooms.get(room_id)
+    slots = {p.id: p.slot for p in room.players.values()} if room else {}
+    if len(lines) == 1 and lines[0].count == 1:
+        line = lines[0]
+        message = {"type": "chat", "player_id": line.player_id, "message": line.message}
+    else:
+        message = {
+            "type": "chat_batch",
+            "messages": [
+                {"player_id": l.player_id, "message": l.message, "count": l.count} for l in lines
+            ]
+        }
+    await manager.broadcast_to_room(room_id, message, compact={
+        "t": "ch",
+        "m": [[slots.get(l.player_id, 0), l.message, l.count] for l in lines]
+    })
+
+room_chat = ChatCoalescer(flush_room_chat)
+
+# ============================================================
+# QUICK MATCH
+# ============================================================
+
+async def form_matched_room(bucket: str, entries: List[dict]) -> dict:
+    """Open a room on this node for a group the matchmaker pulled from a bucket"""
+    room_id = str(uuid.uuid4())[:8]
+    oldest = entries[0]
+    room = GameRoom(
+        id=room_id,
+        host_id=oldest["player"]["id"],
+        challenge_type=ChallengeType(challenge_type_of(bucket)),
+        topic=oldest["topic"],
+        max_players=matchmaker.max_players,
+        status=RoomStatus.WAITING,
+        settings={"match_bucket": bucket}
+    )
+    for entry in entries:
+        info = entry["player"]
+        room.seat(Player(
+            id=info["id"], name=info["name"], avatar=info["avatar"], age_group=info["age_group"]
+        ))
+        manager.player_rooms[info["id"]] = room_id
+    manager.rooms[room_id] = room
+    
+    node = None
+    if manager.backplane:
+        await manager.backplane.save_room(
+            {"id": room_id, "host_id": room.host_id, "challenge_type": room.challenge_type.value,
+             "topic": room.topic, "max_players": room.max_players, "status": room.status.value},
+            [p.to_public() for p in room.players.values()]
+        )
+        node = manager.backplane.node_id
+    
+    return {"room_id": room_id, "node": node, "challenge_type": room.challenge_type.value, "topic": room.topic}
+
+async def take_matched_seat(room_id: str, player: dict) -> Optional[dict]:
+    """Join a partly filled matched room; None if it has filled, started or gone"""
+    try:
+        joined = await join_room(JoinRoomRequest(room_id=room_id), player)
+    except HTTPException:
+        return None
+    return {"room_id": room_id, "node": joined["node"],
+            "challenge_type": joined["room"]["challenge_type"], "topic": joined["room"]["topic"]}
+
+async def notify_match(player_id: str, result: dict):
+    await manager.send_to_player(player_id, {"type": "match_found", **result})
+
+matchmaker = QuickMatchmaker(LocalMatchPool(), form_matched_room, take_matched_seat, notify_match)
 
 # ============================================================
 # API ENDPOINTS
@@ -360,6 +1239,47 @@ from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/multiplayer", tags=["multiplayer"])
 
+async def start_backplane():
+    """Enable the Redis backplane when running more than one worker/instance"""
+    redis_url = os.getenv("MULTIPLAYER_BACKPLANE_URL")
+    if redis_url and not manager.backplane:
+        await manager.enable_backplane(RoomBackplane(redis_url))
+        matchmaker.use_pool(RedisMatchPool(manager.backplane.redis))
+
+async def stop_backplane():
+    if manager.backplane:
+        await manager.backplane.stop()
+
+async def load_question_bank():
+    """Extra questions from a file and/or the multiplayer_questions table, on top of the built-ins"""
+    path = os.getenv("MULTIPLAYER_QUESTION_BANK_PATH")
+    try:
+        if path:
+            await asyncio.to_thread(question_bank.load_file, path)
+        await asyncio.to_thread(question_bank.load_from_db)
+    except Exception as e:
+        print(f"Question bank load error: {e}")
+
+router.add_event_handler("startup", load_question_bank)
+router.add_event_handler("startup", start_backplane)
+router.add_event_handler("shutdown", stop_backplane)
+router.add_event_handler("startup", reaper.start)
+router.add_event_handler("shutdown", reaper.stop)
+router.add_event_handler("startup", heartbeat.start)
+router.add_event_handler("shutdown", heartbeat.stop)
+router.add_event_handler("startup", room_chat.start)
+router.add_event_handler("shutdown", room_chat.stop)
+router.add_event_handler("startup", spectators.start)
+router.add_event_handler("shutdown", spectators.stop)
+router.add_event_handler("startup", matchmaker.start)
+router.add_event_handler("shutdown", matchmaker.stop)
+router.add_event_handler("startup", result_writer.start)  # Warns at boot if nothing will be persisted
+router.add_event_handler("shutdown", result_writer.stop)
+
+def get_current_user():
+    """Dependency to get current user - implement with your auth"""
+    pass
+
 class CreateRoomRequest(BaseModel):
     challenge_type: str
     topic: str
@@ -368,6 +1288,10 @@ class CreateRoomRequest(BaseModel):
 class JoinRoomRequest(BaseModel):
     room_id: str
 
+class QuickMatchRequest(BaseModel):
+    challenge_type: str
+    topic: str = "General"
+
 class ChallengeRequest(BaseModel):
     challenged_id: str
     challenge_type: str
@@ -388,20 +1312,30 @@ async def create_room(request: CreateRoomRequest, current_user: dict = Depends(g
     )
     
     # Add host as first player
-    room.players[current_user["id"]] = Player(
+    room.seat(Player(
         id=current_user["id"],
         name=current_user["name"],
         avatar=current_user.get("avatar", "🧒"),
         age_group=current_user.get("age_group", "explorers"),
         is_ready=True
-    )
+    ))
     
     manager.rooms[room_id] = room
     manager.player_rooms[current_user["id"]] = room_id
     
+    node = None
+    if manager.backplane:
+        await manager.backplane.save_room(
+            {"id": room_id, "host_id": room.host_id, "challenge_type": room.challenge_type.value,
+             "topic": room.topic, "max_players": room.max_players, "status": room.status.value},
+            [p.to_public() for p in room.players.values()]
+        )
+        node = manager.backplane.node_id
+    
     return {
         "room_id": room_id,
         "share_code": room_id.upper(),
+        "node": node,  # Sticky routing hint for the WebSocket
         "message": "Room created! Share the code with friends."
     }
 
@@ -410,6 +1344,9 @@ async def join_room(request: JoinRoomRequest, current_user: dict = Depends(get_c
     """Join an existing room"""
     room_id = request.room_id.lower()
     
+    if room_id not in manager.rooms and manager.backplane:
+        return await join_remote_room(room_id, current_user)
+    
     if room_id not in manager.rooms:
         raise HTTPException(status_code=404, detail="Room not found")
     
@@ -422,21 +1359,21 @@ async def join_room(request: JoinRoomRequest, current_user: dict = Depends(get_c
         raise HTTPException(status_code=400, detail="Room is full")
     
     # Add player to room
-    room.players[current_user["id"]] = Player(
+    player = Player(
         id=current_user["id"],
         name=current_user["name"],
         avatar=current_user.get("avatar", "🧒"),
         age_group=current_user.get("age_group", "explorers")
     )
+    if manager.backplane:
+        await manager.backplane.join_room(room_id, player.to_public())
+    room.seat(player)
+    room.last_activity = datetime.utcnow()
     
     manager.player_rooms[current_user["id"]] = room_id
     
     # Notify other players
-    await manager.broadcast_to_room(room_id, {
-        "type": "player_joined",
-        "player": {"id": current_user["id"], "name": current_user["name"]},
-        "player_count": len(room.players)
-    }, exclude={current_user["id"]})
+    await announce_join(room, player)
     
     return {
         "success": True,
@@ -446,8 +1383,74 @@ async def join_room(request: JoinRoomRequest, current_user: dict = Depends(get_c
             "challenge_type": room.challenge_type.value,
             "topic": room.topic,
             "players": [{"id": p.id, "name": p.name, "avatar": p.avatar} for p in room.players.values()]
-        }
+        },
+        "node": manager.backplane.node_id if manager.backplane else None
+    }
+
+async def announce_join(room: GameRoom, player: Player):
+    await manager.broadcast_to_room(room.id, {
+        "type": "player_joined",
+        "player": {"id": player.id, "name": player.name},
+        "player_count": len(room.players)
+    }, exclude={player.id}, compact={
+        "t": "pj",
+        "ro": [[player.slot, player.id, player.name, player.avatar]],
+        "n": len(room.players)
+    })
+
+async def join_remote_room(room_id: str, current_user: dict) -> dict:
+    """Join a room whose game runs on another node"""
+    player = {
+        "id": current_user["id"],
+        "name": current_user["name"],
+        "avatar": current_user.get("avatar", "🧒"),
+        "age_group": current_user.get("age_group", "explorers")
+    }
+    result = await manager.backplane.join_room(room_id, player)
+    if result == ROOM_MISSING:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if result == ROOM_STARTED:
+        raise HTTPException(status_code=400, detail="Game already in progress")
+    if result == ROOM_FULL:
+        raise HTTPException(status_code=400, detail="Room is full")
+    
+    # The owner adds the player to its room and announces them
+    await manager.backplane.forward_to_owner(room_id, player["id"], {"type": "_joined", "player": player}, kind=SYSTEM)
+    room = await manager.backplane.load_room(room_id)
+    
+    return {
+        "success": True,
+        "room": {
+            "id": room_id,
+            "host": room["host_id"],
+            "challenge_type": room["challenge_type"],
+            "topic": room["topic"],
+            "players": [{"id": p["id"], "name": p["name"], "avatar": p["avatar"]} for p in room["players"]]
+        },
+        "node": room["owner"]
+    }
+
+@router.post("/quick-match")
+async def enqueue_quick_match(request: QuickMatchRequest, current_user: dict = Depends(get_current_user)):
+    """Queue for a match with kids of the same age group, challenge type and topic"""
+    challenge_type = ChallengeType(request.challenge_type).value
+    player = {
+        "id": current_user["id"],
+        "name": current_user["name"],
+        "avatar": current_user.get("avatar", "🧒"),
+        "age_group": current_user.get("age_group", "explorers")
     }
+    return await matchmaker.enqueue(player, challenge_type, request.topic)
+
+@router.get("/quick-match")
+async def get_quick_match(current_user: dict = Depends(get_current_user)):
+    """Poll for a match (also pushed as match_found to an open socket)"""
+    return await matchmaker.status(current_user["id"])
+
+@router.delete("/quick-match")
+async def cancel_quick_match(current_user: dict = Depends(get_current_user)):
+    """Leave the queue"""
+    return {"cancelled": await matchmaker.cancel(current_user["id"])}
 
 @router.post("/challenge")
 async def send_challenge(request: ChallengeRequest, current_user: dict = Depends(get_current_user)):
@@ -461,7 +1464,17 @@ async def send_challenge(request: ChallengeRequest, current_user: dict = Depends
         status="pending"
     )
     
-    # Store challenge in database
+    result_writer.submit(ChallengeRecord(
+        id=challenge.id,
+        challenger_id=challenge.challenger_id,
+        challenged_id=challenge.challenged_id,
+        challenge_type=challenge.challenge_type.value,
+        topic=challenge.topic,
+        status=challenge.status,
+        winner_id=challenge.winner_id,
+        created_at=challenge.created_at,
+        updated_at=challenge.created_at
+    ))
     # Send notification to challenged player
     
     return {
@@ -469,6 +1482,23 @@ async def send_challenge(request: ChallengeRequest, current_user: dict = Depends
         "message": "Challenge sent!"
     }
 
+@router.get("/metrics")
+async def get_metrics():
+    """Connection, room and timer health for this node"""
+    return {
+        "connections": {**manager.connection_stats(), "heartbeat": heartbeat.metrics()},
+        "replay": manager.replay.metrics(),
+        "rooms": reaper.metrics(),
+        "games": len(manager.games),
+        "matchmaking": await matchmaker.metrics(),
+        "question_bank": question_bank.metrics(),
+        "creative_scoring": creative_scoring.metrics(),
+        "result_writer": result_writer.metrics(),
+        "chat": room_chat.metrics(),
+        "spectators": spectators.metrics(),
+        "timers": timer_wheel.metrics()
+    }
+
 @router.get("/leaderboard")
 async def get_leaderboard(scope: str = "global", limit: int = 20):
     """Get multiplayer leaderboard"""
@@ -485,49 +1515,135 @@ async def get_leaderboard(scope: str = "global", limit: int = 20):
 # WEBSOCKET ENDPOINT
 # ============================================================
 
+def is_client_message(data) -> bool:
+    """Internal types (leading underscore) are never accepted from a socket"""
+    return isinstance(data, dict) and isinstance(data.get("type"), str) and not data["type"].startswith("_")
+
+async def handle_player_message(room_id: str, player_id: str, data: dict):
+    """Apply a player's action on the node that runs the room's game"""
+    if not is_client_message(data):
+        return
+    if room_id not in manager.rooms:
+        if manager.backplane:
+            await manager.backplane.forward_to_owner(room_id, player_id, data)
+        return
+    
+    manager.rooms[room_id].last_activity = datetime.utcnow()
+    
+    if data["type"] == "ready":
+        # Player is ready to start
+        room = manager.rooms[room_id]
+        if player_id in room.players:
+            room.players[player_id].is_ready = True
+            
+            # Check if all players ready
+            all_ready = all(p.is_ready for p in room.players.values())
+            if all_ready and len(room.players) >= 2 and room_id not in manager.games:
+                game = MultiplayerGame(room)
+                manager.games[room_id] = game
+                game.start()
+                game.post("start")
+                    
+    elif data["type"] == "answer":
+        # Player submitted an answer - the room's actor scores it
+        answer, time_taken = data.get("answer"), data.get("time", 0)
+        if not isinstance(answer, str):
+            return
+        if isinstance(time_taken, bool) or not isinstance(time_taken, (int, float)):
+            time_taken = 0
+        game = manager.games.get(room_id)
+        if game:
+            game.post("answer", player_id=player_id, answer=answer[:MAX_ANSWER_LENGTH], time=time_taken)
+            
+    elif data["type"] == "chat":
+        # In-game chat message - buffered and sent with the room's next chat tick
+        message = data.get("message", "")
+        if not isinstance(message, str):
+            return
+        limiter = room_chat.limiter
+        if not room_chat.submit(room_id, player_id, message) and limiter.should_warn(player_id):
+            retry_after = limiter.retry_after(player_id)
+            await manager.send_to_player(player_id, {"type": "chat_rate_limited", "retry_after": retry_after},
+                                         compact={"t": "cl", "ra": retry_after})
+
+async def handle_relayed_message(room_id: str, player_id: str, kind: str, data: dict):
+    """Backplane callback: an action from a player connected to another node"""
+    room = manager.rooms.get(room_id)
+    if room is None:
+        return
+    
+    if kind != SYSTEM:
+        # Raw client payload - handle_player_message rejects internal types again here
+        await handle_player_message(room_id, player_id, data)
+    elif data["type"] == "_joined":
+        info = data["player"]
+        player = room.seat(Player(
+            id=info["id"], name=info["name"], avatar=info["avatar"], age_group=info["age_group"]
+        ))
+        manager.player_rooms[player_id] = room_id
+        room.last_activity = datetime.utcnow()
+        await announce_join(room, player)
+    elif data["type"] == "_disconnected":
+        if player_id in room.players:
+            room.players[player_id].connected = False
+    elif data["type"] == "_reconnected":
+        if player_id in room.players:
+            room.players[player_id].connected = True
+            await manager.broadcast_to_room(room_id, {"type": "player_reconnected", "player_id": player_id},
+                                            exclude={player_id})
+
 @router.websocket("/ws/{room_id}/{player_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, player_id: str):
-    await manager.connect(websocket, player_id)
+async def websocket_endpoint(websocket: WebSocket, room_id: str, player_id: str, encoding: str = JSON,
+                             resume: Optional[str] = None, last_seq: int = 0):
+    # Clients opt into MessagePack with ?encoding=msgpack or the brainspark.msgpack.v1 subprotocol
+    encoding, subprotocol = negotiate_encoding(encoding, websocket.scope.get("subprotocols", []))
+    await manager.connect(websocket, player_id, room_id, encoding, subprotocol)
+    # Reconnects pass ?resume=<token from the session frame>&last_seq=<last seq seen>
+    resuming = verify_resume_token(resume, room_id, player_id)
+    await manager.start_session(room_id, player_id, last_seq if resuming else None)
     
     try:
         while True:
-            data = await websocket.receive_json()
-            
-            if data["type"] == "ready":
-                # Player is ready to start
-                if room_id in manager.rooms:
-                    room = manager.rooms[room_id]
-                    if player_id in room.players:
-                        room.players[player_id].is_ready = True
-                        
-                        # Check if all players ready
-                        all_ready = all(p.is_ready for p in room.players.values())
-                        if all_ready and len(room.players) >= 2:
-                            game = MultiplayerGame(room)
-                            await game.start_game()
-                            
-            elif data["type"] == "answer":
-                # Player submitted an answer
-                if room_id in manager.rooms:
-                    room = manager.rooms[room_id]
-                    game = MultiplayerGame(room)
-                    await game.submit_answer(player_id, data["answer"], data.get("time", 0))
-                    
-            elif data["type"] == "chat":
-                # In-game chat message
-                await manager.broadcast_to_room(room_id, {
-                    "type": "chat",
-                    "player_id": player_id,
-                    "message": data["message"]
-                })
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            connection = manager.active_connections.get(player_id)
+            if connection:
+                connection.touch()
+            data = decode_client_message(message)
+            if not data or data.get("type") == "pong":
+                continue
+            if data.get("type") == "ping":
+                manager.send_direct(player_id, {"type": "pong"}, {"t": "po"})
+                continue
+            if data.get("type") == "ack":
+                # Standings deltas are cut per socket, so acks stay on this node
+                manager.ack_standings(player_id, data.get("standings"))
+                continue
+            await handle_player_message(room_id, player_id, data)
                 
     except WebSocketDisconnect:
-        manager.disconnect(player_id)
+        if not manager.disconnect(player_id, websocket):
+            return  # Superseded by a resumed connection - leave its room membership alone
+        await manager.leave_room_sockets(room_id, player_id)
+        if room_id not in manager.rooms and manager.backplane:
+            await manager.backplane.forward_to_owner(room_id, player_id, {"type": "_disconnected"}, kind=SYSTEM)
         await manager.broadcast_to_room(room_id, {
             "type": "player_disconnected",
             "player_id": player_id
         })
 
-def get_current_user():
-    """Dependency to get current user - implement with your auth"""
-    pass
+@router.websocket("/spectate/{room_id}")
+async def spectator_endpoint(websocket: WebSocket, room_id: str, encoding: str = JSON):
+    """Read-only view of a room; anything the spectator sends is ignored"""
+    encoding, subprotocol = negotiate_encoding(encoding, websocket.scope.get("subprotocols", []))
+    spectator_id = await spectators.join(websocket, room_id, encoding, subprotocol)
+    if spectator_id is None:
+        return
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        await spectators.leave(room_id, spectator_id)
@@ -0,0 +1,148 @@
+# ============================================================
+# BrainSpark Multiplayer Wire Protocol
+# app/services/protocol.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import json
+
+import msgpack
+
+# ============================================================
+# ENCODINGS
+# ============================================================
+
+# JSON is the default and keeps the original message shapes.
+# MessagePack clients get compact messages: per-room integer player slots,
+# no repeated room metadata, and standings as deltas against their last ack.
+JSON = "json"
+MSGPACK = "msgpack"
+MSGPACK_SUBPROTOCOL = "brainspark.msgpack.v1"
+
+def negotiate_encoding(query_encoding: Optional[str], subprotocols: List[str]) -> Tuple[str, Optional[str]]:
+    """(encoding, subprotocol to echo back) from ?encoding= or Sec-WebSocket-Protocol"""
+    if MSGPACK_SUBPROTOCOL in subprotocols:
+        return MSGPACK, MSGPACK_SUBPROTOCOL
+    if query_encoding == MSGPACK:
+        return MSGPACK, None
+    return JSON, None
+
+def decode_client_message(message: dict) -> Optional[dict]:
+    """A raw ASGI websocket.receive message -> dict, whichever encoding the client used"""
+    if message.get("bytes") is not None:
+        return msgpack.unpackb(message["bytes"], raw=False)
+    if message.get("text") is not None:
+        return json.loads(message["text"])
+    return None
+
+# Standings are {slot: score}; a snapshot is (version, standings)
+Standings = Dict[int, int]
+
+def standings_delta(current: Standings, base: Optional[Standings]) -> List[int]:
+    """Flat [slot, score, slot, score, ...] of entries that differ from base"""
+    flat: List[int] = []
+    for slot, score in current.items():
+        if base is None or base.get(slot) != score:
+            flat.append(slot)
+            flat.append(score)
+    return flat
+
+# ============================================================
+# OUTBOUND FRAME
+# ============================================================
+
+class OutboundFrame:
+    """One outgoing message, encoded lazily and at most once per encoding/base.
+
+    message   - full JSON-shaped message (what JSON clients receive)
+    compact   - short-key variant for MessagePack clients (falls back to message)
+    standings - (version, {slot: score}) sent as "st" delta in the compact variant
+    seq       - room sequence number ("seq" / "sq"), 0 for unsequenced frames
+    """
+
+    __slots__ = ("message", "compact", "standings", "seq", "text", "packed")
+
+    def __init__(self, message: dict, compact: Optional[dict] = None,
+                 standings: Optional[Tuple[int, Standings]] = None, seq: int = 0):
+        self.message = message
+        self.compact = compact
+        self.standings = standings
+        self.seq = seq
+        self.text: Optional[str] = None
+        self.packed: Dict[int, bytes] = {}  # base version -> encoded bytes
+
+    def json_frame(self) -> str:
+        if self.text is None:
+            message = {**self.message, "seq": self.seq} if self.seq else self.message
+            self.text = json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+        return self.text
+
+    def msgpack_frame(self, base_version: int = 0, base: Optional[Standings] = None) -> bytes:
+        """Encoded once per distinct acked base - most of a room shares one"""
+        key = base_version if base is not None else 0
+        packed = self.packed.get(key)
+        if packed is None:
+            body = self.compact if self.compact is not None else self.message
+            if self.seq:
+                body = {**body, "sq": self.seq}
+            if self.standings is not None:
+                version, current = self.standings
+                body = {**body, "st": {"v": version, "b": key, "s": standings_delta(current, base)}}
+            packed = self.packed[key] = msgpack.packb(body, use_bin_type=True)
+        return packed
+
+    # -------------------- BACKPLANE --------------------
+
+    def wire(self) -> str:
+        """Node-to-node form: everything a remote node needs to encode for its own sockets"""
+        if self.compact is None and self.standings is None and not self.seq:
+            return self.json_frame()
+        return json.dumps({
+            "_frame": self.message,
+            "compact": self.compact,
+            "seq": self.seq,
+            "standings": [self.standings[0], list(self.standings[1].items())] if self.standings else None
+        }, separators=(",", ":"), ensure_ascii=False)
+
+    @classmethod
+    def from_wire(cls, data: str) -> "OutboundFrame":
+        decoded = json.loads(data)
+        if "_frame" not in decoded:
+            frame = cls(decoded)
+            frame.text = data
+            return frame
+        standings = decoded.get("standings")
+        return cls(
+            decoded["_frame"],
+            decoded.get("compact"),
+            (standings[0], {int(slot): score for slot, score in standings[1]}) if standings else None,
+            decoded.get("seq", 0)
+        )
+
+# ============================================================
+# STANDINGS HISTORY
+# ============================================================
+
+class StandingsHistory:
+    """Recent standings snapshots per room, so deltas can be cut against any recent ack"""
+
+    def __init__(self, keep: int = 8):
+        self.keep = keep
+        self.rooms: Dict[str, OrderedDict[int, Standings]] = {}
+
+    def record(self, room_id: str, version: int, standings: Standings):
+        history = self.rooms.setdefault(room_id, OrderedDict())
+        if version not in history:
+            history[version] = standings
+            while len(history) > self.keep:
+                history.popitem(last=False)
+
+    def get(self, room_id: str, version: int) -> Optional[Standings]:
+        history = self.rooms.get(room_id)
+        return history.get(version) if history and version else None
+
+    def drop(self, room_id: str):
+        self.rooms.pop(room_id, None)
@@ -0,0 +1,321 @@
+# ============================================================
+# BrainSpark Multiplayer Question Bank
+# app/services/question_bank.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import random
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import text
+
+# ============================================================
+# ANSWER NORMALIZATION
+# ============================================================
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+    "eleven": "11", "twelve": "12", "twenty": "20", "hundred": "100",
+}
+LEADING_ARTICLES = ("the ", "a ", "an ")
+NON_WORD = re.compile(r"[^a-z0-9 ]+")
+SPACES = re.compile(r"\s+")
+
+def normalize_answer(value: str) -> str:
+    """Case, accents, punctuation, articles and number words folded away"""
+    value = unicodedata.normalize("NFKD", value or "").encode("ascii", "ignore").decode().lower()
+    value = SPACES.sub(" ", NON_WORD.sub(" ", value)).strip()
+    for article in LEADING_ARTICLES:
+        if value.startswith(article):
+            value = value[len(article):]
+            break
+    return " ".join(NUMBER_WORDS.get(word, word) for word in value.split(" ")) if value else ""
+
+def within_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance <= limit, only computing the diagonal band"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        current = [limit + 1] * (len(b) + 1)
+        current[0] = i if i <= limit else limit + 1
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if ca == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            best = min(best, current[j])
+        if best > limit:
+            return False
+        previous = current
+    return previous[len(b)] <= limit
+
+class CompiledAnswer:
+    """Accepted forms of an answer, normalized once at load time"""
+
+    __slots__ = ("forms", "max_length")
+
+    def __init__(self, answer: str, aliases: Iterable[str] = ()):
+        # "Nectar/Pollen" means either is right
+        raw = [part for part in (answer or "").split("/")] + list(aliases)
+        self.forms: Set[str] = {form for form in (normalize_answer(r) for r in raw) if form}
+        self.max_length = max((len(f) for f in self.forms), default=0)
+
+    @staticmethod
+    def tolerance(form: str) -> int:
+        """Typos allowed - none for short answers like "8" or "Map" """
+        if len(form) <= 3 or form.isdigit():
+            return 0
+        return 1 if len(form) <= 7 else 2
+
+    def matches(self, answer: str) -> bool:
+        guess = normalize_answer(answer)
+        if not guess:
+            return False
+        if guess in self.forms:
+            return True
+        if len(guess) > self.max_length + 2:
+            return False
+        return any(
+            (limit := self.tolerance(form)) and within_distance(guess, form, limit)
+            for form in self.forms
+        )
+
+# ============================================================
+# QUESTIONS
+# ============================================================
+
+KINDS = ("quiz", "riddle", "prompt")
+AGE_GROUPS = ("cubs", "explorers", "masters")
+ANY = "*"
+
+class BankQuestion:
+    """One question with its answer precompiled"""
+
+    __slots__ = ("id", "kind", "topic", "difficulty", "age_group", "text", "answer", "points", "time", "compiled")
+
+    def __init__(self, id: str, kind: str, topic: str, text: str, answer: str = "",
+                 aliases: Iterable[str] = (), difficulty: int = 1, age_group: Optional[str] = None,
+                 points: int = 10, time: int = 30):
+        self.id = id
+        self.kind = kind
+        self.topic = topic
+        self.difficulty = difficulty
+        self.age_group = age_group
+        self.text = text
+        self.answer = answer
+        self.points = points
+        self.time = time
+        self.compiled = CompiledAnswer(answer, aliases) if answer else None
+
+    def to_round(self) -> dict:
+        """Room question dict - same keys the game already reads"""
+        if self.kind == "prompt":
+            return {"id": self.id, "prompt": self.text, "time": self.time}
+        return {"id": self.id, "q": self.text, "a": self.answer, "points": self.points, "time": self.time}
+
+    def is_correct(self, answer: str) -> bool:
+        return self.compiled is not None and self.compiled.matches(answer)
+
+# ============================================================
+# RECENTLY SEEN
+# ============================================================
+
+class RecentQuestions:
+    """Last N question ids each player saw, bounded per player and in total players"""
+
+    def __init__(self, per_player: int = 200, max_players: int = 200_000):
+        self.per_player = per_player
+        self.max_players = max_players
+        self.players: OrderedDict[str, Tuple[Deque[str], Set[str]]] = OrderedDict()
+
+    def seen(self, player_id: str) -> Set[str]:
+        entry = self.players.get(player_id)
+        return entry[1] if entry else set()
+
+    def record(self, player_id: str, question_ids: Iterable[str]):
+        entry = self.players.get(player_id)
+        if entry is None:
+            entry = self.players[player_id] = (deque(), set())
+        self.players.move_to_end(player_id)
+        order, ids = entry
+        for qid in question_ids:
+            if qid in ids:
+                continue
+            order.append(qid)
+            ids.add(qid)
+            if len(order) > self.per_player:
+                ids.discard(order.popleft())
+        while len(self.players) > self.max_players:
+            self.players.popitem(last=False)
+
+# ============================================================
+# QUESTION BANK
+# ============================================================
+
+QUESTION_BANK_SQL = text("""
+    SELECT id, kind, topic, question, answer, aliases, difficulty, age_group, points, time_limit
+    FROM multiplayer_questions
+    WHERE is_active = TRUE
+""")
+
+IndexKey = Tuple[str, str, str, str]  # (kind, topic, age_group, difficulty)
+
+class QuestionBank:
+    """Questions indexed by kind/topic/age group/difficulty for O(k) sampling"""
+
+    def __init__(self, session_factory: Optional[Callable] = None, seed: Optional[int] = None):
+        self.session_factory = session_factory
+        self.questions: Dict[str, BankQuestion] = {}
+        self.index: Dict[IndexKey, List[BankQuestion]] = {}
+        self.recent = RecentQuestions()
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    # -------------------- LOADING --------------------
+
+    def load(self, questions: Iterable[BankQuestion], replace: bool = False):
+        """Build new indexes off to the side and swap them in"""
+        with self.lock:
+            by_id = {} if replace else dict(self.questions)
+            for question in questions:
+                by_id[question.id] = question
+            index: Dict[IndexKey, List[BankQuestion]] = {}
+            for question in by_id.values():
+                for key in self.index_keys(question):
+                    index.setdefault(key, []).append(question)
+            self.questions, self.index = by_id, index
+
+    @staticmethod
+    def index_keys(question: BankQuestion) -> List[IndexKey]:
+        # Unrestricted questions serve every age group; ANY covers mixed rooms
+        ages = [question.age_group] if question.age_group else list(AGE_GROUPS)
+        return [
+            (question.kind, topic, age, difficulty)
+            for topic in (question.topic, ANY)
+            for age in ages + [ANY]
+            for difficulty in (str(question.difficulty), ANY)
+        ]
+
+    def load_builtin(self, quizzes: Dict[str, List[dict]], riddles: List[dict], prompts: List[str]):
+        """The small in-code sets, so a fresh install still has something to play"""
+        questions = [
+            self.from_record(f"builtin:{topic}:{i}", "quiz", topic, q)
+            for topic, items in quizzes.items()
+            for i, q in enumerate(items)
+        ]
+        questions += [self.from_record(f"builtin:riddle:{i}", "riddle", "General", q) for i, q in enumerate(riddles)]
+        questions += [
+            BankQuestion(f"builtin:prompt:{i}", "prompt", "General", p)
+            for i, p in enumerate(prompts)
+        ]
+        self.load(questions)
+
+    def load_file(self, path: str) -> int:
+        """JSON array or JSON lines: {id, kind, topic, q, a, aliases, difficulty, age_group, points, time}"""
+        with open(path, encoding="utf-8") as f:
+            content = f.read().strip()
+        records = json.loads(content) if content.startswith("[") else [
+            json.loads(line) for line in content.splitlines() if line.strip()
+        ]
+        questions = [
+            self.from_record(r.get("id") or f"{path}:{i}", r.get("kind", "quiz"), r.get("topic", "General"), r)
+            for i, r in enumerate(records)
+        ]
+        self.load(questions)
+        return len(questions)
+
+    def load_from_db(self) -> int:
+        if self.session_factory is None:
+            return 0
+        with self.session_factory() as db:
+            questions = [
+                BankQuestion(
+                    id=str(row.id), kind=row.kind, topic=row.topic, text=row.question,
+                    answer=row.answer or "", aliases=row.aliases or (), difficulty=row.difficulty or 1,
+                    age_group=row.age_group, points=row.points or 10, time=row.time_limit or 30
+                )
+                for row in db.execute(QUESTION_BANK_SQL)
+            ]
+        self.load(questions)
+        return len(questions)
+
+    @staticmethod
+    def from_record(qid: str, kind: str, topic: str, record: dict) -> BankQuestion:
+        return BankQuestion(
+            id=qid, kind=kind, topic=topic,
+            text=record.get("q") or record.get("prompt", ""),
+            answer=record.get("a", ""),
+            aliases=record.get("aliases", ()),
+            difficulty=record.get("difficulty", 1),
+            age_group=record.get("age_group"),
+            points=record.get("points", 10),
+            time=record.get("time", 30)
+        )
+
+    # -------------------- SAMPLING --------------------
+
+    def candidates(self, kind: str, topic: str, age_group: Optional[str], difficulty: Optional[int]) -> List[BankQuestion]:
+        age = age_group if age_group in AGE_GROUPS else ANY
+        level = str(difficulty) if difficulty else ANY
+        for key in ((kind, topic, age, level), (kind, topic, age, ANY), (kind, ANY, age, ANY), (kind, ANY, ANY, ANY)):
+            pool = self.index.get(key)
+            if pool:
+                return pool
+        return []
+
+    def sample(self, kind: str, topic: str, k: int, player_ids: Iterable[str] = (),
+               age_group: Optional[str] = None, difficulty: Optional[int] = None) -> List[BankQuestion]:
+        """k distinct questions, avoiding what these players saw recently when the pool allows"""
+        pool = self.candidates(kind, topic, age_group, difficulty)
+        k = min(k, len(pool))
+        if k == 0:
+            return []
+        player_ids = list(player_ids)
+        seen = [self.recent.seen(p) for p in player_ids]
+        picked: Dict[str, BankQuestion] = {}
+        fallback: List[BankQuestion] = []
+        # Rejection sampling: O(k) expected while recent history is small next to the pool
+        attempts = 8 * k + 16
+        while len(picked) < k and attempts:
+            attempts -= 1
+            question = pool[self.rng.randrange(len(pool))]
+            if question.id in picked:
+                continue
+            if any(question.id in s for s in seen):
+                fallback.append(question)
+                continue
+            picked[question.id] = question
+        # Small pool or heavy players: repeats are better than a short game
+        for question in fallback + (self.rng.sample(pool, k) if len(picked) < k else []):
+            if len(picked) >= k:
+                break
+            picked.setdefault(question.id, question)
+
+        chosen = list(picked.values())
+        ids = [q.id for q in chosen]
+        for player_id in player_ids:
+            self.recent.record(player_id, ids)
+        return chosen
+
+    def get(self, question_id: str) -> Optional[BankQuestion]:
+        return self.questions.get(question_id)
+
+    def metrics(self) -> dict:
+        return {
+            "questions": len(self.questions),
+            "index_keys": len(self.index),
+            "players_tracked": len(self.recent.players),
+        }
+
+# Shared per process; main.py sets question_bank.session_factory, the multiplayer startup calls load_from_db()
+question_bank = QuestionBank()
@@ -0,0 +1,299 @@
+# ============================================================
+# BrainSpark Multiplayer Result Writer
+# app/services/result_writer.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Union
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from .db_routing import db_router
+from .gamification import child_state_cache
+from .rewards import RewardEvent, RewardEventKind, RewardEventLog
+from .tiered_cache import tiered_cache
+
+# ============================================================
+# RECORDS
+# ============================================================
+
+@dataclass
+class PlayerResult:
+    player_id: str
+    rank: int
+    score: int
+    correct_answers: int
+    stars_awarded: int
+
+@dataclass
+class GameResult:
+    game_id: str  # Idempotency key - generated once per game, reused on every retry
+    room_id: str
+    challenge_type: str
+    topic: str
+    winner_id: Optional[str]
+    rounds: int
+    started_at: Optional[datetime]
+    ended_at: datetime
+    players: List[PlayerResult] = field(default_factory=list)
+
+@dataclass
+class ChallengeRecord:
+    id: str
+    challenger_id: str
+    challenged_id: str
+    challenge_type: str
+    topic: str
+    status: str
+    winner_id: Optional[str]
+    created_at: datetime
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+WriteRecord = Union[GameResult, ChallengeRecord]
+
+# ============================================================
+# SQL
+# ============================================================
+
+INSERT_GAMES_SQL = text("""
+    INSERT INTO multiplayer_games (id, room_id, challenge_type, topic, winner_id, player_count, rounds, started_at, ended_at)
+    SELECT * FROM unnest(
+        CAST(:ids AS TEXT[]), CAST(:room_ids AS TEXT[]), CAST(:challenge_types AS TEXT[]), CAST(:topics AS TEXT[]),
+        CAST(:winner_ids AS TEXT[]), CAST(:player_counts AS INTEGER[]), CAST(:rounds AS INTEGER[]),
+        CAST(:started_at AS TIMESTAMPTZ[]), CAST(:ended_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (id) DO NOTHING
+""")
+
+# Player rows double as the reward claim: only rows inserted by this statement
+# credit stars, so a retried batch can never pay out twice.
+INSERT_PLAYERS_AND_CREDIT_SQL = text("""
+    WITH claimed AS (
+        INSERT INTO multiplayer_game_players (game_id, player_id, rank, score, correct_answers, stars_awarded)
+        SELECT * FROM unnest(
+            CAST(:game_ids AS TEXT[]), CAST(:player_ids AS TEXT[]), CAST(:ranks AS INTEGER[]),
+            CAST(:scores AS INTEGER[]), CAST(:correct AS INTEGER[]), CAST(:stars AS INTEGER[])
+        )
+        ON CONFLICT (game_id, player_id) DO NOTHING
+        RETURNING player_id, stars_awarded
+    ),
+    per_child AS (
+        SELECT CAST(player_id AS UUID) AS child_id, SUM(stars_awarded) AS amount
+        FROM claimed
+        WHERE stars_awarded > 0
+          AND player_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+        GROUP BY player_id
+    ),
+    credited AS (
+        UPDATE child_profiles cp
+        SET stars = cp.stars + pc.amount
+        FROM per_child pc
+        WHERE cp.id = pc.child_id
+        RETURNING cp.id, cp.user_id, cp.stars, pc.amount
+    ),
+    ledger AS (
+        INSERT INTO star_ledger (child_id, amount, balance_after, source)
+        SELECT id, amount, stars, 'multiplayer' FROM credited
+    )
+    SELECT id::text AS child_id, user_id::text AS user_id, amount FROM credited
+""")
+
+UPSERT_CHALLENGES_SQL = text("""
+    INSERT INTO multiplayer_challenges (id, challenger_id, challenged_id, challenge_type, topic, status, winner_id, created_at, updated_at)
+    SELECT * FROM unnest(
+        CAST(:ids AS TEXT[]), CAST(:challenger_ids AS TEXT[]), CAST(:challenged_ids AS TEXT[]),
+        CAST(:challenge_types AS TEXT[]), CAST(:topics AS TEXT[]), CAST(:statuses AS TEXT[]),
+        CAST(:winner_ids AS TEXT[]), CAST(:created_at AS TIMESTAMPTZ[]), CAST(:updated_at AS TIMESTAMPTZ[])
+    )
+    ON CONFLICT (id) DO UPDATE SET
+        status = EXCLUDED.status,
+        winner_id = EXCLUDED.winner_id,
+        updated_at = EXCLUDED.updated_at
+    WHERE multiplayer_challenges.updated_at <= EXCLUDED.updated_at
+""")
+
+# ============================================================
+# WRITER
+# ============================================================
+
+class ResultWriter:
+    """Bounded in-memory queue drained by one task into batched, idempotent writes.
+
+    submit() never waits on the database, so game end stays as fast as
+    a queue append however slow Postgres is.
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None, max_queue: int = 20000,
+                 batch_size: int = 500, flush_interval: float = 0.5, max_retries: int = 5):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.pending: List[WriteRecord] = []  # Batch the flusher is currently writing
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.rejected = 0
+        self.retries = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_seconds = 0.0
+
+    def submit(self, record: WriteRecord) -> bool:
+        """Queue a record; False (and counted) if the queue is full"""
+        self.start()
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            print(f"Result writer queue full, dropped {type(record).__name__}")
+            return False
+        self.submitted += 1
+        return True
+
+    def start(self):
+        if self.session_factory is None and self.task is None:
+            print("Result writer has no session_factory - game results and multiplayer stars will NOT be saved")
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop (router shutdown)"""
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        # The interrupted batch may or may not have committed - idempotent either way
+        pending, self.pending = self.pending, []
+        await self.write_with_retry(pending)
+        while self.queue is not None and not self.queue.empty():
+            await self.write_with_retry(self.take_batch())
+
+    async def run(self):
+        while True:
+            first = await self.queue.get()
+            # Let a burst of simultaneous game ends pile into the same batch
+            await asyncio.sleep(self.flush_interval)
+            self.pending = [first] + self.take_batch(self.batch_size - 1)
+            await self.write_with_retry(self.pending)
+            self.pending = []
+
+    def take_batch(self, limit: Optional[int] = None) -> List[WriteRecord]:
+        limit = self.batch_size if limit is None else limit
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def write_with_retry(self, batch: List[WriteRecord]):
+        if not batch:
+            return
+        if self.session_factory is None:
+            # Nothing to retry against - count them lost instead of written
+            self.failed += len(batch)
+            print(f"Result writer has no session_factory, dropped {len(batch)} records")
+            return
+        for attempt in range(self.max_retries + 1):
+            try:
+                started = time.monotonic()
+                await asyncio.to_thread(self.write_batch, batch)
+                self.last_batch_seconds = time.monotonic() - started
+                self.batches += 1
+                self.written += len(batch)
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    print(f"Result writer gave up on {len(batch)} records: {e}")
+                    return
+                self.retries += 1
+                # Same records, same keys - the retry is safe whatever got committed
+                await asyncio.sleep(min(30.0, 0.5 * 2 ** attempt))
+
+    def write_batch(self, batch: List[WriteRecord]):
+        if self.session_factory is None:
+            raise RuntimeError("result_writer.session_factory is not set")
+        games = [r for r in batch if isinstance(r, GameResult)]
+        # Latest state wins when a challenge changed more than once in the batch
+        challenges: Dict[str, ChallengeRecord] = {}
+        for record in batch:
+            if isinstance(record, ChallengeRecord):
+                challenges[record.id] = record
+
+        credited: List[str] = []
+        credited_users: List[str] = []
+        with self.session_factory() as db:
+            # Buffered events are flushed with their projections on commit,
+            # in the same transaction as the star credits they explain
+            rewards = RewardEventLog(db)
+            if games:
+                db.execute(INSERT_GAMES_SQL, {
+                    "ids": [g.game_id for g in games],
+                    "room_ids": [g.room_id for g in games],
+                    "challenge_types": [g.challenge_type for g in games],
+                    "topics": [g.topic for g in games],
+                    "winner_ids": [g.winner_id for g in games],
+                    "player_counts": [len(g.players) for g in games],
+                    "rounds": [g.rounds for g in games],
+                    "started_at": [g.started_at for g in games],
+                    "ended_at": [g.ended_at for g in games],
+                })
+                players = [(g.game_id, p) for g in games for p in g.players]
+                rows = db.execute(INSERT_PLAYERS_AND_CREDIT_SQL, {
+                    "game_ids": [game_id for game_id, _ in players],
+                    "player_ids": [p.player_id for _, p in players],
+                    "ranks": [p.rank for _, p in players],
+                    "scores": [p.score for _, p in players],
+                    "correct": [p.correct_answers for _, p in players],
+                    "stars": [p.stars_awarded for _, p in players],
+                }).all()
+                credited = [row.child_id for row in rows]
+                credited_users = [row.user_id for row in rows]
+                rewards.record_many([
+                    RewardEvent(child_id=row.child_id, kind=RewardEventKind.STARS_AWARDED, amount=row.amount, source="multiplayer")
+                    for row in rows
+                ])
+            if challenges:
+                rows = list(challenges.values())
+                db.execute(UPSERT_CHALLENGES_SQL, {
+                    "ids": [c.id for c in rows],
+                    "challenger_ids": [c.challenger_id for c in rows],
+                    "challenged_ids": [c.challenged_id for c in rows],
+                    "challenge_types": [c.challenge_type for c in rows],
+                    "topics": [c.topic for c in rows],
+                    "statuses": [c.status for c in rows],
+                    "winner_ids": [c.winner_id for c in rows],
+                    "created_at": [c.created_at for c in rows],
+                    "updated_at": [c.updated_at for c in rows],
+                })
+            db.commit()
+
+        for child_id in credited:
+            child_state_cache.invalidate(child_id)
+        tiered_cache.invalidate("child_header", *credited)
+        db_router.pin(*credited_users)  # Stats reads are keyed by users id
+
+    def metrics(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "max_queue": self.max_queue,
+            "submitted": self.submitted,
+            "written": self.written,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_seconds": round(self.last_batch_seconds, 4),
+        }
+
+# Shared per process; main.py sets result_writer.session_factory = SessionLocal
+result_writer = ResultWriter()
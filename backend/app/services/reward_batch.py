@@ -0,0 +1,401 @@
+# ============================================================
+# BrainSpark Batch Question Rewards
+# app/services/reward_batch.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
+from datetime import datetime, timezone
+import bisect
+import json
+import time
+
+from sqlalchemy import text
+
+from .gamification import ACHIEVEMENTS, LEVELS, POWER_UPS, Achievement, Level, child_state_cache
+from .rewards import RewardEvent, RewardEventKind, RewardEventLog
+from .tiered_cache import tiered_cache
+
+# ============================================================
+# DATA CLASSES
+# ============================================================
+
+@dataclass
+class QuestionEvent:
+    child_id: str
+    depth: int
+    timestamp: datetime
+
+@dataclass
+class ActivePowerUp:
+    effect: Dict
+    activated_at: datetime
+    expires_at: datetime
+
+@dataclass
+class AchievementReward:
+    """What unlocking one achievement paid out during the fold, so it can be
+    taken back if an online claim recorded the same achievement first"""
+    stars: int
+    xp: int
+    first_event: int   # Slice of the batch's reward events it produced
+    last_event: int
+
+@dataclass
+class ChildRewardState:
+    """Mutable per-child totals while a batch is folded in memory"""
+    child_id: str
+    stars: int
+    total_xp: int
+    total_questions: int
+    max_depth: int
+    streak: int
+    topics_explored: int
+    achievements: List[str]
+    power_ups: List[ActivePowerUp] = field(default_factory=list)
+    # Deltas written back at the end
+    stars_delta: int = 0
+    xp_delta: int = 0
+    questions_delta: int = 0
+    new_achievements: List[str] = field(default_factory=list)
+    achievement_rewards: Dict[str, AchievementReward] = field(default_factory=dict)
+    unlocked_topics: List[str] = field(default_factory=list)
+    level_ups: int = 0
+
+@dataclass
+class BatchRewardResult:
+    events_processed: int = 0
+    events_skipped: int = 0          # Events for children that don't exist
+    children: int = 0
+    stars_awarded: int = 0
+    xp_awarded: int = 0
+    level_ups: int = 0
+    achievements: Dict[str, List[str]] = field(default_factory=dict)
+    fold_seconds: float = 0.0
+    total_seconds: float = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events_processed / self.total_seconds if self.total_seconds else 0.0
+
+# ============================================================
+# SQL
+# ============================================================
+
+LOAD_PROFILES_SQL = text("""
+    SELECT
+        cp.id::text AS id, cp.stars, cp.total_xp, cp.total_questions, cp.max_depth,
+        cp.streak, cp.achievements,
+        (SELECT COUNT(*) FROM topic_progress tp
+         WHERE tp.child_id = cp.id AND tp.questions_asked > 0) AS topics_explored
+    FROM child_profiles cp
+    WHERE cp.id = ANY(CAST(:ids AS UUID[]))
+""")
+
+LOAD_POWER_UPS_SQL = text("""
+    SELECT child_id::text AS child_id, power_up_id, activated_at, expires_at
+    FROM child_power_ups
+    WHERE child_id = ANY(CAST(:ids AS UUID[]))
+      AND consumed_at IS NULL
+      AND expires_at > :since
+""")
+
+# Deltas, not absolute values, so online awards that land mid-batch survive.
+# The profiles are locked first; an achievement that an online claim recorded
+# after LOAD_PROFILES_SQL is skipped, along with the stars and XP it paid.
+# Star changes get one ledger row per child per batch.
+APPLY_DELTAS_SQL = text("""
+    WITH v AS (
+        SELECT * FROM unnest(
+            CAST(:ids AS UUID[]), CAST(:stars AS INTEGER[]), CAST(:xp AS INTEGER[]),
+            CAST(:questions AS INTEGER[]), CAST(:max_depth AS INTEGER[]),
+            CAST(:achievement_rewards AS JSONB[])
+        ) AS v(child_id, stars_delta, xp_delta, questions_delta, max_depth, achievement_rewards)
+    ),
+    locked AS (
+        SELECT cp.id, cp.achievements
+        FROM child_profiles cp
+        WHERE cp.id IN (SELECT child_id FROM v)
+        FOR UPDATE
+    ),
+    claims AS (
+        SELECT l.id AS child_id,
+               COALESCE(jsonb_agg(r.key) FILTER (
+                   WHERE r.key IS NOT NULL AND NOT l.achievements @> jsonb_build_array(r.key)
+               ), '[]'::jsonb) AS added,
+               COALESCE(SUM(CAST(r.value->>'stars' AS INTEGER)) FILTER (
+                   WHERE l.achievements @> jsonb_build_array(r.key)
+               ), 0) AS skipped_stars,
+               COALESCE(SUM(CAST(r.value->>'xp' AS INTEGER)) FILTER (
+                   WHERE l.achievements @> jsonb_build_array(r.key)
+               ), 0) AS skipped_xp
+        FROM locked l
+        JOIN v ON v.child_id = l.id
+        LEFT JOIN LATERAL jsonb_each(v.achievement_rewards) r ON TRUE
+        GROUP BY l.id
+    ),
+    updated AS (
+        UPDATE child_profiles cp SET
+            stars = cp.stars + v.stars_delta - c.skipped_stars,
+            total_xp = cp.total_xp + v.xp_delta - c.skipped_xp,
+            total_questions = cp.total_questions + v.questions_delta,
+            max_depth = GREATEST(cp.max_depth, v.max_depth),
+            achievements = cp.achievements || c.added,
+            last_active = NOW()
+        FROM v
+        JOIN claims c ON c.child_id = v.child_id
+        WHERE cp.id = v.child_id
+        RETURNING cp.id, cp.stars, v.stars_delta - c.skipped_stars AS stars_delta, c.added
+    ),
+    ledger AS (
+        INSERT INTO star_ledger (child_id, amount, balance_after, source)
+        SELECT id, stars_delta, stars, 'question_batch' FROM updated WHERE stars_delta <> 0
+    )
+    SELECT CAST(id AS TEXT) AS child_id, added FROM updated
+""")
+
+UNLOCK_TOPICS_SQL = text("""
+    INSERT INTO topic_progress (child_id, topic_id, unlocked, unlocked_at)
+    SELECT v.child_id, t.id, TRUE, NOW()
+    FROM unnest(CAST(:ids AS UUID[]), CAST(:topics AS TEXT[])) AS v(child_id, topic)
+    JOIN topics t ON t.name = v.topic
+    ON CONFLICT (child_id, topic_id) DO UPDATE SET
+        unlocked = TRUE,
+        unlocked_at = COALESCE(topic_progress.unlocked_at, NOW())
+""")
+
+# ============================================================
+# BATCH PROCESSOR
+# ============================================================
+
+LEVEL_THRESHOLDS = [level.xp_required for level in LEVELS]
+POWER_UP_EFFECTS = {p.id: p.effect for p in POWER_UPS}
+
+BASE_STARS = 5
+BASE_XP = 10
+
+class QuestionBatchProcessor:
+    """Apply question rewards for many (child_id, depth, timestamp) events at once"""
+
+    def __init__(self, db_session, reward_log: Optional[RewardEventLog] = None):
+        self.db = db_session
+        self.rewards = reward_log or RewardEventLog(db_session)
+
+    def process(self, events: List[QuestionEvent]) -> BatchRewardResult:
+        """Load every affected child in one query, fold in memory, write back in bulk"""
+        started = time.perf_counter()
+        result = BatchRewardResult()
+        if not events:
+            return result
+
+        by_child: Dict[str, List[QuestionEvent]] = {}
+        for e in events:
+            by_child.setdefault(e.child_id, []).append(e)
+
+        states = self.load_states(list(by_child), min(e.timestamp for e in events))
+
+        fold_started = time.perf_counter()
+        reward_events: List[RewardEvent] = []
+        for child_id, child_events in by_child.items():
+            state = states.get(child_id)
+            if state is None:
+                result.events_skipped += len(child_events)
+                continue
+            child_events.sort(key=lambda e: e.timestamp)
+            for e in child_events:
+                fold_question(state, e, reward_events)
+            result.events_processed += len(child_events)
+        result.fold_seconds = time.perf_counter() - fold_started
+
+        touched = [s for s in states.values() if s.questions_delta]
+        skipped = self.write_back(touched)
+        self.rewards.record_many(drop_skipped_rewards(reward_events, skipped))
+        self.db.commit()
+        for s in touched:
+            child_state_cache.invalidate(s.child_id)
+        tiered_cache.invalidate("child_header", *(s.child_id for s in touched))
+
+        for s in touched:
+            result.stars_awarded += s.stars_delta
+            result.xp_awarded += s.xp_delta
+            result.level_ups += s.level_ups
+            if s.new_achievements:
+                result.achievements[s.child_id] = s.new_achievements
+        result.children = len(touched)
+        result.total_seconds = time.perf_counter() - started
+        return result
+
+    def load_states(self, child_ids: List[str], since: datetime) -> Dict[str, ChildRewardState]:
+        """One query for profiles, one for the power-ups that could apply to the batch"""
+        states: Dict[str, ChildRewardState] = {}
+        for row in self.db.execute(LOAD_PROFILES_SQL, {"ids": child_ids}):
+            states[row.id] = ChildRewardState(
+                child_id=row.id,
+                stars=row.stars or 0,
+                total_xp=row.total_xp or 0,
+                total_questions=row.total_questions or 0,
+                max_depth=row.max_depth or 0,
+                streak=row.streak or 0,
+                topics_explored=row.topics_explored or 0,
+                achievements=list(row.achievements or [])
+            )
+
+        for row in self.db.execute(LOAD_POWER_UPS_SQL, {"ids": child_ids, "since": since}):
+            state = states.get(row.child_id)
+            effect = POWER_UP_EFFECTS.get(row.power_up_id)
+            if state is not None and effect is not None:
+                state.power_ups.append(ActivePowerUp(effect, _naive_utc(row.activated_at), _naive_utc(row.expires_at)))
+
+        return states
+
+    def write_back(self, states: List[ChildRewardState]) -> List[AchievementReward]:
+        """Bulk update profiles and unlock topics in two statements.
+        Returns the achievement rewards that were not paid (already claimed online)."""
+        if not states:
+            return []
+
+        rows = self.db.execute(APPLY_DELTAS_SQL, {
+            "ids": [s.child_id for s in states],
+            "stars": [s.stars_delta for s in states],
+            "xp": [s.xp_delta for s in states],
+            "questions": [s.questions_delta for s in states],
+            "max_depth": [s.max_depth for s in states],
+            "achievement_rewards": [
+                json.dumps({a: {"stars": r.stars, "xp": r.xp} for a, r in s.achievement_rewards.items()})
+                for s in states
+            ]
+        })
+        added = {row.child_id: set(row.added or ()) for row in rows}
+
+        skipped: List[AchievementReward] = []
+        for s in states:
+            kept = added.get(s.child_id, set())
+            for achievement_id in [a for a in s.new_achievements if a not in kept]:
+                reward = s.achievement_rewards[achievement_id]
+                s.stars_delta -= reward.stars
+                s.xp_delta -= reward.xp
+                skipped.append(reward)
+            s.new_achievements = [a for a in s.new_achievements if a in kept]
+
+        unlocks = [(s.child_id, topic) for s in states for topic in s.unlocked_topics]
+        if unlocks:
+            self.db.execute(UNLOCK_TOPICS_SQL, {
+                "ids": [child_id for child_id, _ in unlocks],
+                "topics": [topic for _, topic in unlocks]
+            })
+        return skipped
+
+def drop_skipped_rewards(events: List[RewardEvent], skipped: List[AchievementReward]) -> List[RewardEvent]:
+    """The batch's reward events minus those produced by achievements that weren't paid"""
+    dropped = set()
+    for reward in skipped:
+        dropped.update(range(reward.first_event, reward.last_event))
+    return [e for i, e in enumerate(events) if i not in dropped]
+
+# ============================================================
+# IN-MEMORY FOLD
+# ============================================================
+
+def fold_question(state: ChildRewardState, event: QuestionEvent, out: List[RewardEvent]):
+    """Same rules as GamificationEngine.process_question, against in-memory state"""
+    depth_multiplier = 1 + (event.depth * 0.1)
+
+    _award_stars(state, int(BASE_STARS * depth_multiplier), "question", event.timestamp, out)
+    _award_xp(state, int(BASE_XP * depth_multiplier), "question", event.timestamp, out)
+
+    state.total_questions += 1
+    state.questions_delta += 1
+    state.max_depth = max(state.max_depth, event.depth)
+
+    _check_achievements(state, event.timestamp, out)
+
+def level_for_xp(total_xp: int) -> Level:
+    return LEVELS[max(0, bisect.bisect_right(LEVEL_THRESHOLDS, total_xp) - 1)]
+
+def _naive_utc(value: datetime) -> datetime:
+    # Question events use naive UTC like the rest of the engine
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _multiplier(state: ChildRewardState, multiplier_type: str, at: datetime) -> float:
+    multiplier = 1.0
+    for pu in state.power_ups:
+        if not (pu.activated_at <= at < pu.expires_at):
+            continue
+        effect_type = pu.effect.get("type")
+        if effect_type == f"{multiplier_type}_multiplier" or effect_type == "all_multiplier":
+            multiplier *= pu.effect.get("value", 1)
+    return multiplier
+
+def _award_stars(state: ChildRewardState, amount: int, source: str, at: datetime, out: List[RewardEvent]):
+    final_amount = int(amount * _multiplier(state, "star", at))
+    if final_amount <= 0:
+        return
+    state.stars += final_amount
+    state.stars_delta += final_amount
+    out.append(RewardEvent(state.child_id, RewardEventKind.STARS_AWARDED, final_amount, source, at))
+
+def _award_xp(state: ChildRewardState, amount: int, source: str, at: datetime, out: List[RewardEvent]):
+    final_amount = int(amount * _multiplier(state, "xp", at))
+    if final_amount <= 0:
+        return
+    old_level = level_for_xp(state.total_xp)
+    state.total_xp += final_amount
+    state.xp_delta += final_amount
+    out.append(RewardEvent(state.child_id, RewardEventKind.XP_AWARDED, final_amount, source, at))
+
+    new_level = level_for_xp(state.total_xp)
+    if new_level.number > old_level.number:
+        state.level_ups += 1
+        for reward in new_level.rewards:
+            if reward["type"] == "stars":
+                _award_stars(state, reward["amount"], f"level_up:{new_level.number}", at, out)
+            elif reward["type"] == "topic_unlock":
+                state.unlocked_topics.append(reward["topic"])
+
+def _check_achievements(state: ChildRewardState, at: datetime, out: List[RewardEvent]):
+    # Rewards can unlock further star/XP achievements, so repeat until stable
+    unlocked_any = True
+    while unlocked_any:
+        unlocked_any = False
+        stats = {
+            "questions_asked": state.total_questions,
+            "max_depth": state.max_depth,
+            "streak": state.streak,
+            "topics_explored": state.topics_explored,
+            "stars": state.stars,
+        }
+        for achievement in ACHIEVEMENTS:
+            if achievement.id in state.achievements:
+                continue
+            if not _condition_met(achievement, stats, at):
+                continue
+            state.achievements.append(achievement.id)
+            state.new_achievements.append(achievement.id)
+            source = f"achievement:{achievement.id}"
+            first_event, stars_before, xp_before = len(out), state.stars_delta, state.xp_delta
+            out.append(RewardEvent(state.child_id, RewardEventKind.ACHIEVEMENT_UNLOCKED, 0, source, at))
+            _award_stars(state, achievement.stars_reward, source, at, out)
+            _award_xp(state, achievement.xp_reward, source, at, out)  # Includes any level-up it causes
+            state.achievement_rewards[achievement.id] = AchievementReward(
+                state.stars_delta - stars_before, state.xp_delta - xp_before, first_event, len(out)
+            )
+            unlocked_any = True
+
+def _condition_met(achievement: Achievement, stats: dict, at: datetime) -> bool:
+    for key, required_value in achievement.condition.items():
+        if key == "special":
+            # Time-of-day specials use the event's own timestamp, not replay time
+            if required_value == "night_owl":
+                return at.hour >= 22 or at.hour < 4
+            if required_value == "early_bird":
+                return 5 <= at.hour < 7
+            if required_value == "weekend":
+                return at.weekday() >= 5
+            return False  # speed_demon needs a rolling window a single event lacks
+        if stats.get(key, 0) < required_value:
+            return False
+    return True
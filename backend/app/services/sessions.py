@@ -0,0 +1,114 @@
+# ============================================================
+# BrainSpark Multiplayer Sessions (resume + replay)
+# app/services/sessions.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+import hashlib
+import hmac
+import os
+import time
+
+from .protocol import OutboundFrame
+
+# ============================================================
+# RESUME TOKENS
+# ============================================================
+
+RESUME_SECRET = os.getenv("MULTIPLAYER_RESUME_SECRET") or os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
+RESUME_WINDOW_SECONDS = 300
+
+def sign_resume(room_id: str, player_id: str, issued: int) -> str:
+    message = f"{room_id}:{player_id}:{issued}".encode()
+    return hmac.new(RESUME_SECRET.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+def issue_resume_token(room_id: str, player_id: str) -> str:
+    """Opaque token binding a reconnect to this room and player; valid on any node"""
+    issued = int(time.time())
+    return f"{issued}.{sign_resume(room_id, player_id, issued)}"
+
+def verify_resume_token(token: Optional[str], room_id: str, player_id: str) -> bool:
+    if not token or "." not in token:
+        return False
+    issued, signature = token.split(".", 1)
+    if not issued.isdigit() or time.time() - int(issued) > RESUME_WINDOW_SECONDS:
+        return False
+    return hmac.compare_digest(signature, sign_resume(room_id, player_id, int(issued)))
+
+# ============================================================
+# REPLAY BUFFER
+# ============================================================
+
+# (frame, only this player or None, players excluded)
+ReplayEntry = Tuple[OutboundFrame, Optional[str], FrozenSet[str]]
+
+class ReplayBuffer:
+    """Last N sequenced frames of one room"""
+
+    __slots__ = ("entries", "last_seq")
+
+    def __init__(self, capacity: int):
+        self.entries: Deque[ReplayEntry] = deque(maxlen=capacity)
+        self.last_seq = 0
+
+    def append(self, frame: OutboundFrame, to: Optional[str], exclude) -> None:
+        if frame.seq <= self.last_seq:
+            return  # Duplicate relay
+        self.entries.append((frame, to, frozenset(exclude)))
+        self.last_seq = frame.seq
+
+    def since(self, last_seq: int, player_id: str) -> Optional[List[OutboundFrame]]:
+        """Frames after last_seq meant for this player, or None if some already fell out"""
+        if last_seq >= self.last_seq:
+            return []
+        oldest = self.entries[0][0].seq if self.entries else self.last_seq + 1
+        if last_seq + 1 < oldest:
+            return None
+        return [
+            frame for frame, to, exclude in self.entries
+            if frame.seq > last_seq and (to is None or to == player_id) and player_id not in exclude
+        ]
+
+class ReplayStore:
+    """Replay buffers for every room this node has sockets in (or runs)"""
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.rooms: Dict[str, ReplayBuffer] = {}
+        self.replayed_frames = 0
+        self.resyncs = 0
+
+    def record(self, room_id: str, frame: OutboundFrame, to: Optional[str] = None, exclude=()):
+        buffer = self.rooms.get(room_id)
+        if buffer is None:
+            buffer = self.rooms[room_id] = ReplayBuffer(self.capacity)
+        buffer.append(frame, to, exclude)
+
+    def last_seq(self, room_id: str) -> int:
+        buffer = self.rooms.get(room_id)
+        return buffer.last_seq if buffer else 0
+
+    def since(self, room_id: str, last_seq: int, player_id: str) -> Optional[List[OutboundFrame]]:
+        buffer = self.rooms.get(room_id)
+        if buffer is None:
+            return None if last_seq else []
+        frames = buffer.since(last_seq, player_id)
+        if frames is None:
+            self.resyncs += 1
+        else:
+            self.replayed_frames += len(frames)
+        return frames
+
+    def drop(self, room_id: str):
+        self.rooms.pop(room_id, None)
+
+    def metrics(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "buffered_frames": sum(len(b.entries) for b in self.rooms.values()),
+            "replayed_frames": self.replayed_frames,
+            "resyncs": self.resyncs,
+        }
@@ -0,0 +1,446 @@
+# ============================================================
+# BrainSpark Two-Tier Cache
+# app/services/tiered_cache.py
+# ============================================================
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+# ============================================================
+# REDIS KEYS
+# ============================================================
+
+VALUE_KEY = "cache:{namespace}:{key}"
+LOCK_KEY = "cache:lock:{namespace}:{key}"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Only the worker still holding the load lock may fill L2. invalidate() deletes
+# the lock, so a load that raced a write can't put the old value back.
+SET_IF_LOCKED_LUA = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+  redis.call('DEL', KEYS[2])
+  return 1
+end
+return 0
+"""
+
+MISSING = object()
+
+# ============================================================
+# NAMESPACES
+# ============================================================
+
+@dataclass
+class Namespace:
+    name: str
+    ttl: float            # Redis lifetime
+    l1_ttl: float         # In-process lifetime - bounds staleness if an invalidation is missed
+    beta: float = 1.0     # Early-refresh eagerness (XFetch); 0 disables it
+    generation: int = 0   # Bumped on every invalidation; loads that overlap one don't fill L1
+    # Metrics
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    early_refreshes: int = 0
+    coalesced: int = 0
+    invalidations: int = 0
+
+    def metrics(self) -> dict:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "early_refreshes": self.early_refreshes,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "l1_hit_ratio": self.l1_hits / lookups if lookups else 0.0,
+            "hit_ratio": (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0,
+        }
+
+# Rarely-changing reads. Child headers carry stars/streak, so they are
+# invalidated by the reward writers and kept short in case one is missed.
+DEFAULT_NAMESPACES = (
+    Namespace("topics", ttl=3600, l1_ttl=600),
+    Namespace("achievements", ttl=3600, l1_ttl=600),
+    Namespace("levels", ttl=3600, l1_ttl=600),
+    Namespace("family", ttl=600, l1_ttl=120),        # parent user id -> children
+    Namespace("child_header", ttl=120, l1_ttl=30),   # child profile id -> header
+)
+
+class CacheEntry:
+    __slots__ = ("value", "delta", "expires_at", "l1_expires_at")
+
+    def __init__(self, value: Any, delta: float, expires_at: float, l1_expires_at: float):
+        self.value = value
+        self.delta = delta              # Seconds the last load took
+        self.expires_at = expires_at    # Wall clock, shared by every worker via L2
+        self.l1_expires_at = l1_expires_at
+
+class Flight:
+    """One in-progress load that concurrent callers in this process wait on"""
+
+    __slots__ = ("event", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = MISSING
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class TieredCache:
+    """In-process LRU (L1) in front of Redis (L2), invalidated across workers over pub/sub.
+
+    A miss is loaded once per key: threads in this process wait on the same
+    flight, other workers wait on a Redis lock and then read what the holder
+    stored. Entries near expiry are refreshed early by a single random caller
+    (XFetch) so a hot key never expires under load. Calls are synchronous and
+    never raise on Redis trouble - they fall back to the loader.
+    """
+
+    def __init__(self, redis=None, namespaces: Iterable[Namespace] = DEFAULT_NAMESPACES,
+                 max_entries: int = 100_000, lock_seconds: float = 5.0, lock_wait: float = 0.25,
+                 node_id: Optional[str] = None):
+        self.redis = redis
+        self.namespaces: Dict[str, Namespace] = {ns.name: ns for ns in namespaces}
+        self.max_entries = max_entries
+        self.lock_seconds = lock_seconds
+        self.lock_wait = lock_wait
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.entries: OrderedDict[Tuple[str, str], CacheEntry] = OrderedDict()
+        self.lock = threading.Lock()
+        self.flights: Dict[Tuple[str, str], Flight] = {}
+        self.set_if_locked = None
+        self.listener: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        # Metrics
+        self.evictions = 0
+        self.redis_errors = 0
+        self.invalidations_received = 0
+        self.invalidation_lag_ms = 0.0
+
+    def namespace(self, name: str) -> Namespace:
+        ns = self.namespaces.get(name)
+        if ns is None:
+            ns = self.namespaces[name] = Namespace(name, ttl=300, l1_ttl=60)
+        return ns
+
+    # -------------------- READS --------------------
+
+    def get(self, namespace: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Cached value for key, calling loader() at most once across workers on a miss"""
+        ns = self.namespace(namespace)
+        key = str(key)
+        entry = self.l1_get(ns.name, key)
+        if entry is not None:
+            ns.l1_hits += 1
+        else:
+            entry = self.l2_get(ns, key)
+            if entry is None:
+                ns.misses += 1
+                return self.load(ns, key, loader)
+            ns.l2_hits += 1
+        if self.refresh_early(ns, entry):
+            ns.early_refreshes += 1
+            return self.load(ns, key, loader, stale=entry.value)
+        return entry.value
+
+    def get_many(self, namespace: str, keys: Iterable[str],
+                 loader: Callable[[List[str]], Dict[str, Any]]) -> Dict[str, Any]:
+        """Batch form: one MGET for the L1 misses, one loader(missing_keys) call for the rest.
+
+        Keys the loader leaves out are cached as None. Batch loads skip the
+        per-key locks - they exist to save many calls, not to serialize them.
+        """
+        ns = self.namespace(namespace)
+        keys = list(dict.fromkeys(str(k) for k in keys))
+        found: Dict[str, Any] = {}
+        pending: List[str] = []
+        for key in keys:
+            entry = self.l1_get(ns.name, key)
+            if entry is not None and not self.refresh_early(ns, entry):
+                ns.l1_hits += 1
+                found[key] = entry.value
+            else:
+                pending.append(key)
+
+        if pending and self.redis is not None:
+            try:
+                raw = self.redis.mget([VALUE_KEY.format(namespace=ns.name, key=k) for k in pending])
+            except Exception as e:
+                self.redis_error(e)
+                raw = [None] * len(pending)
+            missing = []
+            for key, value in zip(pending, raw):
+                entry = self.decode(ns, value)
+                if entry is None or self.refresh_early(ns, entry):
+                    missing.append(key)
+                    continue
+                ns.l2_hits += 1
+                self.l1_put(ns, key, entry)
+                found[key] = entry.value
+            pending = missing
+
+        if pending:
+            ns.misses += len(pending)
+            generation = ns.generation
+            started = time.monotonic()
+            loaded = loader(pending)
+            delta = time.monotonic() - started
+            for key in pending:
+                value = loaded.get(key)
+                found[key] = value
+                self.store(ns, key, value, delta, generation)
+        return {key: found.get(key) for key in keys}
+
+    def load(self, ns: Namespace, key: str, loader: Callable[[], Any], stale: Any = MISSING) -> Any:
+        """Single-flight load; with a stale value in hand, never wait for someone else's load"""
+        flight_key = (ns.name, key)
+        with self.lock:
+            flight = self.flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[flight_key] = Flight()
+        if not leader:
+            if stale is not MISSING:
+                return stale
+            ns.coalesced += 1
+            if flight.event.wait(self.lock_wait) and flight.value is not MISSING:
+                return flight.value
+            return loader()  # The leader is stuck or failed - don't hang behind it
+
+        try:
+            token = self.acquire(ns, key)
+            if token is None:
+                # Another worker is loading it
+                if stale is not MISSING:
+                    return stale
+                ns.coalesced += 1
+                entry = self.wait_for_l2(ns, key)
+                if entry is not None:
+                    flight.value = entry.value
+                    return entry.value
+            generation = ns.generation
+            started = time.monotonic()
+            value = loader()
+            self.store(ns, key, value, time.monotonic() - started, generation, token)
+            flight.value = value
+            return value
+        finally:
+            with self.lock:
+                self.flights.pop(flight_key, None)
+            flight.event.set()
+
+    def refresh_early(self, ns: Namespace, entry: CacheEntry) -> bool:
+        """XFetch: refresh with rising probability as expiry nears, sooner for slow loads"""
+        if ns.beta <= 0:
+            return False
+        return time.time() - entry.delta * ns.beta * math.log(1.0 - random.random()) >= entry.expires_at
+
+    # -------------------- WRITES --------------------
+
+    def store(self, ns: Namespace, key: str, value: Any, delta: float, generation: int,
+              token: Optional[str] = None):
+        now = time.time()
+        entry = CacheEntry(value, delta, now + ns.ttl, now + ns.l1_ttl)
+        if ns.generation == generation:
+            self.l1_put(ns, key, entry)  # Skipped if a write landed mid-load
+        if self.redis is None:
+            return
+        payload = json.dumps({"v": value, "d": round(delta, 4), "e": entry.expires_at}, default=str)
+        value_key = VALUE_KEY.format(namespace=ns.name, key=key)
+        ttl_ms = int(ns.ttl * 1000)
+        try:
+            if not token:
+                if ns.generation == generation:
+                    self.redis.set(value_key, payload, px=ttl_ms)
+            else:
+                if self.set_if_locked is None:
+                    self.set_if_locked = self.redis.register_script(SET_IF_LOCKED_LUA)
+                self.set_if_locked(keys=[value_key, LOCK_KEY.format(namespace=ns.name, key=key)],
+                                   args=[token, payload, ttl_ms])
+        except Exception as e:
+            self.redis_error(e)
+
+    def invalidate(self, namespace: str, *keys: Optional[str]):
+        """Drop keys everywhere: this worker's L1, Redis, then every other worker's L1 (call after commit)"""
+        ns = self.namespace(namespace)
+        keys = [str(k) for k in keys if k]
+        if not keys:
+            return
+        ns.generation += 1
+        ns.invalidations += len(keys)
+        self.drop_local(ns.name, keys)
+        if self.redis is None:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(*[VALUE_KEY.format(namespace=ns.name, key=k) for k in keys],
+                        *[LOCK_KEY.format(namespace=ns.name, key=k) for k in keys])
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps({
+                "origin": self.node_id,
+                "namespace": ns.name,
+                "keys": keys,
+                "at": time.time()
+            }))
+            pipe.execute()
+        except Exception as e:
+            self.redis_error(e)
+
+    # -------------------- L1 --------------------
+
+    def l1_get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None:
+                return None
+            if time.time() > entry.l1_expires_at:
+                del self.entries[(namespace, key)]
+                return None
+            self.entries.move_to_end((namespace, key))
+            return entry
+
+    def l1_put(self, ns: Namespace, key: str, entry: CacheEntry):
+        # An L2 entry can have less life left than a fresh L1 one
+        entry.l1_expires_at = min(entry.l1_expires_at, entry.expires_at)
+        with self.lock:
+            self.entries[(ns.name, key)] = entry
+            self.entries.move_to_end((ns.name, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def drop_local(self, namespace: str, keys: Iterable[str]):
+        with self.lock:
+            for key in keys:
+                self.entries.pop((namespace, key), None)
+
+    def clear_local(self):
+        with self.lock:
+            self.entries.clear()
+
+    # -------------------- L2 --------------------
+
+    def l2_get(self, ns: Namespace, key: str) -> Optional[CacheEntry]:
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(VALUE_KEY.format(namespace=ns.name, key=key))
+        except Exception as e:
+            self.redis_error(e)
+            return None
+        entry = self.decode(ns, raw)
+        if entry is not None:
+            self.l1_put(ns, key, entry)
+        return entry
+
+    def decode(self, ns: Namespace, raw: Optional[str]) -> Optional[CacheEntry]:
+        if raw is None:
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+        return CacheEntry(data["v"], data["d"], data["e"], time.time() + ns.l1_ttl)
+
+    def acquire(self, ns: Namespace, key: str) -> Optional[str]:
+        """Load lock token; None if another worker holds it, "" if there is nothing to coordinate with"""
+        if self.redis is None:
+            return ""
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(LOCK_KEY.format(namespace=ns.name, key=key), token,
+                              nx=True, px=int(self.lock_seconds * 1000)):
+                return token
+            return None
+        except Exception as e:
+            self.redis_error(e)
+            return ""  # Can't coordinate - load without the lock
+
+    def wait_for_l2(self, ns: Namespace, key: str) -> Optional[CacheEntry]:
+        """Short poll while the lock holder loads; callers load themselves after lock_wait"""
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = self.l2_get(ns, key)
+            if entry is not None:
+                return entry
+        return None
+
+    def redis_error(self, e: Exception):
+        self.redis_errors += 1
+        if self.redis_errors % 100 == 1:
+            print(f"Cache Redis error ({self.redis_errors} so far): {e}")
+
+    # -------------------- INVALIDATION LISTENER --------------------
+
+    def start(self):
+        if self.redis is None or (self.listener and self.listener.is_alive()):
+            return
+        self.stopping.clear()
+        self.listener = threading.Thread(target=self.listen, name="cache-invalidation", daemon=True)
+        self.listener.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def listen(self):
+        while not self.stopping.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations sent while we weren't subscribed are lost
+                self.clear_local()
+                while not self.stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self.apply_invalidation(message["data"])
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                self.stopping.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def apply_invalidation(self, data: str):
+        payload = json.loads(data)
+        if payload.get("origin") == self.node_id:
+            return  # Already dropped locally
+        ns = self.namespace(payload["namespace"])
+        ns.generation += 1
+        self.drop_local(ns.name, payload["keys"])
+        self.invalidations_received += 1
+        self.invalidation_lag_ms = round((time.time() - payload.get("at", time.time())) * 1000, 2)
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "redis_errors": self.redis_errors,
+            "invalidations_received": self.invalidations_received,
+            "last_invalidation_lag_ms": self.invalidation_lag_ms,
+            "listening": bool(self.listener and self.listener.is_alive()),
+            "namespaces": {name: ns.metrics() for name, ns in self.namespaces.items()},
+        }
+
+# Shared per process; set tiered_cache.redis = redis_client and call start() to share across workers
+tiered_cache = TieredCache()
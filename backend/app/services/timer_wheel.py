@@ -0,0 +1,180 @@
+# ============================================================
+# BrainSpark Hierarchical Timer Wheel
+# app/services/timer_wheel.py
+# ============================================================
+
+from __future__ import annotations
+
+from typing import Callable, List, Optional, Set
+import asyncio
+import math
+import time
+
+# ============================================================
+# TIMER HANDLE
+# ============================================================
+
+class WheelTimer:
+    """Handle returned by TimerWheel.schedule - cancel it through TimerWheel.cancel, O(1)"""
+
+    __slots__ = ("expires", "callback", "args", "bucket", "cancelled", "fired")
+
+    def __init__(self, expires: int, callback: Callable, args: tuple):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.bucket: Optional[Set[WheelTimer]] = None
+        self.cancelled = False
+        self.fired = False
+
+    def cancel(self) -> bool:
+        """True if this removed a pending timer; already fired or cancelled is a no-op"""
+        if self.cancelled or self.fired or self.bucket is None:
+            return False
+        self.cancelled = True
+        self.bucket.discard(self)
+        self.bucket = None
+        return True
+
+# ============================================================
+# TIMER WHEEL
+# ============================================================
+
+class TimerWheel:
+    """Shared coarse-grained scheduler for multiplayer deadlines.
+
+    Three levels of 2^n buckets (tick x 256, x 64, x 64). Insert and cancel
+    are O(1); a tick fires every timer in its bucket together; far-out
+    timers cascade down a level when their bucket comes round.
+    """
+
+    LEVEL_BITS = (8, 6, 6)
+
+    def __init__(self, tick_seconds: float = 0.1):
+        self.tick_seconds = tick_seconds
+        self.levels: List[List[Set[WheelTimer]]] = [[set() for _ in range(1 << bits)] for bits in self.LEVEL_BITS]
+        self.shifts = [sum(self.LEVEL_BITS[:i]) for i in range(len(self.LEVEL_BITS))]
+        self.max_ticks = (1 << sum(self.LEVEL_BITS)) - 1
+        self.origin = time.monotonic()
+        self.current_tick = 0
+        self.active = 0
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        # Metrics
+        self.fired = 0
+        self.cancelled = 0
+        self.max_batch = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def schedule(self, delay: float, callback: Callable, *args) -> WheelTimer:
+        """Run callback(*args) after roughly delay seconds (rounded up to a tick)"""
+        self.ensure_running()
+        now_tick = self.tick_at(time.monotonic())
+        if self.active == 0 and now_tick > self.current_tick:
+            self.current_tick = now_tick  # Idle wheel - nothing to fire in between
+        expires = now_tick + max(1, math.ceil(delay / self.tick_seconds))
+        timer = WheelTimer(expires, callback, args)
+        self.insert(timer)
+        self.active += 1
+        self.wakeup.set()
+        return timer
+
+    def cancel(self, timer: Optional[WheelTimer]):
+        # Cancelling the timer whose callback is running (or ran) must not touch
+        # the count - that timer was already taken off it when it fired
+        if timer is not None and timer.cancel():
+            self.active -= 1
+            self.cancelled += 1
+
+    def tick_at(self, now: float) -> int:
+        return int((now - self.origin) / self.tick_seconds)
+
+    def insert(self, timer: WheelTimer):
+        delta = timer.expires - self.current_tick
+        if delta > self.max_ticks:
+            timer.expires = self.current_tick + self.max_ticks
+            delta = self.max_ticks
+        for level, bits in enumerate(self.LEVEL_BITS):
+            if delta < (1 << (self.shifts[level] + bits)) or level == len(self.LEVEL_BITS) - 1:
+                index = (max(timer.expires, self.current_tick + 1) >> self.shifts[level]) & ((1 << bits) - 1)
+                bucket = self.levels[level][index]
+                bucket.add(timer)
+                timer.bucket = bucket
+                return
+
+    def advance(self) -> List[WheelTimer]:
+        """Move one tick forward; returns the timers that are now due"""
+        self.current_tick += 1
+        due: List[WheelTimer] = []
+        # Cascade higher levels whose bucket boundary we just crossed (highest first)
+        for level in range(len(self.LEVEL_BITS) - 1, 0, -1):
+            if self.current_tick & ((1 << self.shifts[level]) - 1) == 0:
+                index = (self.current_tick >> self.shifts[level]) & ((1 << self.LEVEL_BITS[level]) - 1)
+                bucket = self.levels[level][index]
+                self.levels[level][index] = set()
+                for timer in bucket:
+                    if timer.expires <= self.current_tick:
+                        timer.bucket = None
+                        timer.fired = True
+                        due.append(timer)
+                    else:
+                        self.insert(timer)
+
+        index = self.current_tick & ((1 << self.LEVEL_BITS[0]) - 1)
+        bucket = self.levels[0][index]
+        ready = [t for t in bucket if t.expires <= self.current_tick]
+        due.extend(ready)
+        for timer in ready:
+            bucket.discard(timer)
+            timer.bucket = None
+            timer.fired = True
+        return due
+
+    def ensure_running(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        while True:
+            if self.active == 0:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            next_at = self.origin + (self.current_tick + 1) * self.tick_seconds
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Catch up on every tick that is due, firing each tick's batch together
+            now = time.monotonic()
+            target = self.tick_at(now)
+            self.last_lag = max(0.0, now - next_at)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            while self.current_tick < target:
+                due = self.advance()
+                if not due:
+                    continue
+                self.active -= len(due)
+                self.fired += len(due)
+                self.max_batch = max(self.max_batch, len(due))
+                for timer in due:
+                    try:
+                        timer.callback(*timer.args)
+                    except Exception as e:
+                        print(f"Timer callback error: {e}")
+
+    def metrics(self) -> dict:
+        return {
+            "active_timers": self.active,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "max_batch": self.max_batch,
+            "tick_seconds": self.tick_seconds,
+            "lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4),
+        }
+
+timer_wheel = TimerWheel()
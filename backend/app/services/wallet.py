@@ -0,0 +1,168 @@
+# ============================================================
+# BrainSpark Star Wallet
+# app/services/wallet.py
+# ============================================================
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .db_routing import db_router
+from .tiered_cache import tiered_cache
+
+# ============================================================
+# DATA CLASSES
+# ============================================================
+
+@dataclass
+class WalletTransaction:
+    child_id: str
+    amount: int          # Positive for credits, negative for debits
+    balance_after: int
+    source: str          # "question", "power_up:star_boost", ...
+    created_at: datetime
+
+# ============================================================
+# SQL
+# ============================================================
+
+# Each statement moves the balance and writes the ledger row in one
+# round-trip. The conditional UPDATE re-checks `stars >= :amount` against
+# the latest committed row, so concurrent debits can never overdraw and
+# no lock is held beyond the statement's own transaction.
+
+CREDIT_SQL = text("""
+    WITH credited AS (
+        UPDATE child_profiles
+        SET stars = stars + :amount
+        WHERE id = :child_id
+        RETURNING id, user_id, stars
+    ),
+    ledger AS (
+        INSERT INTO star_ledger (child_id, amount, balance_after, source)
+        SELECT id, :amount, stars, :source FROM credited
+        RETURNING balance_after, created_at
+    )
+    SELECT ledger.balance_after, ledger.created_at, credited.user_id
+    FROM ledger, credited
+""")
+
+DEBIT_SQL = text("""
+    WITH debited AS (
+        UPDATE child_profiles
+        SET stars = stars - :amount
+        WHERE id = :child_id AND stars >= :amount
+        RETURNING id, user_id, stars
+    ),
+    ledger AS (
+        INSERT INTO star_ledger (child_id, amount, balance_after, source)
+        SELECT id, -:amount, stars, :source FROM debited
+        RETURNING balance_after, created_at
+    )
+    SELECT ledger.balance_after, ledger.created_at, debited.user_id
+    FROM ledger, debited
+""")
+
+BALANCE_SQL = text("SELECT stars FROM child_profiles WHERE id = :child_id")
+
+HISTORY_SQL = text("""
+    SELECT amount, balance_after, source, created_at
+    FROM star_ledger
+    WHERE child_id = :child_id
+    ORDER BY id DESC
+    LIMIT :limit
+""")
+
+# ============================================================
+# CACHE INVALIDATION
+# ============================================================
+
+# session.info key: children whose balance changed in the open transaction,
+# child_profiles id -> the child's users id
+TOUCHED_KEY = "touched_children"
+
+def _invalidate_after_commit(session):
+    touched: Dict[str, str] = session.info.get(TOUCHED_KEY, {})
+    session.info[TOUCHED_KEY] = {}
+    tiered_cache.invalidate("child_header", *touched)
+    db_router.pin(*touched.values())  # Stats reads are keyed by users id
+
+def _forget_after_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:  # A savepoint rollback keeps the outer changes
+        session.info.get(TOUCHED_KEY, {}).clear()
+
+# ============================================================
+# STAR WALLET
+# ============================================================
+
+class StarWallet:
+    """Atomic star balance with a ledger entry for every credit and debit"""
+
+    def __init__(self, db_session):
+        self.db = db_session
+        # Cached headers carry the balance - drop them once the change is committed.
+        # Hooked once per session, however many wallets share it.
+        if TOUCHED_KEY not in db_session.info:
+            db_session.info[TOUCHED_KEY] = {}
+            event.listen(db_session, "after_commit", _invalidate_after_commit)
+            event.listen(db_session, "after_soft_rollback", _forget_after_rollback)
+
+    def credit(self, child_id: str, amount: int, source: str) -> Optional[WalletTransaction]:
+        """Add stars to a child's balance. Returns None if the child doesn't exist."""
+        if amount <= 0:
+            raise ValueError("Credit amount must be positive")
+        return self._apply(CREDIT_SQL, child_id, amount, amount, source)
+
+    def debit(self, child_id: str, amount: int, source: str) -> Optional[WalletTransaction]:
+        """Spend stars if the balance covers it. Returns None when it doesn't."""
+        if amount <= 0:
+            raise ValueError("Debit amount must be positive")
+        return self._apply(DEBIT_SQL, child_id, amount, -amount, source)
+
+    def balance(self, child_id: str) -> int:
+        """Current committed star balance"""
+        stars = self.db.execute(BALANCE_SQL, {"child_id": child_id}).scalar()
+        return stars or 0
+
+    def history(self, child_id: str, limit: int = 50) -> List[WalletTransaction]:
+        """Most recent ledger entries, newest first"""
+        rows = self.db.execute(HISTORY_SQL, {"child_id": child_id, "limit": limit})
+        return [
+            WalletTransaction(
+                child_id=child_id,
+                amount=row.amount,
+                balance_after=row.balance_after,
+                source=row.source,
+                created_at=row.created_at
+            )
+            for row in rows
+        ]
+
+    def sync_profile(self, profile, transaction: Optional[WalletTransaction]):
+        """Mirror a new balance onto a loaded ORM profile without marking it dirty"""
+        if profile is not None and transaction is not None:
+            set_committed_value(profile, "stars", transaction.balance_after)
+
+    def _apply(self, statement, child_id: str, amount: int, signed_amount: int, source: str) -> Optional[WalletTransaction]:
+        row = self.db.execute(statement, {
+            "child_id": child_id,
+            "amount": amount,
+            "source": source
+        }).first()
+
+        if row is None:
+            return None
+
+        self.db.info[TOUCHED_KEY][child_id] = row.user_id
+        return WalletTransaction(
+            child_id=child_id,
+            amount=signed_amount,
+            balance_after=row.balance_after,
+            source=source,
+            created_at=row.created_at
+        )
@@ -0,0 +1,71 @@
+# ============================================================
+# BrainSpark Benchmark - Multiplayer Question Bank
+# benchmarks/bench_question_bank.py
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_question_bank [questions] [checks]
+# ============================================================
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+
+from app.services.question_bank import BankQuestion, QuestionBank
+
+TOPICS = ["Space", "Nature", "Animals", "General", "Science", "History", "Music", "Math"]
+WORDS = ["jupiter", "photosynthesis", "cheetah", "pacific", "gravity", "volcano", "pyramid", "violin"]
+
+
+def make_questions(count: int) -> list:
+    rng = random.Random(7)
+    return [
+        BankQuestion(
+            id=f"q{i}",
+            kind="quiz",
+            topic=rng.choice(TOPICS),
+            text=f"Question {i}?",
+            answer=f"{rng.choice(WORDS)} {i}",
+            aliases=[f"{rng.choice(WORDS)}"],
+            difficulty=rng.randint(1, 3),
+            age_group=rng.choice([None, "cubs", "explorers", "masters"])
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    checks = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    questions = make_questions(count)
+    bank = QuestionBank(seed=1)
+    started = time.perf_counter()
+    bank.load(questions)
+    load_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for game in range(10_000):
+        bank.sample("quiz", TOPICS[game % len(TOPICS)], 5, [f"p{game % 500}", f"p{(game + 1) % 500}"],
+                    age_group="explorers")
+    sample_time = time.perf_counter() - started
+
+    rng = random.Random(3)
+    guesses = []
+    for _ in range(checks):
+        q = questions[rng.randrange(count)]
+        # Mix of exact, typo'd and wrong answers
+        guesses.append((q, rng.choice([q.answer, q.answer[:-1] + "x", "no idea", ""])))
+    started = time.perf_counter()
+    correct = sum(q.is_correct(g) for q, g in guesses)
+    check_time = time.perf_counter() - started
+
+    print(f"questions:       {count:,} ({len(bank.index):,} index keys)")
+    print(f"load + index:    {load_time:.2f}s")
+    print(f"sample 5:        {sample_time / 10_000 * 1e6:.1f} us/game")
+    print(f"answer check:    {check_time / checks * 1e6:.1f} us/answer ({correct:,} of {checks:,} accepted)")
+
+
+if __name__ == "__main__":
+    main()
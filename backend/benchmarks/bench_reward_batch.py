@@ -0,0 +1,74 @@
+# ============================================================
+# BrainSpark Benchmark - Batch Question Rewards
+# benchmarks/bench_reward_batch.py
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_reward_batch [events] [children]
+# ============================================================
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import random
+import sys
+import time
+
+from app.services.reward_batch import ChildRewardState, QuestionEvent, fold_question
+
+
+def make_states(children: int) -> dict:
+    return {
+        f"child_{i}": ChildRewardState(
+            child_id=f"child_{i}",
+            stars=0,
+            total_xp=0,
+            total_questions=0,
+            max_depth=0,
+            streak=random.randint(0, 10),
+            topics_explored=random.randint(0, 8),
+            achievements=[]
+        )
+        for i in range(children)
+    }
+
+
+def make_events(count: int, children: int) -> list:
+    start = datetime.utcnow() - timedelta(days=1)
+    rng = random.Random(42)
+    return [
+        QuestionEvent(
+            child_id=f"child_{rng.randrange(children)}",
+            depth=rng.randint(0, 12),
+            timestamp=start + timedelta(seconds=i)
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    children = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    states = make_states(children)
+    events = make_events(count, children)
+
+    started = time.perf_counter()
+    by_child: dict = {}
+    for e in events:
+        by_child.setdefault(e.child_id, []).append(e)
+    out: list = []
+    for child_id, child_events in by_child.items():
+        state = states[child_id]
+        for e in child_events:
+            fold_question(state, e, out)
+    elapsed = time.perf_counter() - started
+
+    print(f"events:          {count:,}")
+    print(f"children:        {children:,}")
+    print(f"reward events:   {len(out):,}")
+    print(f"fold time:       {elapsed:.3f}s")
+    print(f"throughput:      {count / elapsed:,.0f} events/sec (in-memory fold, excludes DB I/O)")
+
+
+if __name__ == "__main__":
+    main()
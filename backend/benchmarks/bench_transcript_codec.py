@@ -0,0 +1,95 @@
+# ============================================================
+# BrainSpark Benchmark - Dictionary-Compressed Transcripts
+# benchmarks/bench_transcript_codec.py
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_transcript_codec [conversations]
+# ============================================================
+
+from __future__ import annotations
+
+import json
+import random
+import sys
+import time
+
+import zstandard
+
+from app.services.transcript_codec import DictionaryRegistry, TranscriptCodec, training_samples
+
+TOPICS = {
+    "Space": ["planets", "the moon", "black holes", "astronauts", "the sun", "Mars", "comets"],
+    "Animals": ["cheetahs", "whales", "penguins", "bees", "octopuses", "elephants", "owls"],
+    "Science": ["magnets", "volcanoes", "rainbows", "electricity", "gravity", "plants", "ice"],
+}
+QUESTIONS = [
+    "Why do {x} exist?", "How big are {x}?", "What would happen if {x} disappeared?",
+    "Can you tell me more about {x}? 🤔", "Wow!! Why?? 😮", "But how do {x} work?",
+    "Is it true that {x} are really old?", "What do {x} eat? 🍎",
+]
+ANSWERS = [
+    "Great question! 🌟 {x} are fascinating. Let's think about it together: what do you already know about {x}?",
+    "Wow, you're thinking like a real scientist! 🔬 Scientists believe {x} formed a very long time ago. What do you think caused that?",
+    "That's a super curious question! 🚀 Imagine if {x} were the size of your house. What would change?",
+    "You're on a roll! ⭐ Here's a fun fact about {x}: they can surprise even grown-up experts. Why do you think that is?",
+]
+
+
+def make_conversations(count: int, rng: random.Random) -> list:
+    conversations = []
+    for _ in range(count):
+        topic = rng.choice(list(TOPICS))
+        messages = []
+        for _ in range(rng.randint(2, 12)):
+            thing = rng.choice(TOPICS[topic])
+            messages.append({"role": "user", "content": rng.choice(QUESTIONS).format(x=thing)})
+            messages.append({"role": "assistant", "content": rng.choice(ANSWERS).format(x=thing)})
+        conversations.append((topic, messages))
+    return conversations
+
+
+def measure(name: str, codec: TranscriptCodec, conversations: list):
+    encoded = []
+    started = time.perf_counter()
+    for topic, messages in conversations:
+        encoded.append(codec.encode_messages(topic, messages))
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for blob in encoded:
+        codec.decode_messages(blob)
+    decode_seconds = time.perf_counter() - started
+
+    messages = sum(len(m) for _, m in conversations)
+    total = sum(len(b) for b in encoded)
+    print(
+        f"{name:<18} {total / messages:7.1f} B/msg  "
+        f"encode {encode_seconds / len(conversations) * 1e6:6.1f} us/conv  "
+        f"decode {decode_seconds / len(conversations) * 1e6:6.1f} us/conv"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(11)
+    training = make_conversations(2_000, rng)
+    conversations = make_conversations(count, rng)
+
+    messages = sum(len(m) for _, m in conversations)
+    raw = sum(len(json.dumps(m, ensure_ascii=False, separators=(",", ":")).encode()) for _, m in conversations)
+    print(f"{count} conversations, {messages} messages")
+    print(f"{'raw JSON':<18} {raw / messages:7.1f} B/msg")
+
+    measure("zstd, no dict", TranscriptCodec(DictionaryRegistry()), conversations)
+
+    registry = DictionaryRegistry()
+    started = time.perf_counter()
+    for dictionary_id, topic in enumerate(TOPICS, 1):
+        samples = training_samples(m for t, m in training if t == topic)
+        registry.register(dictionary_id, topic, zstandard.train_dictionary(16 * 1024, samples).as_bytes())
+    print(f"trained {len(TOPICS)} dictionaries in {time.perf_counter() - started:.2f}s")
+    measure("zstd + topic dict", TranscriptCodec(registry), conversations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# ============================================================
+# One multiplayer node for test_backplane_processes.py
+#
+#   python tests/integration/backplane_node.py owner  <redis_url> <room_id>
+#   python tests/integration/backplane_node.py joiner <redis_url> <room_id> <player_id>
+#
+# Prints "ready" once listening, then one JSON result line.
+# ============================================================
+
+import asyncio
+import json
+import sys
+import time
+
+from app.services.backplane import JOINED, SYSTEM, RoomBackplane
+from app.services.multiplayer import ChallengeType, GameRoom, Player, RoomStatus, manager
+
+WAIT_SECONDS = 10.0
+
+
+def emit(line: str):
+    print(line, flush=True)
+
+
+async def run_owner(redis_url: str, room_id: str):
+    """Hosts the room; seats players relayed from other processes, then broadcasts"""
+    await manager.enable_backplane(RoomBackplane(redis_url))
+    room = GameRoom(id=room_id, host_id="host", challenge_type=list(ChallengeType)[0], topic="Space",
+                    max_players=2, status=RoomStatus.WAITING)
+    room.seat(Player(id="host", name="Host", avatar="🧒", age_group="explorers", is_ready=True))
+    manager.rooms[room_id] = room
+    await manager.backplane.save_room(
+        {"id": room_id, "host_id": "host", "challenge_type": room.challenge_type.value,
+         "topic": room.topic, "max_players": room.max_players, "status": room.status.value},
+        [p.to_public() for p in room.players.values()]
+    )
+    emit("ready")
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while len(room.players) < 2 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.5)  # Let the losing joiner's relayed messages arrive too
+    await manager.broadcast_to_room(room_id, {"type": "hello", "players": sorted(room.players)})
+    await asyncio.sleep(0.2)
+    emit(json.dumps({"players": sorted(room.players), "node": manager.backplane.node_id}))
+    await manager.backplane.stop()
+
+
+async def run_joiner(redis_url: str, room_id: str, player_id: str):
+    """Watches the room from another process, tries a forged join, then joins for real"""
+    frames = []
+    backplane = RoomBackplane(redis_url)
+
+    async def ignore_inbound(*args):
+        pass
+
+    await backplane.start(lambda room, frame, exclude, to: frames.append(frame), ignore_inbound)
+    await backplane.watch_room(room_id)
+    emit("ready")
+
+    # A raw client payload claiming to be an internal join must not seat anyone
+    forged = {"id": f"forged-{player_id}", "name": "Mallory", "avatar": "😈", "age_group": "masters"}
+    await backplane.forward_to_owner(room_id, forged["id"], {"type": "_joined", "player": forged})
+
+    player = {"id": player_id, "name": player_id, "avatar": "🧒", "age_group": "explorers"}
+    result = await backplane.join_room(room_id, player)
+    if result == JOINED:
+        await backplane.forward_to_owner(room_id, player_id, {"type": "_joined", "player": player}, kind=SYSTEM)
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not any('"hello"' in f for f in frames) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    emit(json.dumps({"join": result, "frames": frames, "owner": await backplane.route_hint(room_id)}))
+    await backplane.stop()
+
+
+if __name__ == "__main__":
+    role, redis_url, room_id = sys.argv[1:4]
+    if role == "owner":
+        asyncio.run(run_owner(redis_url, room_id))
+    else:
+        asyncio.run(run_joiner(redis_url, room_id, sys.argv[4]))
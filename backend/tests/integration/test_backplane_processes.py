@@ -0,0 +1,65 @@
+# ============================================================
+# Multiplayer backplane across separate OS processes (needs Redis)
+#
+# One owner process hosts a 2-seat room; two joiner processes race for
+# the last seat through Redis, each also relaying a forged "_joined".
+# ============================================================
+
+import json
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+BACKEND = Path(__file__).resolve().parents[2]
+NODE = Path(__file__).with_name("backplane_node.py")
+
+
+def redis_available() -> bool:
+    try:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.5).ping()
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not redis_available(), reason=f"Redis not reachable at {REDIS_URL}")
+
+
+def start_node(*args: str) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": str(BACKEND)}
+    process = subprocess.Popen([sys.executable, str(NODE), *args], cwd=BACKEND, env=env,
+                               stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == "ready"
+    return process
+
+
+def result_of(process: subprocess.Popen) -> dict:
+    out, _ = process.communicate(timeout=30)
+    assert process.returncode == 0
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_rooms_are_shared_across_processes():
+    room_id = f"t{uuid.uuid4().hex[:7]}"
+    owner = start_node("owner", REDIS_URL, room_id)
+    joiners = [start_node("joiner", REDIS_URL, room_id, f"kid{i}") for i in range(2)]
+
+    owned = result_of(owner)
+    joined = [result_of(j) for j in joiners]
+
+    # Exactly one joiner got the last seat; the atomic join turned the other away
+    assert sorted(r["join"] for r in joined) == [-3, 1]
+    winner = next(f"kid{i}" for i, r in enumerate(joined) if r["join"] == 1)
+    # Seated on the owner through the relay - and no forged player got in
+    assert owned["players"] == sorted(["host", winner])
+    # Every process watching the room got the owner's broadcast, and the sticky hint names the owner
+    for r in joined:
+        assert any('"hello"' in frame for frame in r["frames"])
+        assert r["owner"] == owned["node"]
+
+    redis.Redis.from_url(REDIS_URL).delete(f"mp:room:{room_id}", f"mp:room:{room_id}:players")
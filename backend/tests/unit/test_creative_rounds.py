@@ -0,0 +1,70 @@
+# ============================================================
+# Creative Clash rounds - scoring failures and bad client input
+# ============================================================
+
+import pytest
+
+from app.services import multiplayer
+from app.services.multiplayer import (
+    ChallengeType, GameRoom, MultiplayerGame, Player, RoomStatus, handle_player_message, manager
+)
+
+
+@pytest.fixture
+def game():
+    room = GameRoom(id="clash01", host_id="p1", challenge_type=ChallengeType.CREATIVE_CLASH, topic="Space",
+                    max_players=2, status=RoomStatus.IN_PROGRESS, questions=[{"prompt": "Invent a planet"}])
+    room.seat(Player(id="p1", name="Pat", avatar="🧒", age_group="explorers"))
+    game = MultiplayerGame(room)
+    manager.rooms[room.id] = room
+    manager.games[room.id] = game
+    yield game
+    manager.rooms.pop(room.id, None)
+    manager.games.pop(room.id, None)
+
+
+async def test_scoring_failure_still_closes_the_round(game, monkeypatch):
+    async def broken(prompt, answers):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(multiplayer.creative_scoring, "score_round", broken)
+    game.round_answers = {"p1": {"answer": "a planet made of giant glowing jelly", "points": 10, "needs_scoring": True}}
+    await game.score_creative_round(0)
+
+    kind, payload = game.inbox.get_nowait()
+    assert kind == "round_scored"
+    assert payload["source"] == "heuristic"
+    assert 1 <= payload["scores"]["p1"] <= 10
+
+
+async def test_fallback_failure_posts_empty_scores(game, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(multiplayer.creative_scoring, "score_round", broken)
+    monkeypatch.setattr(multiplayer.creative_scoring.fallback, "score", broken)
+    game.round_answers = {"p1": {"answer": "jelly", "points": 10, "needs_scoring": True}}
+    await game.score_creative_round(0)
+
+    assert game.inbox.get_nowait() == ("round_scored", {"round": 0, "scores": {}, "source": "none",
+                                                        "elapsed": pytest.approx(0, abs=1)})
+
+
+@pytest.mark.parametrize("answer", [None, 42, ["list"], {"text": "dict"}])
+async def test_non_string_answers_are_dropped(game, answer):
+    await handle_player_message(game.room.id, "p1", {"type": "answer", "answer": answer})
+    assert game.inbox.empty()
+
+
+async def test_answers_are_trimmed_and_time_sanitized(game):
+    await handle_player_message(game.room.id, "p1", {"type": "answer", "answer": "x" * 5000, "time": "fast"})
+    kind, payload = game.inbox.get_nowait()
+    assert kind == "answer"
+    assert len(payload["answer"]) == multiplayer.MAX_ANSWER_LENGTH
+    assert payload["time"] == 0
+
+
+async def test_non_string_chat_is_dropped(game):
+    before = multiplayer.room_chat.accepted
+    await handle_player_message(game.room.id, "p1", {"type": "chat", "message": {"spam": True}})
+    assert multiplayer.room_chat.accepted == before
@@ -0,0 +1,52 @@
+# ============================================================
+# Message archive - appending turns to the messages table
+# ============================================================
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.message_archive import APPEND_MESSAGE_SQL, TranscriptReader, row_to_record
+from app.services.transcript_codec import MAGIC, content_samples
+
+
+class RecordingSession:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, statement, params):
+        self.calls.append((statement, params))
+
+
+def test_append_keeps_the_turn_in_order():
+    db = RecordingSession()
+    TranscriptReader().append(db, "c1", "Space", [
+        {"role": "user", "content": "why is the sky blue"},
+        {"role": "assistant", "content": "Sunlight scatters"},
+    ], depth=3)
+
+    [(statement, rows)] = db.calls
+    assert statement is APPEND_MESSAGE_SQL
+    assert [r["role"] for r in rows] == ["user", "assistant"]
+    assert [r["word_count"] for r in rows] == [5, 2]
+    assert rows[0]["created_at"] < rows[1]["created_at"]
+    assert {r["conversation_id"] for r in rows} == {"c1"}
+    assert {r["thinking_depth"] for r in rows} == {3}
+
+
+def test_appended_content_is_compressed_and_reads_back_plain():
+    db = RecordingSession()
+    TranscriptReader().append(db, "c1", "Space", [{"role": "user", "content": "why is space dark? 🌌"}], depth=1)
+    [(_, [params])] = db.calls
+    assert params["content_zstd"].startswith(MAGIC)
+    assert "content" not in params
+
+    row = SimpleNamespace(id="m1", content=None, created_at=datetime.utcnow(), metadata=None, **{
+        k: v for k, v in params.items() if k != "created_at"
+    })
+    assert row_to_record(row)["content"] == "why is space dark? 🌌"
+    assert content_samples([row]) == ["why is space dark? 🌌".encode("utf-8")]
+
+
+def test_training_samples_include_rows_stored_before_compression():
+    rows = [SimpleNamespace(content="plain", content_zstd=None), SimpleNamespace(content=None, content_zstd=None)]
+    assert content_samples(rows) == [b"plain"]
@@ -0,0 +1,61 @@
+# ============================================================
+# Multiplayer relay envelopes - client payloads can't use internal types
+# ============================================================
+
+import pytest
+
+from app.services.backplane import CLIENT, SYSTEM
+from app.services.multiplayer import (
+    ChallengeType, GameRoom, Player, RoomStatus, handle_player_message, handle_relayed_message, manager
+)
+
+MALLORY = {"id": "mallory", "name": "Mallory", "avatar": "😈", "age_group": "masters"}
+
+
+class RecordingBackplane:
+    def __init__(self):
+        self.forwarded = []
+
+    async def forward_to_owner(self, room_id, player_id, data, kind=CLIENT):
+        self.forwarded.append((room_id, player_id, kind, data))
+
+
+@pytest.fixture
+def room():
+    room = GameRoom(id="relay01", host_id="host", challenge_type=list(ChallengeType)[0], topic="Space",
+                    max_players=2, status=RoomStatus.WAITING)
+    room.seat(Player(id="host", name="Host", avatar="🧒", age_group="explorers"))
+    manager.rooms[room.id] = room
+    yield room
+    manager.rooms.pop(room.id, None)
+    manager.player_rooms.pop("mallory", None)
+    manager.player_rooms.pop("p2", None)
+
+
+async def test_client_envelope_cannot_seat_players(room):
+    await handle_relayed_message(room.id, "mallory", CLIENT, {"type": "_joined", "player": MALLORY})
+    assert "mallory" not in room.players
+
+
+async def test_client_envelope_cannot_fake_disconnects(room):
+    await handle_relayed_message(room.id, "host", CLIENT, {"type": "_disconnected"})
+    assert room.players["host"].connected
+
+
+async def test_system_envelope_seats_players(room):
+    player = {"id": "p2", "name": "Pat", "avatar": "🧒", "age_group": "explorers"}
+    await handle_relayed_message(room.id, "p2", SYSTEM, {"type": "_joined", "player": player})
+    assert room.players["p2"].slot == 2
+
+
+async def test_internal_types_are_not_forwarded_from_sockets():
+    backplane = RecordingBackplane()
+    manager.backplane = backplane
+    try:
+        await handle_player_message("elsewhere", "mallory", {"type": "_joined", "player": MALLORY})
+        await handle_player_message("elsewhere", "mallory", {"type": 7})
+        await handle_player_message("elsewhere", "mallory", ["not", "a", "dict"])
+        await handle_player_message("elsewhere", "mallory", {"type": "ready"})
+    finally:
+        manager.backplane = None
+    assert backplane.forwarded == [("elsewhere", "mallory", CLIENT, {"type": "ready"})]
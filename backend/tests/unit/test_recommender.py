@@ -0,0 +1,47 @@
+# ============================================================
+# Topic recommender - chunked matrix build
+# ============================================================
+
+import numpy as np
+import pytest
+
+from app.services.recommender import TopicRecommender, build_matrices
+
+SEQUENCE = [("a", "Space"), ("a", "Physics"), ("a", "Physics"), ("a", "Nature"),
+            ("b", "Nature"), ("b", "Space"), ("c", "Math"), ("c", "Space")]
+ENGAGEMENT = [("a", "Space", 4), ("a", "Physics", 2), ("a", "Nature", 1),
+              ("b", "Nature", 3), ("b", "Space", 6), ("c", "Math", 9), ("c", "Space", 1)]
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 100])
+def test_chunked_build_matches_a_single_pass(chunk_rows):
+    whole = build_matrices(SEQUENCE, ENGAGEMENT, chunk_rows=100)
+    chunked = build_matrices(iter(SEQUENCE), iter(ENGAGEMENT), chunk_rows=chunk_rows)
+
+    assert chunked.topics == whole.topics == ["Math", "Nature", "Physics", "Space"]
+    assert chunked.children == 3
+    np.testing.assert_allclose(chunked.transitions, whole.transitions)
+    np.testing.assert_allclose(chunked.cooccurrence, whole.cooccurrence)
+    np.testing.assert_allclose(chunked.reach, whole.reach)
+
+
+def test_cooccurrence_equals_the_dense_product():
+    m = build_matrices(SEQUENCE, ENGAGEMENT)
+    index = {t: i for i, t in enumerate(m.topics)}
+    children = {"a": 0, "b": 1, "c": 2}
+    dense = np.zeros((3, len(m.topics)))
+    for child, topic, questions in ENGAGEMENT:
+        dense[children[child], index[topic]] = np.log1p(questions)
+
+    np.testing.assert_allclose(m.cooccurrence, dense.T @ dense)
+    assert m.transitions[index["Space"], index["Physics"]] == 1
+    assert m.transitions[index["Physics"], index["Physics"]] == 0  # Repeats aren't transitions
+    assert m.transitions[index["Nature"], index["Space"]] == 1     # b's move; a -> b is not a transition
+
+
+def test_suggest_falls_back_once_everything_is_explored():
+    recommender = TopicRecommender(fallback=("Space", "Math"))
+    recommender.load([("explorers", "Space", "Math", 0.9)])
+
+    suggestions = recommender.suggest("explorers", ["Space"], ["Space", "Math"], k=2)
+    assert [s["topic"] for s in suggestions] == ["Math"]
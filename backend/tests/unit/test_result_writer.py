@@ -0,0 +1,21 @@
+# ============================================================
+# Result writer - unconfigured persistence
+# ============================================================
+
+from datetime import datetime
+
+from app.services.result_writer import GameResult, PlayerResult, ResultWriter
+
+
+def game(game_id: str) -> GameResult:
+    return GameResult(game_id=game_id, room_id="room1", challenge_type="quiz_race", topic="Space",
+                      winner_id="p1", rounds=5, started_at=None, ended_at=datetime.utcnow(),
+                      players=[PlayerResult("p1", 1, 50, 5, 10)])
+
+
+async def test_missing_session_factory_counts_records_as_failed():
+    writer = ResultWriter()
+    await writer.write_with_retry([game("g1"), game("g2")])
+    assert writer.written == 0
+    assert writer.failed == 2
+    assert writer.retries == 0
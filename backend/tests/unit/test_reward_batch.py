@@ -0,0 +1,60 @@
+# ============================================================
+# Batch question rewards - achievements claimed online mid-batch
+# ============================================================
+
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.reward_batch import (
+    APPLY_DELTAS_SQL, ChildRewardState, QuestionEvent, drop_skipped_rewards, fold_question, QuestionBatchProcessor
+)
+from app.services.rewards import RewardEventKind
+
+
+class ApplySession:
+    """Answers APPLY_DELTAS_SQL as if `already_held` had been claimed online after the load"""
+
+    def __init__(self, already_held):
+        self.already_held = set(already_held)
+        self.params = None
+
+    def execute(self, statement, params):
+        assert statement is APPLY_DELTAS_SQL
+        self.params = params
+        return [
+            SimpleNamespace(child_id=child_id, added=[a for a in json.loads(rewards) if a not in self.already_held])
+            for child_id, rewards in zip(params["ids"], params["achievement_rewards"])
+        ]
+
+
+def folded_state():
+    state = ChildRewardState(child_id="c1", stars=0, total_xp=0, total_questions=0, max_depth=0,
+                             streak=0, topics_explored=0, achievements=[])
+    events = []
+    fold_question(state, QuestionEvent("c1", depth=3, timestamp=datetime(2026, 10, 19, 12)), events)
+    return state, events
+
+
+def test_fold_attributes_rewards_to_each_achievement():
+    state, events = folded_state()
+    assert state.new_achievements == ["first_spark", "deep_3"]
+    first_spark = state.achievement_rewards["first_spark"]
+    assert (first_spark.stars, first_spark.xp) == (10, 50)
+    assert events[first_spark.first_event].kind == RewardEventKind.ACHIEVEMENT_UNLOCKED
+
+
+def test_achievement_claimed_online_is_not_paid_twice():
+    state, events = folded_state()
+    stars, xp = state.stars_delta, state.xp_delta
+    db = ApplySession(already_held={"first_spark"})
+
+    skipped = QuestionBatchProcessor(db, reward_log=object()).write_back([state])
+
+    assert state.new_achievements == ["deep_3"]
+    assert state.stars_delta == stars - 10
+    assert state.xp_delta == xp - 50
+    kept = drop_skipped_rewards(events, skipped)
+    assert "achievement:first_spark" not in {e.source for e in kept}
+    assert "achievement:deep_3" in {e.source for e in kept}
+    assert sum(e.amount for e in kept if e.kind == RewardEventKind.STARS_AWARDED) == state.stars_delta
@@ -0,0 +1,48 @@
+# ============================================================
+# Reward maintenance - partitions and snapshot pagination
+# ============================================================
+
+from datetime import date
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.services import rewards
+from app.services.rewards import CREATE_PARTITION_SQL, SNAPSHOT_DUE_SQL, RewardMaintenanceJob
+
+
+def fake_factory(monkeypatch, due_children):
+    calls = []
+
+    def factory():
+        session = Session(create_engine("sqlite://"))
+
+        def execute(statement, params=None):
+            calls.append((statement, params))
+            if statement is CREATE_PARTITION_SQL:
+                return SimpleNamespace(scalar=lambda: params["name"])
+            if statement is SNAPSHOT_DUE_SQL:
+                after = params["after_id"]
+                rest = [c for c in due_children if after is None or c > after][:params["limit"]]
+                return SimpleNamespace(scalars=lambda: iter(rest))
+            raise AssertionError(statement)
+
+        monkeypatch.setattr(session, "execute", execute)
+        monkeypatch.setattr(session, "commit", lambda: None)
+        return session
+
+    return factory, calls
+
+
+def test_creates_partitions_and_snapshots_every_due_child(monkeypatch):
+    snapshotted = []
+    monkeypatch.setattr(rewards.RewardEventLog, "snapshot", lambda self, child_id: snapshotted.append(child_id))
+    factory, calls = fake_factory(monkeypatch, ["a", "b", "c", "d", "e"])
+
+    report = RewardMaintenanceJob(factory, chunk_size=2).run(today=date(2026, 11, 17))
+
+    assert report.partitions == ["reward_events_2026_11", "reward_events_2026_12", "reward_events_2027_01"]
+    assert snapshotted == ["a", "b", "c", "d", "e"]
+    assert report.snapshots == 5
+    assert [p["after_id"] for s, p in calls if s is SNAPSHOT_DUE_SQL] == [None, "b", "d", "e"]
@@ -0,0 +1,69 @@
+# ============================================================
+# Timer wheel - cancel accounting
+# ============================================================
+
+import asyncio
+
+import pytest
+
+from app.services.timer_wheel import TimerWheel
+
+
+@pytest.fixture
+async def wheel():
+    wheel = TimerWheel(tick_seconds=0.01)
+    yield wheel
+    if wheel.task:
+        wheel.task.cancel()
+
+
+async def wait_for(predicate, timeout: float = 1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.005)
+
+
+async def test_cancelling_a_fired_timer_keeps_pending_timers_running(wheel):
+    # MultiplayerGame cancels the round timer that just fired it; that used to
+    # drop the active count to 0 and park the wheel with timers still pending
+    fired = []
+    first = wheel.schedule(0.02, fired.append, "first")
+    wheel.schedule(0.2, fired.append, "pending")
+    await wait_for(lambda: fired == ["first"])
+
+    wheel.cancel(first)
+    wheel.cancel(first)
+    assert wheel.active == 1
+    assert wheel.cancelled == 0
+
+    await wait_for(lambda: "pending" in fired)
+    assert fired == ["first", "pending"]
+    assert wheel.active == 0
+
+
+async def test_cancel_from_inside_the_firing_callback(wheel):
+    fired = []
+    holder = {}
+
+    def on_fire():
+        fired.append("round")
+        wheel.cancel(holder["timer"])  # What end_round does with its own timeout
+
+    holder["timer"] = wheel.schedule(0.02, on_fire)
+    wheel.schedule(0.1, fired.append, "next")
+    await wait_for(lambda: "next" in fired)
+    assert fired == ["round", "next"]
+    assert wheel.active == 0
+
+
+async def test_cancelled_timer_never_fires_and_counts_once(wheel):
+    fired = []
+    timer = wheel.schedule(0.05, fired.append, "cancelled")
+    wheel.cancel(timer)
+    wheel.cancel(timer)
+    assert wheel.active == 0
+    assert wheel.cancelled == 1
+
+    wheel.schedule(0.1, fired.append, "kept")
+    await wait_for(lambda: "kept" in fired)
+    assert fired == ["kept"]
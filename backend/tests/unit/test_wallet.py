@@ -0,0 +1,71 @@
+# ============================================================
+# Star wallet - cached headers follow committed balances
+# ============================================================
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.services import wallet as wallet_module
+from app.services.wallet import StarWallet
+
+
+@pytest.fixture
+def invalidated(monkeypatch):
+    calls = []
+    monkeypatch.setattr(wallet_module.tiered_cache, "invalidate", lambda ns, *keys: calls.append((ns, set(keys))))
+    return calls
+
+
+@pytest.fixture
+def wallet(monkeypatch):
+    session = Session(create_engine("sqlite://"))
+    row = SimpleNamespace(balance_after=40, created_at=datetime.utcnow(), user_id="u1")
+
+    def execute(*args, **kwargs):
+        session.connection()  # Begin the transaction a real UPDATE would
+        return SimpleNamespace(first=lambda: row)
+
+    monkeypatch.setattr(session, "execute", execute)
+    yield StarWallet(session)
+    session.close()
+
+
+def test_commit_invalidates_every_changed_child(wallet, invalidated):
+    wallet.credit("c1", 10, "question")
+    wallet.debit("c2", 5, "power_up:star_boost")
+    assert invalidated == []  # Nothing is visible to other workers before the commit
+
+    wallet.db.commit()
+    assert invalidated == [("child_header", {"c1", "c2"})]
+
+    wallet.db.commit()
+    assert invalidated[-1] == ("child_header", set())
+
+
+def test_rollback_forgets_the_changes(wallet, invalidated):
+    wallet.credit("c1", 10, "question")
+    wallet.db.rollback()
+    wallet.db.commit()
+    assert invalidated == [("child_header", set())]
+
+
+def test_wallets_sharing_a_session_hook_it_once(wallet, invalidated):
+    StarWallet(wallet.db)
+    StarWallet(wallet.db).credit("c3", 1, "question")
+    wallet.credit("c1", 10, "question")
+    wallet.db.commit()
+    assert invalidated == [("child_header", {"c1", "c3"})]
+
+
+def test_commit_pins_the_childs_user_for_reads(wallet, invalidated, monkeypatch):
+    pinned = []
+    monkeypatch.setattr(wallet_module.db_router, "pin", lambda *keys: pinned.append(set(keys)))
+    wallet.credit("c1", 10, "question")
+    assert pinned == []
+
+    wallet.db.commit()
+    assert pinned == [{"u1"}]  # The users id /api/stats/{child_id} routes on, not the profile id
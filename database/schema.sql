@@ -5,6 +5,55 @@
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS btree_gin;  -- (child_id, tsv) search index
+
+-- ============================================================
+-- PARTITION HELPERS
+-- ============================================================
+-- Adds the monthly range partition of `parent` starting at month_start.
+-- Postgres refuses to create a range partition while the DEFAULT
+-- partition holds rows in that range, so the default is detached, its
+-- rows for the month are moved into the new partition, and it is
+-- re-attached - all in the caller's transaction. Detaching also drops
+-- the default's cloned row triggers, so append-only guards don't block
+-- the move.
+CREATE OR REPLACE FUNCTION create_month_partition(
+    parent TEXT, default_partition TEXT, key_column TEXT, partition_name TEXT, month_start DATE
+)
+RETURNS TEXT AS $$
+DECLARE
+    lower_bound DATE := date_trunc('month', month_start)::date;
+    upper_bound DATE := (date_trunc('month', month_start) + INTERVAL '1 month')::date;
+    stranded BOOLEAN;
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE %I >= %L AND %I < %L)',
+                   default_partition, key_column, lower_bound, key_column, upper_bound)
+        INTO stranded;
+
+    IF NOT stranded THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                       partition_name, parent, lower_bound, upper_bound);
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, default_partition);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, parent, lower_bound, upper_bound);
+    -- Moving rows is not an edit: skip append-only guards the default may still carry
+    EXECUTE format('ALTER TABLE %I DISABLE TRIGGER USER', default_partition);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+        default_partition, key_column, lower_bound, key_column, upper_bound, partition_name
+    );
+    EXECUTE format('ALTER TABLE %I ENABLE TRIGGER USER', default_partition);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I DEFAULT', parent, default_partition);
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
 
 -- ============================================================
 -- USERS TABLE - Parents and Children
@@ -41,10 +90,13 @@ CREATE TABLE child_profiles (
     longest_streak INTEGER DEFAULT 0,
     total_questions INTEGER DEFAULT 0,
     total_deep_dives INTEGER DEFAULT 0,
+    total_xp INTEGER DEFAULT 0,
+    max_depth INTEGER DEFAULT 0,
     
     -- Activity tracking
     last_active TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     streak_last_updated DATE DEFAULT CURRENT_DATE,
+    lost_streak INTEGER DEFAULT 0,  -- Broken by the nightly rollover, reported on the next visit
     
     -- JSON fields for flexible data
     achievements JSONB DEFAULT '[]'::jsonb,
@@ -129,7 +181,11 @@ CREATE TABLE conversations (
     last_message_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     
     is_active BOOLEAN DEFAULT TRUE,
-    metadata JSONB DEFAULT '{}'::jsonb
+    metadata JSONB DEFAULT '{}'::jsonb,
+
+    -- Legacy transcript as a transcript_codec frame: b"BZ" + dictionary id + zstd.
+    -- New turns are rows in messages (below).
+    messages_zstd BYTEA
 );
 
 CREATE INDEX idx_conversations_child ON conversations(child_id);
@@ -137,25 +193,138 @@ CREATE INDEX idx_conversations_topic ON conversations(topic_id);
 CREATE INDEX idx_conversations_active ON conversations(child_id, is_active);
 
 -- ============================================================
--- MESSAGES - Individual chat messages
+-- TOPIC RECOMMENDATIONS - Rebuilt nightly by app/services/recommender.py
+-- ============================================================
+-- Best next topics per (age group, current topic); topic '*' holds the
+-- age group's most popular topics for children without history.
+CREATE TABLE topic_recommendations (
+    age_group VARCHAR(20) NOT NULL,
+    topic VARCHAR(100) NOT NULL,
+    rank SMALLINT NOT NULL,
+    next_topic VARCHAR(100) NOT NULL,
+    score REAL NOT NULL,
+    built_at TIMESTAMP WITH TIME ZONE NOT NULL,
+
+    PRIMARY KEY (age_group, topic, rank)
+);
+
+-- Each child's next-topic candidates (best first), precomputed by the same
+-- job so the next-topics endpoint is a single lookup
+CREATE TABLE child_topic_recommendations (
+    child_id UUID PRIMARY KEY REFERENCES child_profiles(id) ON DELETE CASCADE,
+    age_group VARCHAR(20) NOT NULL,
+    recent_topics TEXT[] NOT NULL DEFAULT '{}',   -- Latest first, at most 3
+    suggestions JSONB NOT NULL,                   -- [{"topic": ..., "score": ...}], at most 10
+    built_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX idx_child_topic_recommendations_built ON child_topic_recommendations(built_at);
+
+-- ============================================================
+-- CONVERSATION SEARCH - Full-text index over every chat message
 -- ============================================================
+-- Filled by the chat endpoint as messages are appended (and once by the
+-- conversation_search backfill job). The child's own questions rank above
+-- the assistant's replies.
+CREATE TABLE conversation_search (
+    conversation_id UUID NOT NULL,
+    child_id UUID NOT NULL,
+    topic VARCHAR(100),
+    turn INTEGER NOT NULL,                 -- Position in the transcript
+    role VARCHAR(20) NOT NULL,
+    content TEXT NOT NULL,
+    tsv TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', content), CASE WHEN role = 'user' THEN 'A' ELSE 'B' END::"char")
+    ) STORED,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    PRIMARY KEY (conversation_id, turn)
+);
+
+CREATE INDEX idx_conversation_search_tsv ON conversation_search USING GIN (child_id, tsv);
+
+-- ============================================================
+-- TRANSCRIPT DICTIONARIES - Per-topic zstd dictionaries, versioned
+-- ============================================================
+-- Trained weekly from recent messages rows (app/services/transcript_codec.py).
+-- Rows are never updated or deleted while a stored transcript or message may
+-- still reference them by id; retraining adds a new version.
+CREATE TABLE transcript_dictionaries (
+    id SERIAL PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    version INTEGER NOT NULL,
+    dictionary BYTEA NOT NULL,
+    sample_count INTEGER NOT NULL,
+    dict_size INTEGER NOT NULL,
+    trained_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    UNIQUE(topic, version)
+);
+
+-- ============================================================
+-- MESSAGES - Individual chat messages, range-partitioned by month
+-- ============================================================
+-- The chat endpoint appends one row per message, content compressed into
+-- content_zstd; conversations.messages and messages_zstd only hold
+-- transcripts written before that.
+-- Only recent months stay attached. Older partitions are detached and
+-- archived to zstd NDJSON files by app/services/message_archive.py;
+-- reads fall back to those files (see message_archives below).
 CREATE TABLE messages (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     conversation_id UUID REFERENCES conversations(id) ON DELETE CASCADE,
     
     role VARCHAR(20) NOT NULL CHECK (role IN ('user', 'assistant', 'system')),
-    content TEXT NOT NULL,
+    content TEXT,
+    -- transcript_codec frame (b"BZ" + dictionary id + zstd) of the content,
+    -- compressed with the topic's dictionary; replaces content for new rows
+    content_zstd BYTEA,
+    CHECK (content IS NOT NULL OR content_zstd IS NOT NULL),
     
     -- Message analytics
     word_count INTEGER,
     thinking_depth INTEGER DEFAULT 0,
     
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    metadata JSONB DEFAULT '{}'::jsonb
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    metadata JSONB DEFAULT '{}'::jsonb,
+
+    PRIMARY KEY (id, created_at)  -- The partition key must be part of every unique key
+) PARTITION BY RANGE (created_at);
+
+-- Created on each partition; queries bounded on created_at only visit recent ones
+CREATE INDEX idx_messages_conversation ON messages(conversation_id, created_at);
+
+-- Catches rows outside every monthly range so an insert never fails
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+-- Monthly partition messages_yYYYYmMM for the month containing month_start,
+-- moving any of its rows that already landed in messages_default
+CREATE OR REPLACE FUNCTION create_messages_partition(month_start DATE)
+RETURNS TEXT AS $$
+BEGIN
+    RETURN create_month_partition(
+        'messages', 'messages_default', 'created_at',
+        format('messages_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM')),
+        month_start
+    );
+END;
+$$ LANGUAGE plpgsql;
 
-CREATE INDEX idx_messages_conversation ON messages(conversation_id);
-CREATE INDEX idx_messages_created ON messages(conversation_id, created_at);
+-- The current month and the next two, so month boundaries never land in the default partition
+SELECT create_messages_partition((date_trunc('month', NOW()) + (n || ' month')::interval)::date)
+FROM generate_series(0, 2) AS n;
+
+-- One row per detached, archived month
+CREATE TABLE message_archives (
+    partition_name VARCHAR(64) PRIMARY KEY,
+    range_start DATE NOT NULL,
+    range_end DATE NOT NULL,
+    path TEXT NOT NULL,                    -- zstd NDJSON, one frame per conversation
+    index_path TEXT NOT NULL,              -- conversation_id -> [offset, length] in path
+    row_count BIGINT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
 
 -- ============================================================
 -- DAILY ACTIVITY - Daily tracking for streaks & analytics
@@ -232,17 +401,216 @@ CREATE INDEX idx_child_achievements_child ON child_achievements(child_id);
 -- ============================================================
 CREATE TABLE daily_challenges (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    challenge_date DATE UNIQUE NOT NULL,
+    challenge_date DATE NOT NULL,
     
     topic_id UUID REFERENCES topics(id),
     question TEXT NOT NULL,
-    age_group VARCHAR(20),
+    age_group VARCHAR(20),  -- NULL = all age groups
     
     stars_reward INTEGER DEFAULT 20,
     
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    
+    UNIQUE(challenge_date, age_group)
+);
+
+-- ============================================================
+-- STAR LEDGER - Every credit and debit to a child's star wallet
+-- ============================================================
+CREATE TABLE star_ledger (
+    id BIGSERIAL PRIMARY KEY,
+    child_id UUID NOT NULL REFERENCES child_profiles(id) ON DELETE CASCADE,
+
+    amount INTEGER NOT NULL CHECK (amount <> 0),  -- negative for debits
+    balance_after INTEGER NOT NULL CHECK (balance_after >= 0),
+    source VARCHAR(100) NOT NULL,
+
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+CREATE INDEX idx_star_ledger_child ON star_ledger(child_id, id DESC);
+
+-- Balances can never go negative, whatever path writes them
+ALTER TABLE child_profiles ADD CONSTRAINT chk_child_profiles_stars_non_negative CHECK (stars >= 0);
+
+-- ============================================================
+-- CHILD POWER-UPS - Purchased power-ups and their lifetimes
+-- ============================================================
+CREATE TABLE child_power_ups (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    child_id UUID NOT NULL REFERENCES child_profiles(id) ON DELETE CASCADE,
+    power_up_id VARCHAR(50) NOT NULL,
+
+    activated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    consumed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_child_power_ups_active ON child_power_ups(child_id, power_up_id, expires_at)
+    WHERE consumed_at IS NULL;
+
+-- ============================================================
+-- STREAK ROLLOVER RUNS - Progress of the nightly streak job
+-- ============================================================
+CREATE TABLE streak_rollover_runs (
+    rollover_date DATE PRIMARY KEY,
+    last_child_id UUID,  -- keyset cursor, lets a crashed run resume
+
+    children_processed INTEGER DEFAULT 0,
+    streaks_broken INTEGER DEFAULT 0,
+    shields_used INTEGER DEFAULT 0,
+
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- ============================================================
+-- REWARD EVENTS - Append-only log of every star, XP and
+-- achievement change, partitioned by month
+-- ============================================================
+CREATE TABLE reward_events (
+    id BIGSERIAL,
+    child_id UUID NOT NULL,
+    kind SMALLINT NOT NULL,  -- 1 stars awarded, 2 stars spent, 3 xp, 4 achievement
+    amount INTEGER NOT NULL,
+    source VARCHAR(64) NOT NULL,
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (recorded_at, id)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE INDEX idx_reward_events_child ON reward_events(child_id, id);
+
+-- Catches inserts if the monthly partition job falls behind;
+-- RewardEventLog.ensure_partitions() (run daily by python -m app.services.rewards)
+-- creates the named ones and moves anything that landed here into them
+CREATE TABLE reward_events_default PARTITION OF reward_events DEFAULT;
+
+-- The current month and the next two, like messages
+SELECT create_month_partition(
+    'reward_events', 'reward_events_default', 'recorded_at',
+    format('reward_events_%s', to_char(date_trunc('month', NOW()) + (n || ' month')::interval, 'YYYY_MM')),
+    (date_trunc('month', NOW()) + (n || ' month')::interval)::date
+)
+FROM generate_series(0, 2) AS n;
+
+-- Append-only: the log is never edited in place
+CREATE OR REPLACE FUNCTION reject_reward_event_changes()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'reward_events is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reward_events_append_only
+    BEFORE UPDATE OR DELETE ON reward_events
+    FOR EACH ROW EXECUTE FUNCTION reject_reward_event_changes();
+
+-- Running totals per child, updated in the same transaction as the events
+CREATE TABLE reward_projections (
+    child_id UUID PRIMARY KEY REFERENCES child_profiles(id) ON DELETE CASCADE,
+    stars INTEGER NOT NULL DEFAULT 0,
+    xp INTEGER NOT NULL DEFAULT 0,
+    achievements TEXT[] NOT NULL DEFAULT '{}',
+    event_count BIGINT NOT NULL DEFAULT 0,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE TABLE reward_daily_totals (
+    child_id UUID NOT NULL REFERENCES child_profiles(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    stars_earned INTEGER NOT NULL DEFAULT 0,
+    stars_spent INTEGER NOT NULL DEFAULT 0,
+    xp_earned INTEGER NOT NULL DEFAULT 0,
+    achievements_unlocked INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (child_id, day)
+);
+
+-- Replay starting points for rebuilding a child's state
+CREATE TABLE reward_snapshots (
+    child_id UUID NOT NULL REFERENCES child_profiles(id) ON DELETE CASCADE,
+    last_event_id BIGINT NOT NULL,
+    stars INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    achievements TEXT[] NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    PRIMARY KEY (child_id, last_event_id)
+);
+
+-- ============================================================
+-- MULTIPLAYER QUESTIONS - Question bank for multiplayer games
+-- ============================================================
+CREATE TABLE multiplayer_questions (
+    id VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL DEFAULT 'quiz'
+        CHECK (kind IN ('quiz', 'riddle', 'prompt')),
+    topic VARCHAR(100) NOT NULL DEFAULT 'General',
+
+    question TEXT NOT NULL,
+    answer TEXT,                           -- NULL for creative prompts; "a/b" = either
+    aliases TEXT[] NOT NULL DEFAULT '{}',  -- Other accepted spellings
+
+    difficulty SMALLINT NOT NULL DEFAULT 1,
+    age_group VARCHAR(20),                 -- NULL = all age groups
+    points INTEGER NOT NULL DEFAULT 10,
+    time_limit INTEGER NOT NULL DEFAULT 30,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- ============================================================
+-- MULTIPLAYER RESULTS - Written in batches by the result writer
+-- ============================================================
+CREATE TABLE multiplayer_games (
+    id VARCHAR(64) PRIMARY KEY,            -- Game id doubles as the write idempotency key
+    room_id VARCHAR(16) NOT NULL,
+    challenge_type VARCHAR(50) NOT NULL,
+    topic VARCHAR(100) NOT NULL,
+    winner_id VARCHAR(64),
+    player_count SMALLINT NOT NULL,
+    rounds SMALLINT NOT NULL,
+
+    started_at TIMESTAMP WITH TIME ZONE,
+    ended_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX idx_multiplayer_games_ended ON multiplayer_games(ended_at DESC);
+
+-- One row per player per game; inserting it is what claims the star reward
+CREATE TABLE multiplayer_game_players (
+    game_id VARCHAR(64) NOT NULL REFERENCES multiplayer_games(id) ON DELETE CASCADE,
+    player_id VARCHAR(64) NOT NULL,
+    rank SMALLINT NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    correct_answers SMALLINT NOT NULL DEFAULT 0,
+    stars_awarded INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (game_id, player_id)
+);
+
+CREATE INDEX idx_multiplayer_game_players_player ON multiplayer_game_players(player_id);
+
+CREATE TABLE multiplayer_challenges (
+    id VARCHAR(64) PRIMARY KEY,
+    challenger_id VARCHAR(64) NOT NULL,
+    challenged_id VARCHAR(64) NOT NULL,
+    challenge_type VARCHAR(50) NOT NULL,
+    topic VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'accepted', 'declined', 'completed')),
+    winner_id VARCHAR(64),
+
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_multiplayer_challenges_challenged ON multiplayer_challenges(challenged_id, status);
+
 -- ============================================================
 -- FUNCTIONS & TRIGGERS
 -- ============================================================
@@ -288,13 +656,15 @@ BEGIN
         UPDATE child_profiles 
         SET streak = streak + 1,
             longest_streak = GREATEST(longest_streak, streak + 1),
-            streak_last_updated = CURRENT_DATE
+            streak_last_updated = CURRENT_DATE,
+            lost_streak = 0
         WHERE id = p_child_id;
     ELSIF v_last_date < CURRENT_DATE - 1 THEN
         -- Reset streak
         UPDATE child_profiles 
         SET streak = 1,
-            streak_last_updated = CURRENT_DATE
+            streak_last_updated = CURRENT_DATE,
+            lost_streak = 0
         WHERE id = p_child_id;
     END IF;
 END;